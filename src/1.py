@@ -40,9 +40,7 @@ def main():
         # project.import_pdf("data/Amiga Magazin 1987-06..07.pdf", 0, 10)
         project.add_image("data/3.jpeg")
 
-        for page in project.pages:
-            page.set_header(100)
-            page.set_footer(100)
+        project.detect_header_footer()
         project.analyze_pages()
         page = project.pages[0]
         page.recognize_boxes(2)
@@ -1,12 +1,18 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from abc import ABC, abstractmethod
+import numpy as np
 from PIL import Image
 
 from ocr_engine.ocr_result import OCRResultBlock, OCRResultParagraph # type: ignore
+from ocr_engine.ocr_statistics import OCRStatistics # type: ignore
 from page.box_type import BoxType # type: ignore
 
 
 class Exporter(ABC):
+    # Whether export_project() goes through the pages only once, so they can
+    # be passed as a generator and created one at a time
+    streams_pages = False
+
     def __init__(self, output_path: str, filename: str) -> None:
         self.output_path: str = output_path
         self.filename: str = filename
@@ -52,13 +58,17 @@ class Exporter(ABC):
     def find_mean_font_size(
         self, ocr_result_paragraph: OCRResultParagraph, rasterize: int = 0
     ) -> float:
-        total_font_size: float = 0
-        total_words: int = 0
-        for line in ocr_result_paragraph.lines:
-            for word in line.words:
-                total_font_size += word.word_font_attributes["pointsize"]
-                total_words += 1
-        return round(total_font_size / total_words, rasterize)
+        ocr_result_block = OCRResultBlock()
+        ocr_result_block.add_paragraph(ocr_result_paragraph)
+        return self.find_mean_font_sizes(ocr_result_block, rasterize)[0]
+
+    def find_mean_font_sizes(
+        self, ocr_result_block: OCRResultBlock, rasterize: int = 0
+    ) -> List[float]:
+        # Mean font size of every paragraph, 0 if no word has a known size
+        statistics = OCRStatistics.from_blocks([("", "", ocr_result_block)])
+        mean_font_sizes = np.nan_to_num(statistics.mean_font_size("paragraph"))
+        return np.round(mean_font_sizes, rasterize).tolist()
 
     def get_text(
         self,
@@ -0,0 +1,174 @@
+from typing import Any, Dict, List, TextIO, Tuple
+
+from exporter.exporter_xml_based import ExporterXMLBased  # type: ignore
+from ocr_engine.ocr_result import (  # type: ignore
+    OCRResultLine,
+    OCRResultParagraph,
+    OCRResultWord,
+)
+from page.box_type import BoxType  # type: ignore
+
+ALTO_NAMESPACE = "http://www.loc.gov/standards/alto/ns-v4#"
+ALTO_SCHEMA_LOCATION = "http://www.loc.gov/alto/v4/alto-4-2.xsd"
+
+ALTO_FONT_STYLES = {
+    "bold": "bold",
+    "italic": "italics",
+    "underlined": "underline",
+    "smallcaps": "smallCaps",
+}
+
+
+class ExporterALTO(ExporterXMLBased):
+    extension = "alto.xml"
+    format_name = "ALTO"
+
+    def write_document_start(self, f: TextIO) -> None:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write(
+            f'<alto xmlns="{ALTO_NAMESPACE}" '
+            'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+            f'xsi:schemaLocation="{ALTO_NAMESPACE} {ALTO_SCHEMA_LOCATION}">\n'
+        )
+        f.write("<Description>\n")
+        f.write("<MeasurementUnit>pixel</MeasurementUnit>\n")
+        f.write('<OCRProcessing ID="OCR_0"><ocrProcessingStep><processingSoftware>')
+        f.write("<softwareName>OCRReader 2</softwareName>")
+        f.write("</processingSoftware></ocrProcessingStep></OCRProcessing>\n")
+        f.write("</Description>\n")
+        f.write("<Layout>\n")
+
+    def write_document_end(self, f: TextIO) -> None:
+        f.write("</Layout>\n</alto>\n")
+
+    def write_page(self, f: TextIO, page_export_data: Dict[str, Any]) -> None:
+        page_id = page_export_data["order"]
+        _, _, width, height = self.get_page_bbox(page_export_data)
+
+        f.write(
+            f'<Page ID="page_{page_id}" PHYSICAL_IMG_NR="{page_id + 1}" '
+            f'WIDTH="{width}" HEIGHT="{height}">\n'
+        )
+        f.write(
+            f'<PrintSpace HPOS="0" VPOS="0" WIDTH="{width}" HEIGHT="{height}">\n'
+        )
+
+        for box_index, export_data_entry in enumerate(page_export_data["boxes"]):
+            self.write_box(f, f"{page_id}_{box_index}", export_data_entry)
+
+        f.write("</PrintSpace>\n</Page>\n")
+
+    def write_box(
+        self, f: TextIO, element_id: str, export_data_entry: Dict[str, Any]
+    ) -> None:
+        box_bbox = self.get_box_bbox(export_data_entry)
+        position = self.position_attributes(box_bbox)
+
+        match export_data_entry["type"]:
+            case BoxType.FLOWING_IMAGE | BoxType.HEADING_IMAGE | BoxType.PULLOUT_IMAGE:
+                f.write(f'<Illustration ID="illustration_{element_id}" {position}/>\n')
+                return
+            case BoxType.HORZ_LINE | BoxType.VERT_LINE:
+                f.write(
+                    f'<GraphicalElement ID="separator_{element_id}" {position}/>\n'
+                )
+                return
+
+        ocr_result_block = self.get_ocr_result_block(export_data_entry)
+
+        if not ocr_result_block or not ocr_result_block.paragraphs:
+            f.write(f'<TextBlock ID="block_{element_id}" {position}/>\n')
+            return
+
+        # ALTO has no paragraph level, so each paragraph becomes a text block
+        # inside a composed block for the whole box
+        f.write(f'<ComposedBlock ID="box_{element_id}" {position}>\n')
+        for paragraph_index, paragraph in enumerate(ocr_result_block.paragraphs):
+            self.write_paragraph(
+                f, f"{element_id}_{paragraph_index}", paragraph, box_bbox
+            )
+        f.write("</ComposedBlock>\n")
+
+    def write_paragraph(
+        self,
+        f: TextIO,
+        element_id: str,
+        paragraph: OCRResultParagraph,
+        box_bbox: Tuple[int, int, int, int],
+    ) -> None:
+        # Positions are mandatory in ALTO, fall back to the box if Tesseract
+        # did not report one
+        paragraph_bbox = paragraph.bbox or box_bbox
+        position = self.position_attributes(paragraph_bbox)
+        f.write(f'<TextBlock ID="block_{element_id}" {position}>\n')
+
+        for line_index, line in enumerate(paragraph.lines):
+            self.write_line(f, f"{element_id}_{line_index}", line, paragraph_bbox)
+
+        f.write("</TextBlock>\n")
+
+    def write_line(
+        self,
+        f: TextIO,
+        element_id: str,
+        line: OCRResultLine,
+        paragraph_bbox: Tuple[int, int, int, int],
+    ) -> None:
+        attributes = [
+            f'ID="line_{element_id}"',
+            self.position_attributes(line.bbox or paragraph_bbox),
+        ]
+
+        if line.baseline is not None:
+            (x1, y1), (x2, y2) = line.baseline
+            attributes.append(f'BASELINE="{x1},{y1} {x2},{y2}"')
+
+        f.write(f"<TextLine {' '.join(attributes)}>\n")
+
+        previous_word = None
+        for word_index, word in enumerate(line.words):
+            if previous_word is not None:
+                self.write_space(f, previous_word, word)
+            self.write_word(f, f"{element_id}_{word_index}", word)
+            previous_word = word
+
+        f.write("</TextLine>\n")
+
+    def write_word(self, f: TextIO, element_id: str, word: OCRResultWord) -> None:
+        attributes = [f'ID="string_{element_id}"']
+
+        if word.bbox is not None:
+            attributes.append(self.position_attributes(word.bbox))
+
+        attributes.append(f'CONTENT="{self.escape_attribute(word.text)}"')
+        attributes.append(f'WC="{round(max(0.0, min(word.confidence, 100.0)) / 100, 4)}"')
+
+        styles = self.font_styles(word.word_font_attributes or {})
+        if styles:
+            attributes.append(f'STYLE="{" ".join(styles)}"')
+
+        f.write(f"<String {' '.join(attributes)}/>\n")
+
+    def write_space(
+        self, f: TextIO, previous_word: OCRResultWord, word: OCRResultWord
+    ) -> None:
+        if previous_word.bbox is None or word.bbox is None:
+            f.write("<SP/>\n")
+            return
+
+        hpos = previous_word.bbox[2]
+        width = max(word.bbox[0] - hpos, 0)
+        f.write(f'<SP HPOS="{hpos}" VPOS="{previous_word.bbox[1]}" WIDTH="{width}"/>\n')
+
+    def font_styles(self, font_attributes: Dict[str, Any]) -> List[str]:
+        return [
+            style
+            for attribute, style in ALTO_FONT_STYLES.items()
+            if font_attributes.get(attribute)
+        ]
+
+    def position_attributes(self, bbox: Tuple[int, int, int, int]) -> str:
+        left, top, right, bottom = bbox
+        return (
+            f'HPOS="{left}" VPOS="{top}" WIDTH="{right - left}" HEIGHT="{bottom - top}"'
+        )
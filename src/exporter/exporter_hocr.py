@@ -0,0 +1,159 @@
+from typing import Any, Dict, Optional, TextIO, Tuple
+
+from iso639 import Lang  # type: ignore
+
+from exporter.exporter_xml_based import ExporterXMLBased  # type: ignore
+from ocr_engine.ocr_result import (  # type: ignore
+    OCRResultBlock,
+    OCRResultLine,
+    OCRResultParagraph,
+    OCRResultWord,
+)
+from page.box_type import BoxType  # type: ignore
+
+
+class ExporterHOCR(ExporterXMLBased):
+    extension = "hocr"
+    format_name = "hOCR"
+
+    def write_document_start(self, f: TextIO) -> None:
+        langs = self.project_export_data.get("settings", {}).get("langs") or ["eng"]
+        lang = Lang(langs[0]).pt1 or "en"
+
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write(
+            '<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN" '
+            '"http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">\n'
+        )
+        f.write(
+            f'<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="{lang}" lang="{lang}">\n'
+        )
+        f.write("<head>\n")
+        f.write(
+            f"<title>{self.escape_text(self.project_export_data.get('name', ''))}</title>\n"
+        )
+        f.write(
+            '<meta http-equiv="Content-Type" content="text/html;charset=utf-8"/>\n'
+        )
+        f.write('<meta name="ocr-system" content="OCRReader 2"/>\n')
+        f.write(
+            '<meta name="ocr-capabilities" content="ocr_page ocr_carea ocr_par '
+            'ocr_line ocrx_word ocr_photo ocr_separator ocrp_wconf ocrp_font"/>\n'
+        )
+        f.write("</head>\n<body>\n")
+
+    def write_document_end(self, f: TextIO) -> None:
+        f.write("</body>\n</html>\n")
+
+    def write_page(self, f: TextIO, page_export_data: Dict[str, Any]) -> None:
+        page_id = page_export_data["order"]
+        title = (
+            f'image "{page_export_data["image_path"]}"; '
+            f"bbox {self.format_bbox(self.get_page_bbox(page_export_data))}; "
+            f"ppageno {page_id}"
+        )
+        f.write(
+            f'<div class="ocr_page" id="page_{page_id}" title="{self.escape_attribute(title)}">\n'
+        )
+
+        for box_index, export_data_entry in enumerate(page_export_data["boxes"]):
+            self.write_box(f, f"{page_id}_{box_index}", export_data_entry)
+
+        f.write("</div>\n")
+
+    def write_box(
+        self, f: TextIO, element_id: str, export_data_entry: Dict[str, Any]
+    ) -> None:
+        title = f"bbox {self.format_bbox(self.get_box_bbox(export_data_entry))}"
+
+        match export_data_entry["type"]:
+            case BoxType.FLOWING_IMAGE | BoxType.HEADING_IMAGE | BoxType.PULLOUT_IMAGE:
+                f.write(
+                    f'<div class="ocr_photo" id="photo_{element_id}" title="{title}"></div>\n'
+                )
+                return
+            case BoxType.HORZ_LINE | BoxType.VERT_LINE:
+                f.write(
+                    f'<div class="ocr_separator" id="separator_{element_id}" title="{title}"></div>\n'
+                )
+                return
+
+        f.write(f'<div class="ocr_carea" id="block_{element_id}" title="{title}">\n')
+
+        ocr_result_block = self.get_ocr_result_block(export_data_entry)
+        if ocr_result_block:
+            self.write_block(f, element_id, ocr_result_block)
+
+        f.write("</div>\n")
+
+    def write_block(
+        self, f: TextIO, element_id: str, ocr_result_block: OCRResultBlock
+    ) -> None:
+        for paragraph_index, paragraph in enumerate(ocr_result_block.paragraphs):
+            self.write_paragraph(f, f"{element_id}_{paragraph_index}", paragraph)
+
+    def write_paragraph(
+        self, f: TextIO, element_id: str, paragraph: OCRResultParagraph
+    ) -> None:
+        f.write(f'<p class="ocr_par" id="par_{element_id}"{self.title(paragraph)}>\n')
+
+        for line_index, line in enumerate(paragraph.lines):
+            self.write_line(f, f"{element_id}_{line_index}", line)
+
+        f.write("</p>\n")
+
+    def write_line(self, f: TextIO, element_id: str, line: OCRResultLine) -> None:
+        properties = []
+
+        if line.bbox is not None:
+            properties.append(f"bbox {self.format_bbox(line.bbox)}")
+
+        baseline = self.get_baseline(line)
+        if baseline is not None:
+            properties.append(f"baseline {baseline[0]} {baseline[1]}")
+
+        title = f' title="{"; ".join(properties)}"' if properties else ""
+        f.write(f'<span class="ocr_line" id="line_{element_id}"{title}>')
+
+        for word_index, word in enumerate(line.words):
+            if word_index > 0:
+                f.write(" ")
+            self.write_word(f, f"{element_id}_{word_index}", word)
+
+        f.write("</span>\n")
+
+    def write_word(self, f: TextIO, element_id: str, word: OCRResultWord) -> None:
+        properties = []
+
+        if word.bbox is not None:
+            properties.append(f"bbox {self.format_bbox(word.bbox)}")
+
+        properties.append(f"x_wconf {int(round(word.confidence))}")
+
+        font_attributes = word.word_font_attributes or {}
+        if font_attributes.get("font_name"):
+            properties.append(f'x_font "{font_attributes["font_name"]}"')
+        if font_attributes.get("pointsize"):
+            properties.append(f"x_fsize {font_attributes['pointsize']}")
+
+        text = self.escape_text(word.text)
+
+        if font_attributes.get("bold"):
+            text = f"<strong>{text}</strong>"
+        if font_attributes.get("italic"):
+            text = f"<em>{text}</em>"
+
+        title = self.escape_attribute("; ".join(properties))
+        f.write(
+            f'<span class="ocrx_word" id="word_{element_id}" title="{title}">{text}</span>'
+        )
+
+    def title(self, element: Any) -> str:
+        bbox: Optional[Tuple[int, int, int, int]] = element.bbox
+
+        if bbox is None:
+            return ""
+        return f' title="bbox {self.format_bbox(bbox)}"'
+
+    def format_bbox(self, bbox: Tuple[int, int, int, int]) -> str:
+        return " ".join(str(int(value)) for value in bbox)
@@ -164,15 +164,19 @@ class ExporterHTML(Exporter):
         tag: str,
     ) -> None:
         if ocr_result_block:
-            for ocr_result_paragraph in ocr_result_block.paragraphs:
+            mean_font_sizes = self.find_mean_font_sizes(ocr_result_block)
+
+            for ocr_result_paragraph, mean_font_size in zip(
+                ocr_result_block.paragraphs, mean_font_sizes
+            ):
                 text = "\n".join(
                     [
                         " ".join([word.text for word in line.words])
                         for line in ocr_result_paragraph.lines
                     ]
                 )
-                mean_font_size = self.find_mean_font_size(ocr_result_paragraph)
                 new_tag = soup.new_tag(tag)
                 new_tag.string = text
-                new_tag["style"] = f"font-size: {mean_font_size}pt;"
+                if mean_font_size:
+                    new_tag["style"] = f"font-size: {mean_font_size}pt;"
                 div.append(new_tag)
@@ -24,17 +24,21 @@ class ExporterHTMLBased(Exporter):
     def add_block_text(self, ocr_result_block: OCRResultBlock, tag: str) -> str:
         content = ""
         if ocr_result_block:
-            for ocr_result_paragraph in ocr_result_block.paragraphs:
+            mean_font_sizes = self.find_mean_font_sizes(ocr_result_block)
+
+            for ocr_result_paragraph, mean_font_size in zip(
+                ocr_result_block.paragraphs, mean_font_sizes
+            ):
                 text = "\n".join(
                     [
                         " ".join([word.text for word in line.words])
                         for line in ocr_result_paragraph.lines
                     ]
                 )
-                mean_font_size = self.find_mean_font_size(ocr_result_paragraph)
-                content += (
-                    f'<{tag} style="font-size: {mean_font_size}pt;">{text}</{tag}>'
+                style = (
+                    f' style="font-size: {mean_font_size}pt;"' if mean_font_size else ""
                 )
+                content += f"<{tag}{style}>{text}</{tag}>"
         return content
 
     def get_page_content(self, page_data_entry: Dict) -> str:
@@ -0,0 +1,109 @@
+import os
+from typing import Any, Dict, Optional, TextIO, Tuple
+from xml.sax.saxutils import escape
+
+from loguru import logger
+
+from exporter.exporter import Exporter  # type: ignore
+from ocr_engine.ocr_result import OCRResultBlock, OCRResultLine  # type: ignore
+
+
+class ExporterXMLBased(Exporter):
+    extension = "xml"
+    format_name = "XML"
+    streams_pages = True
+
+    def __init__(self, output_path: str, filename: str) -> None:
+        super().__init__(output_path, filename)
+        # Write all pages into one document, otherwise one document per page
+        self.single_file: bool = True
+
+    def export_project(self, project_export_data: Dict[str, Any]) -> None:
+        # The pages may be a generator, each page is written and dropped
+        # before the next one is created
+        super().export_project(project_export_data)
+
+        if self.single_file:
+            output_file = os.path.join(
+                self.output_path, f"{self.filename}.{self.extension}"
+            )
+            logger.info(f"Exporting to {self.format_name} file: {output_file}")
+
+            try:
+                with open(output_file, "w", encoding="utf-8") as f:
+                    self.write_document_start(f)
+                    for page_export_data in self.project_export_data["pages"]:
+                        self.write_page(f, page_export_data)
+                    self.write_document_end(f)
+            except Exception as e:
+                logger.error(f"Failed to export to {self.format_name}: {e}")
+        else:
+            for page_export_data in self.project_export_data["pages"]:
+                self.export_page(
+                    page_export_data,
+                    f"{self.filename}_{page_export_data['order']}",
+                )
+
+    def export_page(
+        self, page_export_data: Dict[str, Any], filename: Optional[str] = None
+    ) -> None:
+        output_file = os.path.join(
+            self.output_path, f"{filename or self.filename}.{self.extension}"
+        )
+        logger.info(f"Exporting to {self.format_name} file: {output_file}")
+
+        try:
+            with open(output_file, "w", encoding="utf-8") as f:
+                self.write_document_start(f)
+                self.write_page(f, page_export_data)
+                self.write_document_end(f)
+        except Exception as e:
+            logger.error(f"Failed to export to {self.format_name}: {e}")
+
+    def write_document_start(self, f: TextIO) -> None:
+        pass
+
+    def write_document_end(self, f: TextIO) -> None:
+        pass
+
+    def write_page(self, f: TextIO, page_export_data: Dict[str, Any]) -> None:
+        pass
+
+    def get_ocr_result_block(
+        self, export_data_entry: Dict[str, Any]
+    ) -> Optional[OCRResultBlock]:
+        ocr_results = export_data_entry.get("ocr_results", None)
+
+        # Boxes loaded from older projects may still carry the raw dict
+        if ocr_results is None or isinstance(ocr_results, dict):
+            return None
+        return ocr_results
+
+    def get_box_bbox(self, export_data_entry: Dict[str, Any]) -> Tuple[int, int, int, int]:
+        position = export_data_entry["position"]
+        return (
+            position["x"],
+            position["y"],
+            position["x"] + position["width"],
+            position["y"] + position["height"],
+        )
+
+    def get_page_bbox(self, page_export_data: Dict[str, Any]) -> Tuple[int, int, int, int]:
+        return (0, 0, page_export_data.get("width", 0), page_export_data.get("height", 0))
+
+    def get_baseline(self, line: OCRResultLine) -> Optional[Tuple[float, float]]:
+        # Tesseract baselines are two points in page coordinates, hOCR and ALTO
+        # both want slope and offset relative to the bottom left of the line
+        if line.baseline is None or line.bbox is None:
+            return None
+
+        (x1, y1), (x2, y2) = line.baseline
+        slope = (y2 - y1) / (x2 - x1) if x2 != x1 else 0.0
+        offset = y1 + slope * (line.bbox[0] - x1) - line.bbox[3]
+        return round(slope, 5), round(offset, 2)
+
+    def escape_text(self, text: str) -> str:
+        return escape(text)
+
+    def escape_attribute(self, value: Any) -> str:
+        return escape(str(value), {'"': "&quot;"})
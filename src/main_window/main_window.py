@@ -1,3 +1,5 @@
+from typing import Optional
+
 from PySide6.QtCore import QCoreApplication, QSettings, QByteArray, QSize
 from PySide6.QtGui import QIcon, QKeySequence, QCloseEvent, QAction, QUndoStack
 from PySide6.QtWidgets import QMainWindow, QStatusBar, QToolBar, QMenu
@@ -7,6 +9,9 @@ from main_window.toolbar import Toolbar  # type: ignore
 from main_window.menus import Menus  # type: ignore
 from main_window.actions import Actions  # type: ignore
 from main_window.user_actions import UserActions  # type: ignore
+from ocr_engine.layout_analyzer_tesserocr import layout_analyzers  # type: ignore
+from page.page import Page  # type: ignore
+from page_editor.page_editor_view import PageEditorView  # type: ignore
 
 
 class MainWindow(QMainWindow):
@@ -21,6 +26,7 @@ class MainWindow(QMainWindow):
         self.theme_folder = self.LIGHT_THEME_FOLDER
 
         self.undo_stack = QUndoStack(self)
+        self.page_editor: Optional[PageEditorView] = None
 
         self.setup_application()
         self.load_settings()
@@ -77,7 +83,22 @@ class MainWindow(QMainWindow):
 
             self.user_actions.load_images(filenames)
 
+    def open_page_editor(self, page: Page) -> None:
+        # Layout edits in the editor are undone with the undo action of the
+        # window, the steps of a previous page are dropped
+        if self.page_editor is not None:
+            self.page_editor.close()
+        self.page_editor = PageEditorView(page, self.undo_stack)
+        # The editor is a window of its own, the shortcuts have to work there
+        self.page_editor.addActions(
+            [self.actions_.undo_action, self.actions_.redo_action]
+        )
+        self.page_editor.show()
+
     def closeEvent(self, event: QCloseEvent) -> None:
+        if self.page_editor is not None:
+            self.page_editor.close()
+        layout_analyzers.close()
         self.save_settings()
         return super().closeEvent(event)
 
@@ -1,5 +1,10 @@
-from typing import List, Optional
+import concurrent.futures
+import queue
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
 
+import cv2
+import numpy as np
 from loguru import logger
 from tesserocr import PSM, PT, RIL, PyTessBaseAPI, iterate_level # type: ignore
 from ocr_engine.layout_analyzer import LayoutAnalyzer # type: ignore
@@ -10,13 +15,48 @@ from page.ocr_box import ( # type: ignore
     TextBox,
 )
 from page.box_type import BoxType # type: ignore
+from page.image_probe import probe_image # type: ignore
 from PIL import Image
 
 
+NUM_THREADS = 4
+
+
+def to_pil_image(image: np.ndarray) -> Image.Image:
+    if image.ndim == 3:
+        if image.shape[2] == 4:
+            image = cv2.cvtColor(image, cv2.COLOR_BGRA2RGBA)
+        else:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    return Image.fromarray(image)
+
+
 class LayoutAnalyzerTesserOCR(LayoutAnalyzer):
     def __init__(self, langs: Optional[List[str]]) -> None:
         super().__init__(langs)
-        self.api = PyTessBaseAPI()
+        # Initialized handles, created on first use and kept for later calls,
+        # so Init() only runs once per handle
+        self.api_pool: queue.Queue[PyTessBaseAPI] = queue.Queue()
+        self.api_count = 0
+        self.lock = threading.Lock()
+
+    def init_api(self, api: PyTessBaseAPI) -> None:
+        if self.langs:
+            from ocr_engine.ocr_engine_tesserocr import generate_lang_str # type: ignore
+
+            lang_str = generate_lang_str(self.langs)
+            api.Init(lang=lang_str, psm=PSM.AUTO_ONLY)
+        else:
+            api.Init(psm=PSM.AUTO_ONLY)
+
+    def ensure_handles(self, count: int) -> None:
+        # The analyzer may be shared by pages analyzed on several threads
+        with self.lock:
+            while self.api_count < count:
+                api = PyTessBaseAPI()
+                self.init_api(api)
+                self.api_pool.put(api)
+                self.api_count += 1
 
     def analyze_layout(
         self,
@@ -26,29 +66,89 @@ class LayoutAnalyzerTesserOCR(LayoutAnalyzer):
         size_threshold: int = 0,
     ) -> List[OCRBox]:
         logger.info(f"Analyzing layout in box ({region}) for image: {image_path}")
-        blocks: List[OCRBox] = []
-
-        if self.langs:
-            from ocr_engine.ocr_engine_tesserocr import generate_lang_str # type: ignore
-
-            lang_str = generate_lang_str(self.langs)
-            self.api.Init(lang=lang_str, psm=PSM.AUTO_ONLY)
-        else:
-            self.api.Init(psm=PSM.AUTO_ONLY)
-
-        self.api.SetImageFile(image_path)
-        self.api.SetSourceResolution(ppi)
-        self.api.SetPageSegMode(PSM.AUTO_ONLY)
 
         # Use the whole image if no region is specified
-        image = Image.open(image_path)
-        width, height = image.size
+        if region is None:
+            image_info = probe_image(image_path)
+            region = (0, 0, image_info.width, image_info.height)
+
+        self.ensure_handles(1)
+        api = self.api_pool.get()
+        try:
+            api.SetImageFile(image_path)
+            api.SetSourceResolution(ppi)
+            api.SetPageSegMode(PSM.AUTO_ONLY)
+            blocks = self.analyze_region(api, region, size_threshold)
+        finally:
+            self.api_pool.put(api)
 
-        region = region or (0, 0, width, height)
+        logger.info("Layout analysis result: {} blocks found", len(blocks))
+        return blocks
 
-        self.api.SetRectangle(*region)
+    def analyze_regions(
+        self,
+        image: np.ndarray,
+        ppi: int,
+        regions: Sequence[tuple[int, int, int, int]],
+        size_threshold: int = 0,
+    ) -> List[List[OCRBox]]:
+        # Blocks of every region of one decoded page image. The regions are
+        # spread over a pool of handles, each handle gets the image only once.
+        if not regions:
+            return []
+
+        handle_count = min(NUM_THREADS, len(regions))
+        self.ensure_handles(handle_count)
+
+        pil_image = to_pil_image(image)
+        results: List[List[OCRBox]] = [[] for _ in regions]
+
+        def analyze_chunk(indices: List[int]) -> None:
+            api = self.api_pool.get()
+            try:
+                api.SetImage(pil_image)
+                api.SetSourceResolution(ppi)
+                api.SetPageSegMode(PSM.AUTO_ONLY)
+                for index in indices:
+                    try:
+                        results[index] = self.analyze_region(
+                            api, regions[index], size_threshold
+                        )
+                    except Exception as e:
+                        logger.error(f"Error analyzing layout for region {regions[index]}: {e}")
+            finally:
+                self.api_pool.put(api)
+
+        chunks = [
+            list(range(start, len(regions), handle_count))
+            for start in range(handle_count)
+        ]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=handle_count) as executor:
+            for future in [executor.submit(analyze_chunk, chunk) for chunk in chunks]:
+                future.result()
+
+        logger.info(
+            f"Layout analysis of {len(regions)} regions: {sum(len(blocks) for blocks in results)} blocks found"
+        )
+        return results
+
+    def close(self) -> None:
+        # Releases the pooled handles, waiting for those in use
+        with self.lock:
+            while self.api_count > 0:
+                self.api_pool.get().End()
+                self.api_count -= 1
+
+    def analyze_region(
+        self,
+        api: PyTessBaseAPI,
+        region: tuple[int, int, int, int],
+        size_threshold: int = 0,
+    ) -> List[OCRBox]:
+        blocks: List[OCRBox] = []
+        api.SetRectangle(*region)
 
-        page_it = self.api.AnalyseLayout()
+        page_it = api.AnalyseLayout()
 
         if page_it:
             block_number = 0
@@ -91,5 +191,32 @@ class LayoutAnalyzerTesserOCR(LayoutAnalyzer):
 
                 blocks[-1].class_ = type.value
 
-        logger.info("Layout analysis result: {} blocks found", len(blocks))
         return blocks
+
+
+class SharedLayoutAnalyzers:
+    # One analyzer per language combination for the whole process, so pages
+    # share their pool of initialized handles instead of each holding its own
+    def __init__(self) -> None:
+        self.analyzers: Dict[Tuple[str, ...], LayoutAnalyzerTesserOCR] = {}
+        self.lock = threading.Lock()
+
+    def get(self, langs: List[str]) -> LayoutAnalyzerTesserOCR:
+        key = tuple(langs)
+        with self.lock:
+            analyzer = self.analyzers.get(key)
+            if analyzer is None:
+                analyzer = LayoutAnalyzerTesserOCR(list(langs))
+                self.analyzers[key] = analyzer
+        return analyzer
+
+    def close(self) -> None:
+        with self.lock:
+            analyzers = list(self.analyzers.values())
+            self.analyzers.clear()
+        for analyzer in analyzers:
+            analyzer.close()
+        logger.debug(f"Closed {len(analyzers)} shared layout analyzers")
+
+
+layout_analyzers = SharedLayoutAnalyzers()
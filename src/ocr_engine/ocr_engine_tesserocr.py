@@ -6,7 +6,7 @@ from PIL import Image
 from typing import Callable, List, Dict, Optional, Union
 from iso639 import Lang  # type: ignore
 from loguru import logger
-from ocr_engine.layout_analyzer_tesserocr import LayoutAnalyzerTesserOCR # type: ignore
+from ocr_engine.layout_analyzer_tesserocr import layout_analyzers # type: ignore
 from page.ocr_box import OCRBox # type: ignore
 from ocr_engine.ocr_result import ( # type: ignore
     OCRResultBlock,
@@ -18,6 +18,8 @@ from page.ocr_box import OCRBox, TextBox
 from ocr_engine.ocr_engine import OCREngine # type: ignore
 
 NUM_THREADS = 4
+# Pixels recognized around every box
+OCR_PADDING = 10
 tesserocr_queue: queue.Queue[PyTessBaseAPI] = queue.Queue()
 
 
@@ -82,12 +84,21 @@ def extract_text_from_iterator(ri) -> List[OCRResultBlock]:
     return blocks
 
 
+def set_padded_rectangle(api: PyTessBaseAPI, box: OCRBox) -> None:
+    # Recognizes a bit around the box, the box itself is left alone, it may
+    # belong to a layout used on another thread
+    api.SetRectangle(
+        box.x - OCR_PADDING,
+        box.y - OCR_PADDING,
+        box.width + 2 * OCR_PADDING,
+        box.height + 2 * OCR_PADDING,
+    )
+
+
 def perform_ocr(api: PyTessBaseAPI, box: OCRBox) -> OCRBox:
     try:
         if isinstance(box, TextBox):
-            # TODO: Find a better way to handle padding/expanding
-            box.expand(10)
-            api.SetRectangle(box.x, box.y, box.width, box.height)
+            set_padded_rectangle(api, box)
             if api.Recognize():
                 results = extract_text_from_iterator(api.GetIterator())
 
@@ -99,8 +110,6 @@ def perform_ocr(api: PyTessBaseAPI, box: OCRBox) -> OCRBox:
                 elif len(results) > 1:
                     # TODO: Handle multiple blocks
                     logger.warning("More than one block found in box")
-
-            box.shrink(10)
     except Exception as e:
         logger.error(f"Error in worker: {e}")
     return box
@@ -153,7 +162,7 @@ class OCREngineTesserOCR(OCREngine):
         size_threshold: int = 0,
         region: Optional[tuple[int, int, int, int]] = None,
     ) -> List[OCRBox]:
-        layout_analyzer = LayoutAnalyzerTesserOCR(self.langs)
+        layout_analyzer = layout_analyzers.get(self.langs or [])
         return layout_analyzer.analyze_layout(image_path, ppi, region, size_threshold)
 
     def recognize_box(self, image_path: str, ppi: int, boxes: List[OCRBox]) -> None:
@@ -216,8 +225,7 @@ def recognize_text(
             api.SetImageFile(image_path)
         if ppi:
             api.SetSourceResolution(ppi)
-        box.expand(10)
-        api.SetRectangle(box.x, box.y, box.width, box.height)
+        set_padded_rectangle(api, box)
         text = api.GetUTF8Text().strip()
         if isinstance(box, TextBox):
             box.confidence = api.MeanTextConf()
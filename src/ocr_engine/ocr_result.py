@@ -1,4 +1,6 @@
-from typing import List, Dict, Any, Optional, Tuple
+import threading
+from types import MappingProxyType
+from typing import List, Dict, Any, Iterable, Optional, Tuple
 
 from tesserocr import Justification # type: ignore
 
@@ -6,6 +8,63 @@ from tesserocr import Justification # type: ignore
 BoundingBox = Tuple[int, int, int, int]  # (x, y, width, height)
 
 
+class InternTable:
+    # Stores every distinct value once, so words can reference their font
+    # attributes and language by index. Dicts are stored as read-only
+    # mappings, as they are shared by all words using them.
+    def __init__(self) -> None:
+        self.values: List[Any] = []
+        self.indices: Dict[Any, int] = {}
+        # Words are created on the OCR worker threads
+        self.lock = threading.Lock()
+
+    def key(self, value: Any) -> Any:
+        if isinstance(value, (dict, MappingProxyType)):
+            return (dict, tuple(value.items()))
+        return value
+
+    def intern(self, value: Any) -> int:
+        key = self.key(value)
+        index = self.indices.get(key)
+
+        if index is None:
+            with self.lock:
+                index = self.indices.get(key)
+                if index is None:
+                    if isinstance(value, (dict, MappingProxyType)):
+                        value = MappingProxyType(dict(value))
+                    # The value is stored before its index is visible
+                    self.values.append(value)
+                    index = len(self.values) - 1
+                    self.indices[key] = index
+        return index
+
+    def get(self, index: int) -> Any:
+        return self.values[index]
+
+    def compact(self, live_indices: Iterable[int]) -> Dict[int, int]:
+        # Drops the values no longer referenced and returns old -> new index
+        # of the kept ones, the caller has to renumber every reference. The
+        # first value, the empty one, keeps index 0. Must not run while words
+        # are created.
+        kept = sorted(set(live_indices) | {0})
+        values = [self.values[index] for index in kept]
+
+        with self.lock:
+            self.values = values
+            self.indices = {self.key(value): index for index, value in enumerate(values)}
+        return {old: new for new, old in enumerate(kept)}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+FONT_ATTRIBUTES = InternTable()
+LANGUAGES = InternTable()
+EMPTY_FONT_ATTRIBUTES = FONT_ATTRIBUTES.intern({})
+EMPTY_LANGUAGE = LANGUAGES.intern("")
+
+
 class OCRResultBlock:
     def __init__(self) -> None:
         self.bbox: Optional[BoundingBox] = None
@@ -98,11 +157,17 @@ class OCRResultParagraph:
 
 
 class OCRResultLine:
-    def __init__(self) -> None:
-        self.bbox: Optional[BoundingBox] = None
-        self.confidence: float = 0.0
-        self.baseline: Optional[tuple[tuple[int, int], tuple[int, int]]] = None
-        self.words: List[OCRResultWord] = []
+    def __init__(
+        self,
+        bbox: Optional[BoundingBox] = None,
+        confidence: float = 0.0,
+        baseline: Optional[tuple[tuple[int, int], tuple[int, int]]] = None,
+        words: Optional[List["OCRResultWord"]] = None,
+    ) -> None:
+        self.bbox: Optional[BoundingBox] = bbox
+        self.confidence: float = confidence
+        self.baseline: Optional[tuple[tuple[int, int], tuple[int, int]]] = baseline
+        self.words: List[OCRResultWord] = words if words is not None else []
 
     def add_word(self, word: "OCRResultWord") -> None:
         self.words.append(word)
@@ -145,18 +210,47 @@ class OCRResultLine:
 
 
 class OCRResultWord:
-    def __init__(self) -> None:
-        self.text: str = ""
-        self.bbox: Optional[BoundingBox] = None
-        self.confidence: float = 0.0
-        self.word_font_attributes: Dict[str, Any] = {}
-        self.word_recognition_language: str = ""
+    # There are a lot of words, so keep them small: font attributes and
+    # language are indices into FONT_ATTRIBUTES and LANGUAGES
+    __slots__ = ("text", "bbox", "confidence", "font_attributes_id", "language_id")
+
+    def __init__(
+        self,
+        text: str = "",
+        bbox: Optional[BoundingBox] = None,
+        confidence: float = 0.0,
+        font_attributes_id: int = EMPTY_FONT_ATTRIBUTES,
+        language_id: int = EMPTY_LANGUAGE,
+    ) -> None:
+        # The arguments let decoders create words with map() in one go
+        self.text: str = text
+        self.bbox: Optional[BoundingBox] = bbox
+        self.confidence: float = confidence
+        self.font_attributes_id: int = font_attributes_id
+        self.language_id: int = language_id
 
         # TODO:
         # def SymbolIsSuperscript(self) -> bool:
         # def SymbolIsSubscript(self) -> bool:
         # def SymbolIsDropcap(self) -> bool:
 
+    @property
+    def word_font_attributes(self) -> Optional[MappingProxyType]:
+        # Shared between words, assign a new dict to change it
+        return FONT_ATTRIBUTES.get(self.font_attributes_id)
+
+    @word_font_attributes.setter
+    def word_font_attributes(self, font_attributes: Optional[Dict[str, Any]]) -> None:
+        self.font_attributes_id = FONT_ATTRIBUTES.intern(font_attributes)
+
+    @property
+    def word_recognition_language(self) -> Optional[str]:
+        return LANGUAGES.get(self.language_id)
+
+    @word_recognition_language.setter
+    def word_recognition_language(self, language: Optional[str]) -> None:
+        self.language_id = LANGUAGES.intern(language)
+
     def get_text(self) -> str:
         return self.text
 
@@ -171,7 +265,11 @@ class OCRResultWord:
             "text": self.text,
             "bbox": self.bbox,
             "confidence": self.confidence,
-            "word_font_attributes": self.word_font_attributes,
+            "word_font_attributes": (
+                dict(self.word_font_attributes)
+                if self.word_font_attributes is not None
+                else None
+            ),
             "word_recognition_language": self.word_recognition_language,
         }
 
@@ -0,0 +1,451 @@
+import json
+import operator
+import struct
+from array import array
+from itertools import accumulate, chain, repeat
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ocr_engine.ocr_result import (  # type: ignore
+    FONT_ATTRIBUTES,
+    BoundingBox,
+    LANGUAGES,
+    OCRResultBlock,
+    OCRResultLine,
+    OCRResultParagraph,
+    OCRResultWord,
+)
+
+# Binary layout of a single OCRResultBlock. Every level of the tree is stored
+# column-wise (one array per attribute) so encoding and decoding work on whole
+# columns instead of one dict per word. Version 2 separates the word texts by
+# TEXT_SEPARATOR.
+CODEC_VERSION = 2
+
+BLOCK_HEADER = struct.Struct("<HB4idIII")
+COLUMN_LENGTH = struct.Struct("<I")
+NO_BBOX = (0, 0, 0, 0)
+NO_BASELINE = ((0, 0), (0, 0))
+TEXT_SEPARATOR = "\n"
+
+FLAG_BBOX = 1
+FLAG_BASELINE = 2
+FLAG_LIST_ITEM = 4
+FLAG_CROWN = 8
+# Block flag: font attributes and languages are stored in OCRResultTables
+# outside of the block instead of inside it
+FLAG_SHARED_TABLES = 2
+
+
+def _table_indices(indices: Dict[int, int], distinct_ids: set, ids: List[int]) -> array:
+    # Blocks are often in a single language or font
+    if len(distinct_ids) == 1:
+        return array("i", [indices[ids[0]]]) * len(ids)
+    return array("i", [indices[value] for value in ids])
+
+
+class OCRResultTables:
+    # Font attributes and languages of encoded blocks, words reference them by
+    # index. A project file shares one instance between all its blocks.
+    def __init__(self) -> None:
+        self.font_attributes: List[Any] = []
+        self.languages: List[Optional[str]] = []
+        # Interned values are unique objects, so they are looked up by id()
+        self.font_attributes_indices: Dict[int, int] = {}
+        self.languages_indices: Dict[int, int] = {}
+        # Index -> FONT_ATTRIBUTES/LANGUAGES id, used when decoding
+        self.font_attributes_ids: List[int] = []
+        self.language_ids: List[int] = []
+        # Word id -> index, filled when encoding
+        self.font_attributes_id_indices: Dict[int, int] = {}
+        self.language_id_indices: Dict[int, int] = {}
+
+    def add_font_attributes(self, font_attributes: Any) -> int:
+        index = self.font_attributes_indices.get(id(font_attributes))
+
+        if index is None:
+            # Not the interned record itself, e.g. a plain dict
+            interned = FONT_ATTRIBUTES.get(FONT_ATTRIBUTES.intern(font_attributes))
+            index = self.font_attributes_indices.get(id(interned))
+
+            if index is None:
+                index = self.append_font_attributes(interned)
+        return index
+
+    def add_language(self, language: Optional[str]) -> int:
+        index = self.languages_indices.get(id(language))
+
+        if index is None:
+            interned = LANGUAGES.get(LANGUAGES.intern(language))
+            index = self.languages_indices.get(id(interned))
+
+            if index is None:
+                index = self.append_language(interned)
+        return index
+
+    # The append methods keep existing indices stable, even for duplicates
+
+    def append_font_attributes(self, font_attributes: Any) -> int:
+        font_attributes_id = FONT_ATTRIBUTES.intern(font_attributes)
+        # Keep the interned record, so the id() lookup above finds it
+        font_attributes = FONT_ATTRIBUTES.get(font_attributes_id)
+        index = len(self.font_attributes)
+        self.font_attributes_indices.setdefault(id(font_attributes), index)
+        self.font_attributes.append(font_attributes)
+        self.font_attributes_ids.append(font_attributes_id)
+        return index
+
+    def append_language(self, language: Optional[str]) -> int:
+        language_id = LANGUAGES.intern(language)
+        language = LANGUAGES.get(language_id)
+        index = len(self.languages)
+        self.languages_indices.setdefault(id(language), index)
+        self.languages.append(language)
+        self.language_ids.append(language_id)
+        return index
+
+    def font_attributes_indices_of(self, words: List[OCRResultWord]) -> array:
+        # Table indices of the font attributes of words, adding the missing ones
+        ids = [word.font_attributes_id for word in words]
+        indices = self.font_attributes_id_indices
+        distinct_ids = set(ids)
+        for font_attributes_id in distinct_ids.difference(indices):
+            word = words[ids.index(font_attributes_id)]
+            indices[font_attributes_id] = self.add_font_attributes(
+                word.word_font_attributes
+            )
+        return _table_indices(indices, distinct_ids, ids)
+
+    def language_indices_of(self, words: List[OCRResultWord]) -> array:
+        ids = [word.language_id for word in words]
+        indices = self.language_id_indices
+        distinct_ids = set(ids)
+        for language_id in distinct_ids.difference(indices):
+            word = words[ids.index(language_id)]
+            indices[language_id] = self.add_language(word.word_recognition_language)
+        return _table_indices(indices, distinct_ids, ids)
+
+    def remap_ids(
+        self, font_attributes_ids: Dict[int, int], language_ids: Dict[int, int]
+    ) -> None:
+        # Follows a compaction of FONT_ATTRIBUTES and LANGUAGES, the values and
+        # indices of the tables stay the same
+        self.font_attributes_ids = [font_attributes_ids[i] for i in self.font_attributes_ids]
+        self.language_ids = [language_ids[i] for i in self.language_ids]
+        self.font_attributes_id_indices = {
+            font_attributes_ids[i]: index
+            for i, index in self.font_attributes_id_indices.items()
+            if i in font_attributes_ids
+        }
+        self.language_id_indices = {
+            language_ids[i]: index
+            for i, index in self.language_id_indices.items()
+            if i in language_ids
+        }
+
+    def copy(self) -> "OCRResultTables":
+        tables = OCRResultTables()
+        for font_attributes in self.font_attributes:
+            tables.append_font_attributes(font_attributes)
+        for language in self.languages:
+            tables.append_language(language)
+        return tables
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "font_attributes": [
+                dict(font_attributes) if font_attributes is not None else None
+                for font_attributes in self.font_attributes
+            ],
+            "languages": self.languages,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "OCRResultTables":
+        tables = cls()
+        for font_attributes in data.get("font_attributes", []):
+            tables.append_font_attributes(font_attributes)
+        for language in data.get("languages", []):
+            tables.append_language(language)
+        return tables
+
+
+def _pack_array(typecode: str, values: Any) -> bytes:
+    # Same bytes as array(typecode, values).tobytes(), but struct converts a
+    # list of numbers faster. Decoding reads them back into an array.
+    data = struct.pack(f"={len(values)}{typecode}", *values)
+    return COLUMN_LENGTH.pack(len(data)) + data
+
+
+def _unpack_array(typecode: str, data: memoryview, offset: int) -> Tuple[array, int]:
+    (length,) = COLUMN_LENGTH.unpack_from(data, offset)
+    offset += 4
+    values = array(typecode)
+    values.frombytes(data[offset : offset + length])
+    return values, offset + length
+
+
+def _pack_bytes(data: bytes) -> bytes:
+    return COLUMN_LENGTH.pack(len(data)) + data
+
+
+def _unpack_bytes(data: memoryview, offset: int) -> Tuple[bytes, int]:
+    (length,) = COLUMN_LENGTH.unpack_from(data, offset)
+    offset += 4
+    return bytes(data[offset : offset + length]), offset + length
+
+
+def _bbox_columns(bboxes: List[Optional[BoundingBox]]) -> Tuple[bytearray, List[int]]:
+    # Usually every element has a box. FLAG_BBOX is 1, so the flag of a
+    # present box is simply True.
+    if None not in bboxes:
+        return bytearray(b"\x01") * len(bboxes), list(chain.from_iterable(bboxes))
+    flags = bytearray(map(operator.is_not, bboxes, repeat(None)))
+    values = list(chain.from_iterable([bbox or NO_BBOX for bbox in bboxes]))
+    return flags, values
+
+
+def _bbox_tuples(flags: bytes, bboxes: array) -> List[Optional[Tuple[int, ...]]]:
+    tuples: List[Optional[Tuple[int, ...]]] = list(struct.iter_unpack("=4i", bboxes))
+    if flags.count(FLAG_BBOX) != len(flags):
+        tuples = [
+            bbox if flag & FLAG_BBOX else None for flag, bbox in zip(flags, tuples)
+        ]
+    return tuples
+
+
+def _table_ids(ids: List[int], indices: array) -> Iterable[int]:
+    # Blocks are often in a single language or font
+    if indices and indices.tobytes() == indices[:1].tobytes() * len(indices):
+        return repeat(ids[indices[0]], len(indices))
+    return [ids[index] for index in indices]
+
+
+def _split_text(text: str, lengths: array) -> List[str]:
+    # Words are separated by a newline, which OCR words do not contain. The
+    # lengths are only needed for words that do.
+    texts = text.split(TEXT_SEPARATOR)
+    if len(texts) == len(lengths):
+        return texts
+    offsets = list(accumulate([length + 1 for length in lengths], initial=0))
+    return [text[start : end - 1] for start, end in zip(offsets, offsets[1:])]
+
+
+def encode_ocr_result_block(
+    block: OCRResultBlock, tables: Optional[OCRResultTables] = None
+) -> bytes:
+    paragraphs = block.paragraphs
+    lines = [line for paragraph in paragraphs for line in paragraph.lines]
+    words = [word for line in lines for word in line.words]
+
+    # Paragraphs
+    paragraph_flags, paragraph_bboxes = _bbox_columns(
+        [paragraph.bbox for paragraph in paragraphs]
+    )
+    paragraph_extra = array("i")
+
+    for index, paragraph in enumerate(paragraphs):
+        if paragraph.is_list_item:
+            paragraph_flags[index] |= FLAG_LIST_ITEM
+        if paragraph.is_crown:
+            paragraph_flags[index] |= FLAG_CROWN
+        paragraph_extra.extend(
+            (
+                len(paragraph.lines),
+                -1 if paragraph.justification is None else int(paragraph.justification),
+                int(paragraph.first_line_indent),
+            )
+        )
+
+    # Lines
+    line_flags, line_bboxes = _bbox_columns([line.bbox for line in lines])
+    baselines = [line.baseline for line in lines]
+    for index, baseline in enumerate(baselines):
+        if baseline is not None:
+            line_flags[index] |= FLAG_BASELINE
+    line_baselines = [
+        value
+        for baseline in baselines
+        for point in (baseline or NO_BASELINE)
+        for value in point
+    ]
+
+    # Words reference their font attributes and language by table index,
+    # the tables are stored in the block unless shared ones are given
+    shared_tables = tables is not None
+    if tables is None:
+        tables = OCRResultTables()
+
+    word_flags, word_bboxes = _bbox_columns([word.bbox for word in words])
+    # Pairs of font attributes and language indices
+    word_references = array("i", bytes(8 * len(words)))
+    word_references[0::2] = tables.font_attributes_indices_of(words)
+    word_references[1::2] = tables.language_indices_of(words)
+
+    texts = [word.text for word in words]
+    block_tables: Dict[str, Any] = {"language": block.language}
+    if not shared_tables:
+        block_tables.update(tables.to_dict())
+    tables_data = json.dumps(block_tables).encode("utf-8")
+
+    block_bbox = block.bbox if block.bbox is not None else NO_BBOX
+
+    return b"".join(
+        (
+            BLOCK_HEADER.pack(
+                CODEC_VERSION,
+                (FLAG_BBOX if block.bbox is not None else 0)
+                | (FLAG_SHARED_TABLES if shared_tables else 0),
+                *block_bbox,
+                block.confidence,
+                len(paragraphs),
+                len(lines),
+                len(words),
+            ),
+            _pack_bytes(tables_data),
+            _pack_bytes(paragraph_flags),
+            _pack_array("i", paragraph_bboxes),
+            _pack_array("d", [paragraph.confidence for paragraph in paragraphs]),
+            _pack_array("i", paragraph_extra),
+            _pack_bytes(line_flags),
+            _pack_array("i", line_bboxes),
+            _pack_array("d", [line.confidence for line in lines]),
+            _pack_array("i", line_baselines),
+            _pack_array("I", [len(line.words) for line in lines]),
+            _pack_bytes(word_flags),
+            _pack_array("i", word_bboxes),
+            _pack_array("d", [word.confidence for word in words]),
+            _pack_array("i", word_references),
+            _pack_array("I", list(map(len, texts))),
+            _pack_bytes(TEXT_SEPARATOR.join(texts).encode("utf-8")),
+        )
+    )
+
+
+def decode_ocr_result_block(
+    data: bytes, tables: Optional[OCRResultTables] = None
+) -> OCRResultBlock:
+    view = memoryview(data)
+    (
+        version,
+        block_flags,
+        left,
+        top,
+        right,
+        bottom,
+        confidence,
+        paragraph_count,
+        line_count,
+        word_count,
+    ) = BLOCK_HEADER.unpack_from(view, 0)
+
+    if version != CODEC_VERSION:
+        raise ValueError(f"Unsupported OCR result encoding version: {version}")
+
+    offset = BLOCK_HEADER.size
+    tables_data, offset = _unpack_bytes(view, offset)
+    block_tables = json.loads(tables_data.decode("utf-8"))
+
+    if not block_flags & FLAG_SHARED_TABLES:
+        tables = OCRResultTables.from_dict(block_tables)
+    elif tables is None:
+        raise ValueError("OCR result block references tables that were not given")
+
+    paragraph_flags, offset = _unpack_bytes(view, offset)
+    paragraph_bboxes, offset = _unpack_array("i", view, offset)
+    paragraph_confidences, offset = _unpack_array("d", view, offset)
+    paragraph_extra, offset = _unpack_array("i", view, offset)
+
+    line_flags, offset = _unpack_bytes(view, offset)
+    line_bboxes, offset = _unpack_array("i", view, offset)
+    line_confidences, offset = _unpack_array("d", view, offset)
+    line_baselines, offset = _unpack_array("i", view, offset)
+    line_word_counts, offset = _unpack_array("I", view, offset)
+
+    word_flags, offset = _unpack_bytes(view, offset)
+    word_bboxes, offset = _unpack_array("i", view, offset)
+    word_confidences, offset = _unpack_array("d", view, offset)
+    word_references, offset = _unpack_array("i", view, offset)
+    word_text_lengths, offset = _unpack_array("I", view, offset)
+    text_data, offset = _unpack_bytes(view, offset)
+
+    block = OCRResultBlock()
+    if block_flags & FLAG_BBOX:
+        block.bbox = (left, top, right, bottom)
+    block.confidence = confidence
+    block.language = block_tables["language"]
+
+    # The words are created in one go from the columns instead of one at a
+    # time, most of the decoding time goes into creating them
+    font_attributes_ids = tables.font_attributes_ids
+    language_ids = tables.language_ids
+    words: List[OCRResultWord] = list(
+        map(
+            OCRResultWord,
+            _split_text(text_data.decode("utf-8"), word_text_lengths),
+            _bbox_tuples(word_flags, word_bboxes),
+            word_confidences,
+            _table_ids(font_attributes_ids, word_references[0::2]),
+            _table_ids(language_ids, word_references[1::2]),
+        )
+    )
+
+    word_offsets = list(accumulate(line_word_counts, initial=0))
+    lines: List[OCRResultLine] = list(
+        map(
+            OCRResultLine,
+            _bbox_tuples(line_flags, line_bboxes),
+            line_confidences,
+            [
+                ((x1, y1), (x2, y2)) if flags & FLAG_BASELINE else None
+                for flags, (x1, y1, x2, y2) in zip(
+                    line_flags, struct.iter_unpack("=4i", line_baselines)
+                )
+            ],
+            [words[start:end] for start, end in zip(word_offsets, word_offsets[1:])],
+        )
+    )
+
+    line_offset = 0
+    for index, bbox in enumerate(_bbox_tuples(paragraph_flags, paragraph_bboxes)):
+        paragraph = OCRResultParagraph()
+        paragraph.bbox = bbox
+        paragraph.confidence = paragraph_confidences[index]
+        paragraph.is_list_item = bool(paragraph_flags[index] & FLAG_LIST_ITEM)
+        paragraph.is_crown = bool(paragraph_flags[index] & FLAG_CROWN)
+        paragraph_line_count, justification, first_line_indent = paragraph_extra[
+            index * 3 : index * 3 + 3
+        ]
+        paragraph.justification = None if justification < 0 else justification
+        paragraph.first_line_indent = first_line_indent
+        paragraph.lines = lines[line_offset : line_offset + paragraph_line_count]
+        line_offset += paragraph_line_count
+        block.add_paragraph(paragraph)
+
+    return block
+
+
+class LazyOCRResultBlock:
+    # Reference to an encoded OCRResultBlock that has not been decoded yet,
+    # source is anything with a read(offset, length) method
+    __slots__ = ("source", "offset", "length", "tables")
+
+    def __init__(
+        self,
+        source: Any,
+        offset: int,
+        length: int,
+        tables: Optional[OCRResultTables] = None,
+    ) -> None:
+        self.source = source
+        self.offset = offset
+        self.length = length
+        self.tables = tables
+
+    def read(self) -> bytes:
+        return self.source.read(self.offset, self.length)
+
+    def load(self) -> OCRResultBlock:
+        return decode_ocr_result_block(self.read(), self.tables)
+
+    def __repr__(self) -> str:
+        return f"LazyOCRResultBlock(offset={self.offset}, length={self.length})"
@@ -0,0 +1,161 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ocr_engine.ocr_result import OCRResultBlock  # type: ignore
+
+# Words can be grouped by any of these, every word belongs to exactly one
+# group of each kind
+GROUPS = ("paragraph", "box", "page", "font")
+
+
+class OCRStatistics:
+    # Word level OCR data of a number of boxes, pulled into flat arrays once,
+    # so aggregates are computed with NumPy instead of walking the results
+    def __init__(self) -> None:
+        self.confidences = np.zeros(0, dtype=np.float32)
+        # NaN for words without a known point size
+        self.point_sizes = np.zeros(0, dtype=np.float32)
+        # (left, top, right, bottom)
+        self.bboxes = np.zeros((0, 4), dtype=np.int32)
+
+        # Group index of every word
+        self.indices: Dict[str, np.ndarray] = {
+            group: np.zeros(0, dtype=np.int32) for group in GROUPS
+        }
+        # Keys of the groups: box ids, page ids, font attributes, and
+        # (box id, paragraph index) pairs
+        self.keys: Dict[str, List[Any]] = {group: [] for group in GROUPS}
+
+    @classmethod
+    def from_blocks(
+        cls, blocks: Iterable[Tuple[str, str, Optional[OCRResultBlock]]]
+    ) -> "OCRStatistics":
+        # blocks are (page id, box id, OCR results) tuples
+        statistics = cls()
+        confidences: List[float] = []
+        point_sizes: List[float] = []
+        bboxes: List[Tuple[int, int, int, int]] = []
+        indices: Dict[str, List[int]] = {group: [] for group in GROUPS}
+        page_indices: Dict[str, int] = {}
+        # Font attributes are interned, so the records can be told apart by id()
+        font_indices: Dict[int, int] = {}
+
+        for page_id, box_id, block in blocks:
+            page_index = page_indices.get(page_id)
+            if page_index is None:
+                page_index = page_indices[page_id] = len(page_indices)
+                statistics.keys["page"].append(page_id)
+
+            box_index = len(statistics.keys["box"])
+            statistics.keys["box"].append(box_id)
+
+            # Boxes loaded from older projects may still carry the raw dict
+            if block is None or isinstance(block, dict):
+                continue
+
+            for paragraph_number, paragraph in enumerate(block.paragraphs):
+                paragraph_index = len(statistics.keys["paragraph"])
+                statistics.keys["paragraph"].append((box_id, paragraph_number))
+
+                for line in paragraph.lines:
+                    for word in line.words:
+                        font_attributes = word.word_font_attributes
+                        font_index = font_indices.get(id(font_attributes))
+                        if font_index is None:
+                            font_index = font_indices[id(font_attributes)] = len(
+                                font_indices
+                            )
+                            statistics.keys["font"].append(font_attributes)
+
+                        confidences.append(word.confidence)
+                        bboxes.append(word.bbox or (0, 0, 0, 0))
+                        indices["paragraph"].append(paragraph_index)
+                        indices["box"].append(box_index)
+                        indices["page"].append(page_index)
+                        indices["font"].append(font_index)
+
+        # Point sizes are looked up once per font instead of once per word
+        font_point_sizes = np.array(
+            [
+                (font_attributes or {}).get("pointsize") or np.nan
+                for font_attributes in statistics.keys["font"]
+            ],
+            dtype=np.float32,
+        )
+
+        statistics.confidences = np.array(confidences, dtype=np.float32)
+        statistics.bboxes = np.array(bboxes, dtype=np.int32).reshape(-1, 4)
+        for group in GROUPS:
+            statistics.indices[group] = np.array(indices[group], dtype=np.int32)
+        statistics.point_sizes = font_point_sizes[statistics.indices["font"]]
+        return statistics
+
+    @classmethod
+    def from_boxes(cls, boxes: Iterable[Any], page_id: str = "") -> "OCRStatistics":
+        return cls.from_blocks((page_id, box.id, box.ocr_results) for box in boxes)
+
+    @classmethod
+    def from_pages(cls, pages: Iterable[Any]) -> "OCRStatistics":
+        return cls.from_blocks(
+            (page.id, box.id, box.ocr_results)
+            for page in pages
+            for box in page.layout.boxes
+        )
+
+    def __len__(self) -> int:
+        return len(self.confidences)
+
+    def word_counts(self, group: str) -> np.ndarray:
+        return np.bincount(self.indices[group], minlength=len(self.keys[group]))
+
+    def group_mean(self, values: np.ndarray, group: str) -> np.ndarray:
+        # Mean of values per group ignoring NaN, NaN for groups without values
+        valid = ~np.isnan(values)
+        group_indices = self.indices[group][valid]
+        group_count = len(self.keys[group])
+
+        totals = np.bincount(group_indices, values[valid], minlength=group_count)
+        counts = np.bincount(group_indices, minlength=group_count)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts > 0, totals / counts, np.nan)
+
+    def mean_confidence(self, group: str = "box") -> np.ndarray:
+        return self.group_mean(self.confidences, group)
+
+    def mean_font_size(self, group: str = "box") -> np.ndarray:
+        return self.group_mean(self.point_sizes, group)
+
+    def low_confidence_counts(self, threshold: float, group: str = "box") -> np.ndarray:
+        low_confidence = self.indices[group][self.confidences < threshold]
+        return np.bincount(low_confidence, minlength=len(self.keys[group]))
+
+    def confidence_histogram(
+        self, bins: int = 10, group: Optional[str] = None
+    ) -> np.ndarray:
+        # Word counts per confidence bin over 0-100, one row per group if given
+        bin_indices = np.clip(
+            (self.confidences * bins / 100).astype(np.int32), 0, bins - 1
+        )
+
+        if group is None:
+            return np.bincount(bin_indices, minlength=bins)
+
+        group_count = len(self.keys[group])
+        flat = np.bincount(
+            self.indices[group] * bins + bin_indices, minlength=group_count * bins
+        )
+        return flat.reshape(group_count, bins)
+
+    def per_group(self, values: np.ndarray, group: str = "box") -> Dict[Any, Any]:
+        # Maps group keys to values, e.g. per_group(mean_confidence("box"))
+        # gives the mean confidence per box id
+        keys = self.keys[group]
+        if group == "font":
+            # Font attribute records are not hashable
+            keys = [
+                tuple(font_attributes.items()) if font_attributes is not None else None
+                for font_attributes in keys
+            ]
+        return dict(zip(keys, values.tolist()))
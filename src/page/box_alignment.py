@@ -0,0 +1,164 @@
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+from page.reading_order import find_gaps  # type: ignore
+
+# Rectangles are (left, top, right, bottom) rows, right and bottom exclusive
+
+# Components smaller than this many pixels are treated as noise
+MIN_COMPONENT_AREA = 4
+# Upper bound for the number of box/component pairs tested at once
+MAX_PAIRS_PER_CHUNK = 4_000_000
+
+
+def binarize_image(image: np.ndarray) -> np.ndarray:
+    # Ink mask of the page, dark pixels on light paper
+    if image.ndim == 3:
+        if image.shape[2] == 4:
+            image = cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY)
+        else:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if image.dtype != np.uint8:
+        image = cv2.normalize(image, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+
+    _, ink = cv2.threshold(image, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return ink
+
+
+def ink_components(ink: np.ndarray, min_area: int = MIN_COMPONENT_AREA) -> np.ndarray:
+    # Bounding rectangles of the connected ink components
+    _, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    # Label 0 is the background
+    stats = stats[1:]
+    stats = stats[stats[:, cv2.CC_STAT_AREA] >= min_area]
+
+    left = stats[:, cv2.CC_STAT_LEFT]
+    top = stats[:, cv2.CC_STAT_TOP]
+    return np.stack(
+        [
+            left,
+            top,
+            left + stats[:, cv2.CC_STAT_WIDTH],
+            top + stats[:, cv2.CC_STAT_HEIGHT],
+        ],
+        axis=1,
+    ).astype(np.int64)
+
+
+def component_membership(rects: np.ndarray, components: np.ndarray) -> np.ndarray:
+    # (boxes, components) matrix, components belong to every box containing
+    # their center
+    centers_x = (components[:, 0] + components[:, 2]) / 2
+    centers_y = (components[:, 1] + components[:, 3]) / 2
+    return (
+        (centers_x >= rects[:, 0:1])
+        & (centers_x < rects[:, 2:3])
+        & (centers_y >= rects[:, 1:2])
+        & (centers_y < rects[:, 3:4])
+    )
+
+
+def content_rects(
+    rects: np.ndarray, components: np.ndarray, padding: int = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Bounding rectangle of the ink of every box and whether it has any. The
+    # components are used whole, so boxes also grow to take in characters
+    # they cut off.
+    rects = np.asarray(rects, dtype=np.int64).reshape(-1, 4)
+    result = rects.copy()
+    has_content = np.zeros(len(rects), dtype=bool)
+
+    if len(components) == 0 or len(rects) == 0:
+        return result, has_content
+
+    chunk_size = max(1, MAX_PAIRS_PER_CHUNK // len(components))
+    big = np.iinfo(np.int64).max
+    small = np.iinfo(np.int64).min
+
+    for start in range(0, len(rects), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        member = component_membership(rects[chunk], components)
+
+        has_content[chunk] = member.any(axis=1)
+        result[chunk, 0] = np.where(member, components[:, 0], big).min(axis=1)
+        result[chunk, 1] = np.where(member, components[:, 1], big).min(axis=1)
+        result[chunk, 2] = np.where(member, components[:, 2], small).max(axis=1)
+        result[chunk, 3] = np.where(member, components[:, 3], small).max(axis=1)
+
+    result[has_content, :2] -= padding
+    result[has_content, 2:] += padding
+    result[~has_content] = rects[~has_content]
+    return result, has_content
+
+
+def iou_matrix(rects: np.ndarray) -> np.ndarray:
+    rects = np.asarray(rects, dtype=np.float64).reshape(-1, 4)
+    areas = (rects[:, 2] - rects[:, 0]) * (rects[:, 3] - rects[:, 1])
+
+    widths = np.clip(
+        np.minimum(rects[:, None, 2], rects[None, :, 2])
+        - np.maximum(rects[:, None, 0], rects[None, :, 0]),
+        0,
+        None,
+    )
+    heights = np.clip(
+        np.minimum(rects[:, None, 3], rects[None, :, 3])
+        - np.maximum(rects[:, None, 1], rects[None, :, 1]),
+        0,
+        None,
+    )
+    intersections = widths * heights
+    unions = areas[:, None] + areas[None, :] - intersections
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(unions > 0, intersections / unions, 0.0)
+
+
+def merge_suggestions(
+    rects: np.ndarray, threshold: float = 0.5
+) -> List[Tuple[int, int]]:
+    # Index pairs of boxes overlapping by more than threshold
+    iou = iou_matrix(rects)
+    first, second = np.nonzero(np.triu(iou > threshold, k=1))
+    return list(zip(first.tolist(), second.tolist()))
+
+
+def split_suggestions(
+    rects: np.ndarray, components: np.ndarray, min_gap: int
+) -> Dict[int, List[Tuple[int, int, int, int]]]:
+    # Boxes whose ink falls apart into blocks separated by at least min_gap,
+    # mapped to the rectangles of these blocks
+    rects = np.asarray(rects, dtype=np.int64).reshape(-1, 4)
+    suggestions: Dict[int, List[Tuple[int, int, int, int]]] = {}
+
+    if len(components) == 0:
+        return suggestions
+
+    chunk_size = max(1, MAX_PAIRS_PER_CHUNK // len(components))
+    for start in range(0, len(rects), chunk_size):
+        member = component_membership(rects[start : start + chunk_size], components)
+
+        for offset, row in enumerate(member):
+            box_components = components[row]
+            if len(box_components) < 2:
+                continue
+
+            for axis in (1, 0):
+                order, cuts = find_gaps(
+                    box_components[:, axis], box_components[:, axis + 2], min_gap
+                )
+                if cuts.size:
+                    suggestions[start + offset] = [
+                        (
+                            int(part[:, 0].min()),
+                            int(part[:, 1].min()),
+                            int(part[:, 2].max()),
+                            int(part[:, 3].max()),
+                        )
+                        for part in np.split(box_components[order], cuts)
+                    ]
+                    break
+
+    return suggestions
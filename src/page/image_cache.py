@@ -0,0 +1,110 @@
+from collections import OrderedDict
+import os
+import threading
+from typing import Callable, Tuple
+
+import cv2
+import numpy as np
+from loguru import logger
+
+DEFAULT_MEMORY_BUDGET = 512 * 1024 * 1024
+
+CacheKey = Tuple[str, int, int]
+
+
+def load_image(image_path: str) -> np.ndarray:
+    image = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise FileNotFoundError(f"Could not read image: {image_path}")
+    return image
+
+
+# Reduced decoding flags by scale, JPEG decoders skip the dropped pixels
+# instead of decoding and scaling the full image
+REDUCED_GRAYSCALE_FLAGS = [
+    (8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+    (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+    (2, cv2.IMREAD_REDUCED_GRAYSCALE_2),
+]
+
+
+def load_reduced_image(image_path: str, max_scale: int) -> np.ndarray:
+    # Grayscale image scaled down by up to max_scale, for a rough look at a
+    # page. It isn't cached, so the full images of other pages stay cached.
+    flag = cv2.IMREAD_GRAYSCALE
+    for scale, reduced_flag in REDUCED_GRAYSCALE_FLAGS:
+        if scale <= max_scale:
+            flag = reduced_flag
+            break
+
+    image = cv2.imread(image_path, flag)
+    if image is None:
+        raise FileNotFoundError(f"Could not read image: {image_path}")
+    return image
+
+
+class ImageCache:
+    # Decoded page images shared by all pages, least recently used ones are
+    # dropped once their total size exceeds the memory budget. Entries are
+    # keyed by path, modification time and size, so changed files are read
+    # again.
+    def __init__(self, memory_budget: int = DEFAULT_MEMORY_BUDGET) -> None:
+        self.memory_budget = memory_budget
+        self.memory_used = 0
+        self.images: "OrderedDict[CacheKey, np.ndarray]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.images)
+
+    def key(self, image_path: str) -> CacheKey:
+        stat = os.stat(image_path)
+        return (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size)
+
+    def get(
+        self, image_path: str, loader: Callable[[str], np.ndarray] = load_image
+    ) -> np.ndarray:
+        key = self.key(image_path)
+
+        with self.lock:
+            image = self.images.get(key)
+            if image is not None:
+                self.images.move_to_end(key)
+                return image
+
+        # Decoding happens outside the lock, so other pages can be served
+        image = loader(image_path)
+
+        with self.lock:
+            if key not in self.images:
+                self.images[key] = image
+                self.memory_used += image.nbytes
+                self.evict()
+        return image
+
+    def evict(self) -> None:
+        # The most recent image is kept even if it alone exceeds the budget
+        while self.memory_used > self.memory_budget and len(self.images) > 1:
+            _, image = self.images.popitem(last=False)
+            self.memory_used -= image.nbytes
+
+    def set_memory_budget(self, memory_budget: int) -> None:
+        with self.lock:
+            self.memory_budget = memory_budget
+            self.evict()
+        logger.debug(f"Image cache budget set to {memory_budget} bytes")
+
+    def discard(self, image_path: str) -> None:
+        path = os.path.abspath(image_path)
+
+        with self.lock:
+            for key in [key for key in self.images if key[0] == path]:
+                self.memory_used -= self.images.pop(key).nbytes
+
+    def clear(self) -> None:
+        with self.lock:
+            self.images.clear()
+            self.memory_used = 0
+
+
+image_cache = ImageCache()
@@ -0,0 +1,251 @@
+from dataclasses import dataclass
+from functools import lru_cache
+import os
+import struct
+from typing import BinaryIO, Callable, Dict, Optional, Tuple
+
+from PIL import Image
+
+# Probed files remembered by path, modification time and size
+PROBE_CACHE_SIZE = 16384
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Channels per PNG color type
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+# JPEG start of frame markers, the others in C0-CF are DHT, JPG and DAC
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# JPEG markers without a length
+JPEG_STANDALONE_MARKERS = set(range(0xD0, 0xDA)) | {0x01}
+
+TIFF_WIDTH = 256
+TIFF_HEIGHT = 257
+TIFF_BITS_PER_SAMPLE = 258
+TIFF_SAMPLES_PER_PIXEL = 277
+TIFF_X_RESOLUTION = 282
+TIFF_Y_RESOLUTION = 283
+TIFF_RESOLUTION_UNIT = 296
+# Sizes of the TIFF field types used here: BYTE, ASCII, SHORT, LONG, RATIONAL
+TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8}
+
+CM_PER_INCH = 2.54
+METERS_PER_INCH = 0.0254
+
+# Bits per sample of PIL image modes, for formats without an own parser
+PIL_MODE_BITS = {"1": 1, "I;16": 16, "I;16B": 16, "I": 32, "F": 32}
+
+
+@dataclass(frozen=True)
+class ImageInfo:
+    width: int
+    height: int
+    # Bits per sample
+    bit_depth: int
+    channels: int
+    # Horizontal and vertical resolution if the file has one
+    dpi: Optional[Tuple[float, float]] = None
+
+
+def probe_png(file: BinaryIO) -> Optional[ImageInfo]:
+    if file.read(8) != PNG_SIGNATURE:
+        return None
+
+    info = None
+    dpi = None
+    while True:
+        header = file.read(8)
+        if len(header) < 8:
+            break
+        length, chunk_type = struct.unpack(">I4s", header)
+
+        if chunk_type == b"IHDR":
+            width, height, bit_depth, color_type = struct.unpack(
+                ">IIBB", file.read(10)
+            )
+            info = (width, height, bit_depth, PNG_CHANNELS.get(color_type, 1))
+            file.seek(length - 10 + 4, os.SEEK_CUR)
+        elif chunk_type == b"pHYs":
+            x, y, unit = struct.unpack(">IIB", file.read(9))
+            if unit == 1:
+                dpi = (x * METERS_PER_INCH, y * METERS_PER_INCH)
+            file.seek(4, os.SEEK_CUR)
+        elif chunk_type in (b"IDAT", b"IEND"):
+            # pHYs has to come before the image data
+            break
+        else:
+            file.seek(length + 4, os.SEEK_CUR)
+
+    if info is None:
+        return None
+    return ImageInfo(*info, dpi=dpi)
+
+
+def read_tiff_fields(read: Callable[[int, int], bytes]) -> Dict[int, Tuple]:
+    # Fields of the first IFD of a TIFF structure, read(position, length)
+    # returns bytes relative to its start. Only the header, the IFD and the
+    # values it points to are read.
+    byte_order = read(0, 2)
+    if byte_order == b"II":
+        order = "<"
+    elif byte_order == b"MM":
+        order = ">"
+    else:
+        return {}
+
+    magic, ifd_offset = struct.unpack(f"{order}HI", read(2, 6))
+    if magic != 42:
+        return {}
+
+    (entry_count,) = struct.unpack(f"{order}H", read(ifd_offset, 2))
+    entries = read(ifd_offset + 2, entry_count * 12)
+    fields = {}
+
+    for index in range(entry_count):
+        tag, field_type, count, value = struct.unpack_from(
+            f"{order}HHI4s", entries, index * 12
+        )
+        size = TIFF_TYPE_SIZES.get(field_type)
+        if size is None:
+            continue
+
+        if size * count > 4:
+            (value_offset,) = struct.unpack(f"{order}I", value)
+            value = read(value_offset, size * count)
+        if len(value) < size * count:
+            continue
+
+        if field_type == 3:
+            fields[tag] = struct.unpack_from(f"{order}{count}H", value)
+        elif field_type == 4:
+            fields[tag] = struct.unpack_from(f"{order}{count}I", value)
+        elif field_type == 5:
+            numbers = struct.unpack_from(f"{order}{2 * count}I", value)
+            fields[tag] = tuple(
+                numerator / denominator if denominator else 0.0
+                for numerator, denominator in zip(numbers[::2], numbers[1::2])
+            )
+        else:
+            fields[tag] = tuple(value[:count])
+
+    return fields
+
+
+def tiff_fields(data: bytes, offset: int = 0) -> Dict[int, Tuple]:
+    # TIFF structure at offset in data, e.g. the Exif data of JPEG files
+    return read_tiff_fields(
+        lambda position, length: data[offset + position : offset + position + length]
+    )
+
+
+def tiff_dpi(fields: Dict[int, Tuple]) -> Optional[Tuple[float, float]]:
+    if TIFF_X_RESOLUTION not in fields or TIFF_Y_RESOLUTION not in fields:
+        return None
+
+    x, y = fields[TIFF_X_RESOLUTION][0], fields[TIFF_Y_RESOLUTION][0]
+    unit = fields.get(TIFF_RESOLUTION_UNIT, (2,))[0]
+    if unit == 2:
+        return (x, y)
+    if unit == 3:
+        return (x * CM_PER_INCH, y * CM_PER_INCH)
+    return None
+
+
+def probe_tiff(file: BinaryIO) -> Optional[ImageInfo]:
+    # Seeks to the IFD wherever it is, nothing else of the file is read
+    def read(position: int, length: int) -> bytes:
+        file.seek(position)
+        return file.read(length)
+
+    try:
+        fields = read_tiff_fields(read)
+    except struct.error:
+        return None
+    if TIFF_WIDTH not in fields or TIFF_HEIGHT not in fields:
+        return None
+
+    return ImageInfo(
+        fields[TIFF_WIDTH][0],
+        fields[TIFF_HEIGHT][0],
+        fields.get(TIFF_BITS_PER_SAMPLE, (1,))[0],
+        fields.get(TIFF_SAMPLES_PER_PIXEL, (1,))[0],
+        tiff_dpi(fields),
+    )
+
+
+def probe_jpeg(file: BinaryIO) -> Optional[ImageInfo]:
+    if file.read(2) != b"\xff\xd8":
+        return None
+
+    dpi = None
+    while True:
+        byte = file.read(1)
+        if not byte:
+            return None
+        if byte != b"\xff":
+            continue
+
+        marker = file.read(1)
+        # Fill bytes
+        while marker == b"\xff":
+            marker = file.read(1)
+        if not marker:
+            return None
+
+        marker_type = marker[0]
+        if marker_type in JPEG_STANDALONE_MARKERS:
+            continue
+
+        (length,) = struct.unpack(">H", file.read(2))
+        segment = file.read(length - 2)
+
+        if marker_type in JPEG_SOF_MARKERS:
+            bit_depth, height, width, channels = struct.unpack_from(">BHHB", segment)
+            return ImageInfo(width, height, bit_depth, channels, dpi)
+        elif marker_type == 0xE0 and segment[:5] == b"JFIF\x00" and dpi is None:
+            unit, x, y = struct.unpack_from(">BHH", segment, 7)
+            if unit == 1:
+                dpi = (float(x), float(y))
+            elif unit == 2:
+                dpi = (x * CM_PER_INCH, y * CM_PER_INCH)
+        elif marker_type == 0xE1 and segment[:6] == b"Exif\x00\x00":
+            try:
+                dpi = dpi or tiff_dpi(tiff_fields(segment, 6))
+            except struct.error:
+                pass
+
+
+def probe_pil(image_path: str) -> ImageInfo:
+    # Other formats, PIL parses only the header until the pixels are used
+    with Image.open(image_path) as image:
+        dpi = image.info.get("dpi")
+        return ImageInfo(
+            image.width,
+            image.height,
+            PIL_MODE_BITS.get(image.mode, 8),
+            len(image.getbands()),
+            (float(dpi[0]), float(dpi[1])) if dpi else None,
+        )
+
+
+@lru_cache(maxsize=PROBE_CACHE_SIZE)
+def probe_file(image_path: str, mtime_ns: int, size: int) -> ImageInfo:
+    with open(image_path, "rb") as file:
+        start = file.read(4)
+        file.seek(0)
+
+        if start.startswith(PNG_SIGNATURE[:4]):
+            info = probe_png(file)
+        elif start.startswith(b"\xff\xd8"):
+            info = probe_jpeg(file)
+        elif start in (b"II*\x00", b"MM\x00*"):
+            info = probe_tiff(file)
+        else:
+            info = None
+
+    return info if info is not None else probe_pil(image_path)
+
+
+def probe_image(image_path: str) -> ImageInfo:
+    # Size, bit depth and resolution from the file header, without decoding
+    # the image. Results are cached until the file changes.
+    stat = os.stat(image_path)
+    return probe_file(os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size)
@@ -0,0 +1,345 @@
+from collections import deque
+import time
+from typing import Any, Callable, Deque, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from page.ocr_box import OCRBox  # type: ignore
+from page.box_type import BoxType  # type: ignore
+from page.page_layout import PageLayout  # type: ignore
+
+Geometry = Tuple[int, int, int, int]
+
+# Source passed to box callbacks for changes made by undo and redo
+HISTORY_SOURCE = "History"
+
+DEFAULT_MEMORY_LIMIT = 16 * 1024 * 1024
+# Edits of the same box this close together are merged into one step
+MERGE_INTERVAL = 1.0
+
+# Rough memory costs used for the limit, the actual sizes vary by platform
+COMMAND_SIZE = 200
+WORD_SIZE = 250
+
+
+def box_geometry(box: OCRBox) -> Geometry:
+    return (box.x, box.y, box.width, box.height)
+
+
+def estimate_box_size(box: OCRBox) -> int:
+    # Results that were never decoded stay in the project file
+    if box.pending_ocr_results() is not None:
+        return COMMAND_SIZE
+
+    ocr_results = box.ocr_results
+    if ocr_results is None or isinstance(ocr_results, dict):
+        return COMMAND_SIZE
+
+    word_count = sum(
+        len(line.words) for paragraph in ocr_results.paragraphs for line in paragraph.lines
+    )
+    return COMMAND_SIZE + word_count * WORD_SIZE
+
+
+class LayoutCommand:
+    # A single change that was already applied to the layout, only storing
+    # what is needed to revert it
+    def undo(self, layout: PageLayout) -> None:
+        raise NotImplementedError
+
+    def redo(self, layout: PageLayout) -> None:
+        raise NotImplementedError
+
+    def size(self) -> int:
+        return COMMAND_SIZE
+
+    def merge(self, other: "LayoutCommand") -> bool:
+        # Takes over a following command of the same kind if possible
+        return False
+
+
+class GeometryCommand(LayoutCommand):
+    def __init__(self, box_id: str, before: Geometry, after: Geometry) -> None:
+        self.box_id = box_id
+        self.before = before
+        self.after = after
+
+    def apply(self, layout: PageLayout, geometry: Geometry) -> None:
+        box = layout.get_box_by_id(self.box_id)
+        if box is not None:
+            box.set_geometry(*geometry)
+            box.notify_callbacks(HISTORY_SOURCE)
+
+    def undo(self, layout: PageLayout) -> None:
+        self.apply(layout, self.before)
+
+    def redo(self, layout: PageLayout) -> None:
+        self.apply(layout, self.after)
+
+    def merge(self, other: LayoutCommand) -> bool:
+        if not isinstance(other, GeometryCommand) or other.box_id != self.box_id:
+            return False
+        self.after = other.after
+        return True
+
+
+class TextCommand(LayoutCommand):
+    def __init__(self, box_id: str, before: str, after: str) -> None:
+        self.box_id = box_id
+        self.before = before
+        self.after = after
+
+    def apply(self, layout: PageLayout, text: str) -> None:
+        box = layout.get_box_by_id(self.box_id)
+        if box is not None:
+            box.user_text = text
+            box.notify_callbacks(HISTORY_SOURCE)
+
+    def undo(self, layout: PageLayout) -> None:
+        self.apply(layout, self.before)
+
+    def redo(self, layout: PageLayout) -> None:
+        self.apply(layout, self.after)
+
+    def size(self) -> int:
+        return COMMAND_SIZE + 2 * (len(self.before) + len(self.after))
+
+    def merge(self, other: LayoutCommand) -> bool:
+        if not isinstance(other, TextCommand) or other.box_id != self.box_id:
+            return False
+        self.after = other.after
+        return True
+
+
+class ReplaceBoxCommand(LayoutCommand):
+    # Type conversions replace the box by one with the same id
+    def __init__(self, before: OCRBox, after: OCRBox) -> None:
+        self.before = before
+        self.after = after
+
+    def apply(self, layout: PageLayout, old_box: OCRBox, new_box: OCRBox) -> None:
+        box = layout.get_box_by_id(old_box.id)
+        if box is not None:
+            layout.replace_box(layout.index_of(box), new_box)
+
+    def undo(self, layout: PageLayout) -> None:
+        self.apply(layout, self.after, self.before)
+
+    def redo(self, layout: PageLayout) -> None:
+        self.apply(layout, self.before, self.after)
+
+    def size(self) -> int:
+        # Both boxes share the same OCR results
+        return COMMAND_SIZE + estimate_box_size(self.before)
+
+
+class InsertBoxesCommand(LayoutCommand):
+    def __init__(self, entries: List[Tuple[int, OCRBox]]) -> None:
+        # (index, box) pairs in ascending index order
+        self.entries = entries
+        self.entries_size = sum(estimate_box_size(box) for _, box in entries)
+
+    def insert(self, layout: PageLayout) -> None:
+        with layout.batch():
+            for index, box in self.entries:
+                layout.add_box(box, index)
+
+    def remove(self, layout: PageLayout) -> None:
+        layout.remove_boxes(box.id for _, box in self.entries)
+
+    def undo(self, layout: PageLayout) -> None:
+        self.remove(layout)
+
+    def redo(self, layout: PageLayout) -> None:
+        self.insert(layout)
+
+    def size(self) -> int:
+        return COMMAND_SIZE + self.entries_size
+
+
+class RemoveBoxesCommand(InsertBoxesCommand):
+    def undo(self, layout: PageLayout) -> None:
+        self.insert(layout)
+
+    def redo(self, layout: PageLayout) -> None:
+        self.remove(layout)
+
+
+class LayoutHistory:
+    # Undo and redo for layout edits. Edits go through the methods below,
+    # which apply them and record a command holding only the difference, so
+    # undoing and redoing costs as much as the edit itself. The oldest steps
+    # are dropped once the estimated memory use exceeds memory_limit.
+    def __init__(
+        self,
+        layout: PageLayout,
+        memory_limit: int = DEFAULT_MEMORY_LIMIT,
+        page: Optional[Any] = None,
+    ) -> None:
+        self.layout = layout
+        self.memory_limit = memory_limit
+        # Page of the layout, type conversions go through it so its
+        # recognition callbacks see the new boxes
+        self.page = page
+        # Called with every new step, not with edits merged into the last one
+        self._push_callbacks: List[Callable[[LayoutCommand], None]] = []
+        self.undo_stack: Deque[LayoutCommand] = deque()
+        self.redo_stack: List[LayoutCommand] = []
+        self.memory_used = 0
+        # Whether the last command may still take over the next one
+        self._merge_open = False
+        self._merge_until = 0.0
+
+    def add_push_callback(self, callback: Callable[[LayoutCommand], None]) -> None:
+        if callback not in self._push_callbacks:
+            self._push_callbacks.append(callback)
+
+    def remove_push_callback(self, callback: Callable[[LayoutCommand], None]) -> None:
+        if callback in self._push_callbacks:
+            self._push_callbacks.remove(callback)
+
+    def can_undo(self) -> bool:
+        return len(self.undo_stack) > 0
+
+    def can_redo(self) -> bool:
+        return len(self.redo_stack) > 0
+
+    def clear(self) -> None:
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.memory_used = 0
+        self._merge_open = False
+
+    def push(self, command: LayoutCommand, merge: bool = False) -> None:
+        # Records an already applied command
+        for redo_command in self.redo_stack:
+            self.memory_used -= redo_command.size()
+        self.redo_stack.clear()
+
+        now = time.monotonic()
+        if merge and self._merge_open and self.undo_stack and now <= self._merge_until:
+            top = self.undo_stack[-1]
+            top_size = top.size()
+
+            if top.merge(command):
+                self.memory_used += top.size() - top_size
+                self._merge_until = now + MERGE_INTERVAL
+                return
+
+        self.undo_stack.append(command)
+        self.memory_used += command.size()
+        self._merge_open = merge
+        self._merge_until = now + MERGE_INTERVAL
+        self.enforce_memory_limit()
+
+        for callback in self._push_callbacks:
+            callback(command)
+
+    def end_merge(self) -> None:
+        # Ends a drag or typing sequence, the next edit starts a new step
+        self._merge_open = False
+
+    def enforce_memory_limit(self) -> None:
+        # The latest step is always kept
+        while self.memory_used > self.memory_limit and len(self.undo_stack) > 1:
+            self.memory_used -= self.undo_stack.popleft().size()
+            logger.debug("Dropped oldest undo step to stay within the memory limit")
+
+    def undo(self) -> bool:
+        if not self.undo_stack:
+            return False
+
+        command = self.undo_stack.pop()
+        with self.layout.batch():
+            command.undo(self.layout)
+        self.redo_stack.append(command)
+        self._merge_open = False
+        self.notify_replaced(command)
+        return True
+
+    def redo(self) -> bool:
+        if not self.redo_stack:
+            return False
+
+        command = self.redo_stack.pop()
+        with self.layout.batch():
+            command.redo(self.layout)
+        self.undo_stack.append(command)
+        self._merge_open = False
+        self.notify_replaced(command)
+        return True
+
+    def notify_replaced(self, command: LayoutCommand) -> None:
+        if self.page is None or not isinstance(command, ReplaceBoxCommand):
+            return
+        box = self.layout.get_box_by_id(command.after.id)
+        if box is not None:
+            self.page.notify_recognition_callbacks([box])
+
+    def set_geometry(
+        self, box: OCRBox, x: int, y: int, width: int, height: int, merge: bool = False
+    ) -> None:
+        before = box_geometry(box)
+        box.set_geometry(x, y, width, height)
+        self.push(GeometryCommand(box.id, before, box_geometry(box)), merge)
+
+    def move_box(
+        self, box: OCRBox, x: int, y: int, source: Optional[str] = None, merge: bool = True
+    ) -> None:
+        # Moves during a drag are merged into a single step by default
+        before = box_geometry(box)
+        box.update_position(x, y, source)
+        self.push(GeometryCommand(box.id, before, box_geometry(box)), merge)
+
+    def resize_box(
+        self,
+        box: OCRBox,
+        width: int,
+        height: int,
+        source: Optional[str] = None,
+        merge: bool = True,
+    ) -> None:
+        before = box_geometry(box)
+        box.update_size(width, height, source)
+        self.push(GeometryCommand(box.id, before, box_geometry(box)), merge)
+
+    def set_user_text(self, box: OCRBox, text: str, merge: bool = True) -> None:
+        before = box.user_text
+        box.user_text = text
+        self.push(TextCommand(box.id, before, text), merge)
+
+    def convert_box(self, box: OCRBox, box_type: BoxType) -> OCRBox:
+        index = self.layout.index_of(box)
+        if self.page is not None:
+            self.page.convert_box(index, box_type)
+            new_box = self.layout.boxes[index]
+        else:
+            new_box = box.convert_to(box_type)
+            self.layout.replace_box(index, new_box)
+        self.push(ReplaceBoxCommand(box, new_box))
+        return new_box
+
+    def add_boxes(self, boxes: Iterable[OCRBox], index: Optional[int] = None) -> None:
+        boxes = list(boxes)
+        if index is None:
+            index = len(self.layout)
+        index = min(max(index, 0), len(self.layout))
+
+        self.layout.add_boxes(boxes, index)
+        self.push(
+            InsertBoxesCommand(
+                [(index + offset, box) for offset, box in enumerate(boxes)]
+            )
+        )
+
+    def remove_boxes(self, box_ids: Iterable[str]) -> None:
+        entries = []
+        for box_id in set(box_ids):
+            box = self.layout.get_box_by_id(box_id)
+            if box is not None:
+                entries.append((self.layout.index_of(box), box))
+
+        if entries:
+            entries.sort(key=lambda entry: entry[0])
+            self.layout.remove_boxes(box.id for _, box in entries)
+            self.push(RemoveBoxesCommand(entries))
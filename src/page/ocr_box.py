@@ -1,15 +1,44 @@
 from dataclasses import dataclass
-from typing import Callable, Dict, Type, Optional
+from itertools import count
+from typing import Any, Callable, Dict, Type, Optional, Union
 import uuid
 
 from loguru import logger
 from ocr_engine.ocr_result import (  # type: ignore
     OCRResultBlock,
 )
+from ocr_engine.ocr_result_codec import LazyOCRResultBlock  # type: ignore
 from page.box_type import BoxType  # type: ignore
 
+# Box ids only have to be unique, a random prefix per process and a counter
+# are a lot cheaper than a uuid4() per box
+BOX_ID_PREFIX = uuid.uuid4().hex[:16]
+box_id_counter = count()
+
+
+def new_box_id() -> str:
+    return f"{BOX_ID_PREFIX}-{next(box_id_counter):x}"
+
 
 class OCRBox:
+    __slots__ = (
+        "_layout",
+        "id",
+        "_order",
+        "x",
+        "y",
+        "width",
+        "height",
+        "type",
+        "class_",
+        "tag",
+        "confidence",
+        "_ocr_results",
+        "ocr_fingerprint",
+        "_callbacks",
+        "_update_source",
+    )
+
     def __init__(
         self,
         x: int,
@@ -18,8 +47,11 @@ class OCRBox:
         height: int,
         type: BoxType = BoxType.UNKNOWN,
     ) -> None:
-        self.id: str = str(uuid.uuid4())
-        self.order = 0
+        # Layout the box belongs to, told about geometry changes so it can keep
+        # its spatial index up to date
+        self._layout: Any = None
+        self.id: str = new_box_id()
+        self._order: int = 0
         self.x: int = x
         self.y: int = y
         self.width: int = width
@@ -29,24 +61,98 @@ class OCRBox:
         self.tag: str = ""
         self.confidence: float = 0.0
 
-        self.ocr_results: Optional[OCRResultBlock] = None
-        self._callbacks: list[Callable] = []
+        self._ocr_results: Optional[Union[OCRResultBlock, LazyOCRResultBlock]] = None
+        # Fingerprint of geometry, type and page the OCR results were produced
+        # for, see Page.recognition_fingerprint()
+        self.ocr_fingerprint: Optional[str] = None
+        # Most boxes never get callbacks, the list is created on demand
+        self._callbacks: Optional[list[Callable]] = None
         self._update_source: Optional[str] = None
 
+    @property
+    def order(self) -> int:
+        # Layouts renumber their boxes lazily, on the first read after a change
+        if self._layout is not None:
+            self._layout.ensure_order()
+        return self._order
+
+    @order.setter
+    def order(self, order: int) -> None:
+        self._order = order
+
+    @property
+    def ocr_results(self) -> Optional[OCRResultBlock]:
+        # OCR results of loaded projects are only decoded on first access
+        if isinstance(self._ocr_results, LazyOCRResultBlock):
+            self._ocr_results = self._ocr_results.load()
+        return self._ocr_results
+
+    @ocr_results.setter
+    def ocr_results(
+        self, ocr_results: Optional[Union[OCRResultBlock, LazyOCRResultBlock]]
+    ) -> None:
+        self._ocr_results = ocr_results
+
+    def has_ocr_results(self) -> bool:
+        return self._ocr_results is not None
+
+    def fingerprint(self, page_fingerprint: str) -> str:
+        return f"{self.x},{self.y},{self.width},{self.height},{self.type.name},{page_fingerprint}"
+
+    def is_dirty(self, page_fingerprint: str) -> bool:
+        # The OCR results are missing or stale
+        return self.ocr_fingerprint != self.fingerprint(page_fingerprint)
+
+    def mark_recognized(self, page_fingerprint: str) -> None:
+        self.ocr_fingerprint = self.fingerprint(page_fingerprint)
+
+    def pending_ocr_results(self) -> Optional[LazyOCRResultBlock]:
+        if isinstance(self._ocr_results, LazyOCRResultBlock):
+            return self._ocr_results
+        return None
+
+    def __getstate__(self) -> Dict:
+        # Copies do not belong to the layout of the original box
+        state = {
+            name: getattr(self, name)
+            for cls in type(self).__mro__
+            for name in getattr(cls, "__slots__", ())
+            if hasattr(self, name)
+        }
+        state["_layout"] = None
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def position(self) -> Dict[str, int]:
         return {"x": self.x, "y": self.y, "width": self.width, "height": self.height}
 
+    def set_geometry(self, x: int, y: int, width: int, height: int) -> None:
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.geometry_changed()
+
+    def geometry_changed(self) -> None:
+        if self._layout is not None:
+            self._layout.box_geometry_changed(self)
+
     def expand(self, expansion_amount: int) -> None:
         self.x -= expansion_amount
         self.y -= expansion_amount
         self.width += 2 * expansion_amount
         self.height += 2 * expansion_amount
+        self.geometry_changed()
 
     def shrink(self, shrink_amount: int) -> None:
         self.x += shrink_amount
         self.y += shrink_amount
         self.width -= 2 * shrink_amount
         self.height -= 2 * shrink_amount
+        self.geometry_changed()
 
     def contains(self, other: "OCRBox") -> bool:
         return (
@@ -73,6 +179,7 @@ class OCRBox:
         new_box.class_ = self.class_
         new_box.tag = self.tag
         new_box.confidence = self.confidence
+        new_box.ocr_fingerprint = self.ocr_fingerprint
 
         if box_type in [
             BoxType.FLOWING_IMAGE,
@@ -83,10 +190,10 @@ class OCRBox:
         ]:
             new_box.ocr_results = None
         else:
-            new_box.ocr_results = self.ocr_results
+            new_box.ocr_results = self._ocr_results
         return new_box
 
-    def to_dict(self) -> Dict:
+    def to_dict(self, include_ocr_results: bool = True) -> Dict:
         return {
             "id": self.id,
             "position": self.position(),
@@ -95,27 +202,41 @@ class OCRBox:
             "tag": self.tag,
             "confidence": self.confidence,
             "order": self.order,
-            "ocr_results": self.ocr_results.to_dict() if self.ocr_results else None,
+            "ocr_fingerprint": self.ocr_fingerprint,
+            "ocr_results": (
+                self.ocr_results.to_dict()
+                if include_ocr_results and self.ocr_results
+                else None
+            ),
         }
 
     def add_callback(self, callback: Callable[["OCRBox"], None]) -> None:
+        if self._callbacks is None:
+            self._callbacks = []
         self._callbacks.append(callback)
 
     def notify_callbacks(self, source: Optional[str] = None) -> None:
         if source != self._update_source:
-            for callback in self._callbacks:
-                callback(self)
+            # Layouts in a batch call them once when the batch ends
+            if self._layout is not None and self._layout.defer_box_callbacks(self):
+                return
+            self.run_callbacks()
+
+    def run_callbacks(self) -> None:
+        for callback in self._callbacks or ():
+            callback(self)
 
     def update_position(self, x: int, y: int, source: Optional[str] = None) -> None:
         new_x = self.x + x
         new_y = self.y + y
 
-        logger.info(
+        logger.debug(
             f"Updating box position: {self.id} ({self.x}, {self.y}) -> ({new_x}, {new_y})"
         )
 
         self.x = new_x
         self.y = new_y
+        self.geometry_changed()
         self._update_source = source
         self.notify_callbacks(source)
         self._update_source = None
@@ -123,12 +244,13 @@ class OCRBox:
     def update_size(
         self, width: int, height: int, source: Optional[str] = None
     ) -> None:
-        logger.info(
+        logger.debug(
             f"Updating box size: {self.id} ({self.width}, {self.height}) -> ({width}, {height})"
         )
 
         self.width = width
         self.height = height
+        self.geometry_changed()
         self._update_source = source
         self.notify_callbacks(source)
         self._update_source = None
@@ -149,14 +271,18 @@ class OCRBox:
         box.tag = data.get("tag", "")
         box.confidence = data.get("confidence", 0.0)
         box.ocr_results = cls.load_ocr_results(data.get("ocr_results"))
+        box.ocr_fingerprint = data.get("ocr_fingerprint")
         return box
 
     @staticmethod
     def load_ocr_results(
-        ocr_result_data: Optional[Dict],
-    ) -> Optional[OCRResultBlock]:
+        ocr_result_data: Optional[Union[Dict, OCRResultBlock, LazyOCRResultBlock]],
+    ) -> Optional[Union[OCRResultBlock, LazyOCRResultBlock]]:
         if not ocr_result_data:
             return None
+        elif isinstance(ocr_result_data, (OCRResultBlock, LazyOCRResultBlock)):
+            # Already decoded or deferred by the binary project file loader
+            return ocr_result_data
         else:
             return OCRResultBlock.from_dict(ocr_result_data)
 
@@ -169,16 +295,29 @@ class OCRBox:
         ) / (self.width + self.height)
 
     def __eq__(self, other: object) -> bool:
-        if not isinstance(other, OCRBox):
+        # Identity and geometry only, use boxes_equal() to compare everything
+        if not isinstance(other, OCRBox) or type(self) is not type(other):
             return False
-        return self.to_dict() == other.to_dict()
+        return (
+            self.id == other.id
+            and self.x == other.x
+            and self.y == other.y
+            and self.width == other.width
+            and self.height == other.height
+            and self.type.name == other.type.name
+        )
+
+    def __hash__(self) -> int:
+        return hash(self.id)
 
     def __repr__(self) -> str:
         return f"OCRBox(order={self.order}, x={self.x}, y={self.y}, width={self.width}, height={self.height}, type={self.type.name}, class={self.class_}, tag={self.tag})"
 
 
-@dataclass
+@dataclass(eq=False)
 class TextBox(OCRBox):
+    __slots__ = ("user_text",)
+
     user_text: str
 
     def __init__(
@@ -207,8 +346,8 @@ class TextBox(OCRBox):
             hocr = self.ocr_results.get_hocr()
         return hocr
 
-    def to_dict(self) -> Dict:
-        return {**super().to_dict(), "user_text": self.user_text}
+    def to_dict(self, include_ocr_results: bool = True) -> Dict:
+        return {**super().to_dict(include_ocr_results), "user_text": self.user_text}
 
     @classmethod
     def from_dict(cls: Type["TextBox"], data: Dict) -> "TextBox":
@@ -226,28 +365,26 @@ class TextBox(OCRBox):
         box.tag = data.get("tag", "")
         box.confidence = data.get("confidence", 0.0)
         box.ocr_results = cls.load_ocr_results(data.get("ocr_results"))
+        box.ocr_fingerprint = data.get("ocr_fingerprint")
         box.user_text = data.get("user_text", "")
         return box
 
-    def __eq__(self, other: object) -> bool:
-        if not isinstance(other, TextBox):
-            return False
-        return self.to_dict() == other.to_dict()
-
     def __repr__(self) -> str:
         return f"TextBox(x={self.x}, y={self.y}, width={self.width}, height={self.height}, text={self.user_text})"
 
 
-@dataclass
+@dataclass(eq=False)
 class ImageBox(OCRBox):
+    __slots__ = ()
+
     def __init__(
         self, x: int, y: int, width: int, height: int, type: BoxType = BoxType.UNKNOWN
     ) -> None:
         super().__init__(x, y, width, height)
         self.type = type
 
-    def to_dict(self) -> Dict:
-        return super().to_dict()
+    def to_dict(self, include_ocr_results: bool = True) -> Dict:
+        return super().to_dict(include_ocr_results)
 
     @classmethod
     def from_dict(cls: Type["ImageBox"], data: Dict) -> "ImageBox":
@@ -265,24 +402,22 @@ class ImageBox(OCRBox):
         box.class_ = data.get("class", "")
         box.tag = data.get("tag", "")
         box.confidence = data.get("confidence", 0.0)
+        box.ocr_fingerprint = data.get("ocr_fingerprint")
         return box
 
-    def __eq__(self, other: object) -> bool:
-        if not isinstance(other, ImageBox):
-            return False
-        return self.to_dict() == other.to_dict()
-
 
-@dataclass
+@dataclass(eq=False)
 class LineBox(OCRBox):
+    __slots__ = ()
+
     def __init__(
         self, x: int, y: int, width: int, height: int, type: BoxType = BoxType.UNKNOWN
     ) -> None:
         super().__init__(x, y, width, height)
         self.type = type
 
-    def to_dict(self) -> Dict:
-        return super().to_dict()
+    def to_dict(self, include_ocr_results: bool = True) -> Dict:
+        return super().to_dict(include_ocr_results)
 
     @classmethod
     def from_dict(cls: Type["LineBox"], data: Dict) -> "LineBox":
@@ -300,27 +435,25 @@ class LineBox(OCRBox):
         box.class_ = data.get("class", "")
         box.tag = data.get("tag", "")
         box.confidence = data.get("confidence", 0.0)
+        box.ocr_fingerprint = data.get("ocr_fingerprint")
         return box
 
-    def __eq__(self, other: object) -> bool:
-        if not isinstance(other, LineBox):
-            return False
-        return self.to_dict() == other.to_dict()
-
     def __repr__(self) -> str:
         return f"HorizontalLine(x={self.x}, y={self.y}, width={self.width}, height={self.height})"
 
 
-@dataclass
+@dataclass(eq=False)
 class EquationBox(OCRBox):
+    __slots__ = ()
+
     def __init__(
         self, x: int, y: int, width: int, height: int, type: BoxType = BoxType.EQUATION
     ) -> None:
         super().__init__(x, y, width, height)
         self.type = type
 
-    def to_dict(self) -> Dict:
-        return super().to_dict()
+    def to_dict(self, include_ocr_results: bool = True) -> Dict:
+        return super().to_dict(include_ocr_results)
 
     @classmethod
     def from_dict(cls: Type["EquationBox"], data: Dict) -> "EquationBox":
@@ -338,27 +471,25 @@ class EquationBox(OCRBox):
         box.class_ = data.get("class", "")
         box.tag = data.get("tag", "")
         box.confidence = data.get("confidence", 0.0)
+        box.ocr_fingerprint = data.get("ocr_fingerprint")
         return box
 
-    def __eq__(self, other: object) -> bool:
-        if not isinstance(other, EquationBox):
-            return False
-        return self.to_dict() == other.to_dict()
-
     def __repr__(self) -> str:
         return f"Equation(x={self.x}, y={self.y}, width={self.width}, height={self.height})"
 
 
-@dataclass
+@dataclass(eq=False)
 class TableBox(OCRBox):
+    __slots__ = ()
+
     def __init__(
         self, x: int, y: int, width: int, height: int, type: BoxType = BoxType.TABLE
     ) -> None:
         super().__init__(x, y, width, height)
         self.type = type
 
-    def to_dict(self) -> Dict:
-        return super().to_dict()
+    def to_dict(self, include_ocr_results: bool = True) -> Dict:
+        return super().to_dict(include_ocr_results)
 
     @classmethod
     def from_dict(cls: Type["TableBox"], data: Dict) -> "TableBox":
@@ -376,29 +507,27 @@ class TableBox(OCRBox):
         box.class_ = data.get("class", "")
         box.tag = data.get("tag", "")
         box.confidence = data.get("confidence", 0.0)
+        box.ocr_fingerprint = data.get("ocr_fingerprint")
         return box
 
-    def __eq__(self, other: object) -> bool:
-        if not isinstance(other, TableBox):
-            return False
-        return self.to_dict() == other.to_dict()
-
     def __repr__(self) -> str:
         return (
             f"Table(x={self.x}, y={self.y}, width={self.width}, height={self.height})"
         )
 
 
-@dataclass
+@dataclass(eq=False)
 class NoiseBox(OCRBox):
+    __slots__ = ()
+
     def __init__(
         self, x: int, y: int, width: int, height: int, type: BoxType = BoxType.NOISE
     ) -> None:
         super().__init__(x, y, width, height)
         self.type = type
 
-    def to_dict(self) -> Dict:
-        return super().to_dict()
+    def to_dict(self, include_ocr_results: bool = True) -> Dict:
+        return super().to_dict(include_ocr_results)
 
     @classmethod
     def from_dict(cls: Type["NoiseBox"], data: Dict) -> "NoiseBox":
@@ -416,29 +545,27 @@ class NoiseBox(OCRBox):
         box.class_ = data.get("class", "")
         box.tag = data.get("tag", "")
         box.confidence = data.get("confidence", 0.0)
+        box.ocr_fingerprint = data.get("ocr_fingerprint")
         return box
 
-    def __eq__(self, other: object) -> bool:
-        if not isinstance(other, NoiseBox):
-            return False
-        return self.to_dict() == other.to_dict()
-
     def __repr__(self) -> str:
         return (
             f"Noise(x={self.x}, y={self.y}, width={self.width}, height={self.height})"
         )
 
 
-@dataclass
+@dataclass(eq=False)
 class CountBox(OCRBox):
+    __slots__ = ()
+
     def __init__(
         self, x: int, y: int, width: int, height: int, type: BoxType = BoxType.COUNT
     ) -> None:
         super().__init__(x, y, width, height)
         self.type = type
 
-    def to_dict(self) -> Dict:
-        return super().to_dict()
+    def to_dict(self, include_ocr_results: bool = True) -> Dict:
+        return super().to_dict(include_ocr_results)
 
     @classmethod
     def from_dict(cls: Type["CountBox"], data: Dict) -> "CountBox":
@@ -456,19 +583,20 @@ class CountBox(OCRBox):
         box.class_ = data.get("class", "")
         box.tag = data.get("tag", "")
         box.confidence = data.get("confidence", 0.0)
+        box.ocr_fingerprint = data.get("ocr_fingerprint")
         return box
 
-    def __eq__(self, other: object) -> bool:
-        if not isinstance(other, CountBox):
-            return False
-        return self.to_dict() == other.to_dict()
-
     def __repr__(self) -> str:
         return (
             f"Count(x={self.x}, y={self.y}, width={self.width}, height={self.height})"
         )
 
 
+def boxes_equal(box: OCRBox, other: OCRBox) -> bool:
+    # Deep comparison including the OCR results
+    return type(box) is type(other) and box.to_dict() == other.to_dict()
+
+
 BOX_TYPE_MAP = {
     "UNKNOWN": OCRBox,
     "FLOWING_TEXT": TextBox,
@@ -1,5 +1,8 @@
-from typing import List, Optional
-import cv2
+from typing import Callable, List, Optional, Tuple
+import copy
+import os
+import uuid
+import numpy as np
 from loguru import logger
 
 
@@ -10,11 +13,28 @@ from page.ocr_box import ( # type: ignore
     OCRBox,
     TextBox,
     BOX_TYPE_MAP,
+    new_box_id,
 )
 from page.box_type import BoxType # type: ignore
-from ocr_engine.layout_analyzer_tesserocr import LayoutAnalyzerTesserOCR # type: ignore
+from ocr_engine.layout_analyzer_tesserocr import ( # type: ignore
+    LayoutAnalyzerTesserOCR,
+    layout_analyzers,
+)
 from ocr_engine.ocr_engine_tesserocr import OCREngineTesserOCR # type: ignore
+from ocr_engine.ocr_statistics import OCRStatistics # type: ignore
 from page.page_layout import PageLayout # type: ignore
+from page.image_cache import image_cache, load_reduced_image # type: ignore
+from page.image_probe import ImageInfo, probe_image # type: ignore
+from page.page_pyramid import PagePyramid, SourceHash # type: ignore
+from project.layout_templates import LayoutTemplates # type: ignore
+from project.page_hash import perceptual_hash # type: ignore
+from page.box_alignment import ( # type: ignore
+    binarize_image,
+    content_rects,
+    ink_components,
+    merge_suggestions,
+    split_suggestions,
+)
 
 
 class Page:
@@ -23,34 +43,121 @@ class Page:
         image_path: str,
         order: int = 0,
     ) -> None:
+        self.id = str(uuid.uuid4())
         self.image_path = image_path
         self.order = order
         self.layout = PageLayout([])
-        self.image = cv2.imread(self.image_path, cv2.IMREAD_UNCHANGED)
-        self.layout.region = (0, 0, self.image.shape[1], self.image.shape[0])
+        # Only the file header is read here, the image is decoded on first
+        # use and kept in the shared image cache
+        self.image_info: ImageInfo = probe_image(self.image_path)
+        self.layout.region = (0, 0, self.image_info.width, self.image_info.height)
+        # Reduced copies of the image, set by the project
+        self.pyramid: Optional[PagePyramid] = None
+        # Hash of the image file the pyramid levels are named after, loaded
+        # with the project so the file isn't hashed again on every start
+        self.source_hash: Optional[SourceHash] = None
         self.settings: PageSettings = PageSettings(ProjectSettings())
+        # Perceptual hash of the image, computed on first use
+        self.image_hash: Optional[int] = None
+        # Id of the page this one is a duplicate of
+        self.duplicate_of: Optional[str] = None
+        # Called with the page and the recognized boxes (None for all boxes)
+        # whenever OCR results change
+        self._recognition_callbacks: List[Callable] = []
+
+    @property
+    def image(self) -> np.ndarray:
+        return image_cache.get(self.image_path)
+
+    def reduced_image(self, min_height: int) -> np.ndarray:
+        # Grayscale image at least min_height high, from a pyramid level if
+        # there is one or decoded at a reduced scale, never the cached image
+        width, height = self.image_size
+        target_size = (max(1, width * min_height // max(1, height)), min_height)
+        path = self.find_image_path(target_size)
+
+        if path is not None and path != self.image_path:
+            return load_reduced_image(path, 1)
+        return load_reduced_image(self.image_path, height // max(1, min_height))
+
+    @property
+    def image_size(self) -> Tuple[int, int]:
+        return self.image_info.width, self.image_info.height
+
+    def get_image_path(self, target_size: Optional[Tuple[int, int]] = None) -> str:
+        # Smallest stored copy of the image at least target_size (width,
+        # height) large, the source image without a target size or pyramid
+        if self.pyramid is None or target_size is None:
+            return self.image_path
+        return self.pyramid.get_path(self.image_path, self.image_size, target_size)
+
+    def find_image_path(self, target_size: Tuple[int, int]) -> Optional[str]:
+        # Like get_image_path(), but only levels that already exist
+        if self.pyramid is None:
+            return None
+        return self.pyramid.find_path(self.image_path, self.image_size, target_size)
+
+    def get_source_hash(self) -> Optional[SourceHash]:
+        if self.pyramid is not None:
+            known = self.pyramid.known_source_hash(self.image_path)
+            if known is not None:
+                return known
+        return self.source_hash
+
+    def add_recognition_callback(self, callback: Callable) -> None:
+        if callback not in self._recognition_callbacks:
+            self._recognition_callbacks.append(callback)
+
+    def remove_recognition_callback(self, callback: Callable) -> None:
+        if callback in self._recognition_callbacks:
+            self._recognition_callbacks.remove(callback)
+
+    def notify_recognition_callbacks(
+        self, boxes: Optional[List[OCRBox]] = None
+    ) -> None:
+        for callback in self._recognition_callbacks:
+            callback(self, boxes)
+
+    def get_image_hash(self) -> int:
+        if self.image_hash is None:
+            self.image_hash = perceptual_hash(self.image)
+        return self.image_hash
 
     def set_settings(self, project_settings: ProjectSettings) -> None:
         self.settings = PageSettings(project_settings)
 
-    def analyze_page(self) -> None:
-        langs = self.settings.get("langs") or ["eng"]
-        layout_analyzer = LayoutAnalyzerTesserOCR(langs)
-        ppi = self.settings.get("ppi") or 300
+    def analyze_page(
+        self, reading_order: bool = False, templates: Optional[LayoutTemplates] = None
+    ) -> None:
+        # With templates, pages looking like an already analyzed page reuse
+        # its boxes, and newly analyzed pages become templates
+        region = self.layout.get_page_region()
+        boxes = templates.match(self.image, region) if templates is not None else None
+
+        if boxes is not None:
+            logger.info(f"Reused layout template for page: {self.image_path}")
+            self.layout.boxes = boxes
+        else:
+            ppi = self.settings.get("ppi") or 300
 
-        self.layout.boxes = layout_analyzer.analyze_layout(
-            self.image_path, ppi, self.layout.get_page_region()
-        )
-        self.layout.sort_boxes()
+            self.layout.boxes = self.get_layout_analyzer().analyze_layout(
+                self.image_path, ppi, region
+            )
+
+            if templates is not None:
+                templates.add(self.image, self.layout.boxes)
+
+        if reading_order:
+            self.layout.sort_by_reading_order()
+        else:
+            self.layout.sort_boxes()
 
     def is_valid_box_index(self, box_index: int) -> bool:
         return box_index >= 0 and box_index < len(self.layout.boxes)
 
     def analyse_region(self, region: tuple[int, int, int, int]) -> List[OCRBox]:
-        langs = self.settings.get("langs") or ["eng"]
         ppi = self.settings.get("ppi") or 300
-        layout_analyzer = LayoutAnalyzerTesserOCR(langs)
-        return layout_analyzer.analyze_layout(self.image_path, ppi, region)
+        return self.get_layout_analyzer().analyze_layout(self.image_path, ppi, region)
 
     def analyze_box_(self, box_index: int) -> List[OCRBox]:
         if not self.is_valid_box_index(box_index):
@@ -71,12 +178,70 @@ class Page:
         recognized_boxes = self.analyze_box_(box_index)
 
         if len(recognized_boxes) == 1:
-            self.layout.boxes[box_index] = recognized_boxes[0]
+            self.layout.replace_box(box_index, recognized_boxes[0])
         else:
             self.layout.remove_box(box_index)
             for recognized_box in recognized_boxes:
                 self.layout.add_box(recognized_box)
 
+    def get_layout_analyzer(self) -> LayoutAnalyzerTesserOCR:
+        # Shared by all pages with the same languages, so handles are only
+        # initialized once per process
+        return layout_analyzers.get(self.settings.get("langs") or ["eng"])
+
+    def boxes_at_indices(self, box_indices: List[int]) -> List[OCRBox]:
+        return [
+            self.layout.boxes[index]
+            for index in box_indices
+            if self.is_valid_box_index(index)
+        ]
+
+    def analyze_boxes_(self, boxes: List[OCRBox]) -> List[List[OCRBox]]:
+        ppi = self.settings.get("ppi") or 300
+        regions = [(box.x, box.y, box.width, box.height) for box in boxes]
+        return self.get_layout_analyzer().analyze_regions(self.image, ppi, regions)
+
+    def analyze_boxes(self, box_indices: List[int]) -> None:
+        # Like analyze_box() for many boxes, analyzed in parallel on one
+        # decoded image and applied to the layout in one batch
+        boxes = self.boxes_at_indices(box_indices)
+        results = self.analyze_boxes_(boxes)
+
+        with self.layout.batch():
+            removed = []
+            added = []
+            for box, recognized_boxes in zip(boxes, results):
+                if len(recognized_boxes) == 1:
+                    self.layout.replace_box(
+                        self.layout.index_of(box), recognized_boxes[0]
+                    )
+                else:
+                    removed.append(box.id)
+                    added.extend(recognized_boxes)
+
+            self.layout.remove_boxes(removed)
+            self.layout.add_boxes(added)
+
+    def align_boxes(self, box_indices: List[int]) -> None:
+        # Like align_box() for many boxes
+        boxes = self.boxes_at_indices(box_indices)
+        results = self.analyze_boxes_(boxes)
+
+        with self.layout.batch():
+            removed = []
+            for box, recognized_boxes in zip(boxes, results):
+                if recognized_boxes:
+                    best_box = max(
+                        recognized_boxes, key=lambda recognized: recognized.similarity(box)
+                    )
+                    box.set_geometry(
+                        best_box.x, best_box.y, best_box.width, best_box.height
+                    )
+                else:
+                    removed.append(box.id)
+
+            self.layout.remove_boxes(removed)
+
     def align_box(self, box_index: int) -> None:
         recognized_boxes = self.analyze_box_(box_index)
 
@@ -92,19 +257,90 @@ class Page:
                     best_box = recognized_box
 
             if best_box is not None:
-                self.layout.boxes[box_index].x = best_box.x
-                self.layout.boxes[box_index].y = best_box.y
-                self.layout.boxes[box_index].width = best_box.width
-                self.layout.boxes[box_index].height = best_box.height
+                self.layout.boxes[box_index].set_geometry(
+                    best_box.x, best_box.y, best_box.width, best_box.height
+                )
         else:
             self.layout.remove_box(box_index)
 
+    def box_rects(self) -> np.ndarray:
+        return np.array(
+            [
+                (box.x, box.y, box.x + box.width, box.y + box.height)
+                for box in self.layout.boxes
+            ],
+            dtype=np.int64,
+        ).reshape(-1, 4)
+
+    def ink_components(self) -> np.ndarray:
+        return ink_components(binarize_image(self.image))
+
+    def snap_boxes_to_content(
+        self, padding: int = 0, remove_empty: bool = False
+    ) -> None:
+        # Fits all boxes to the ink they contain in one pass over the page,
+        # instead of running layout analysis per box like align_box()
+        rects, has_content = content_rects(
+            self.box_rects(), self.ink_components(), padding
+        )
+
+        with self.layout.batch():
+            for box, rect in zip(self.layout.boxes, rects.tolist()):
+                box.set_geometry(rect[0], rect[1], rect[2] - rect[0], rect[3] - rect[1])
+
+            if remove_empty:
+                self.layout.remove_boxes(
+                    box.id
+                    for box, content in zip(self.layout.boxes, has_content)
+                    if not content
+                )
+
+    def suggest_box_merges(self, threshold: float = 0.5) -> List[Tuple[OCRBox, OCRBox]]:
+        boxes = self.layout.boxes
+        return [
+            (boxes[first], boxes[second])
+            for first, second in merge_suggestions(self.box_rects(), threshold)
+        ]
+
+    def suggest_box_splits(
+        self, min_gap: Optional[int] = None
+    ) -> List[Tuple[OCRBox, List[Tuple[int, int, int, int]]]]:
+        # Parts are (x, y, width, height), the default gap is a quarter inch
+        if min_gap is None:
+            min_gap = (self.settings.get("ppi") or 300) // 4
+
+        boxes = self.layout.boxes
+        suggestions = split_suggestions(self.box_rects(), self.ink_components(), min_gap)
+        return [
+            (
+                boxes[index],
+                [(left, top, right - left, bottom - top) for left, top, right, bottom in parts],
+            )
+            for index, parts in suggestions.items()
+        ]
+
+    def recognition_fingerprint(self) -> str:
+        # Everything besides the box that OCR results depend on: the image
+        # file and the recognition settings
+        langs = self.settings.get("langs") or ["eng"]
+        ppi = self.settings.get("ppi") or 300
+        stat = os.stat(self.image_path)
+        return f"{stat.st_mtime_ns},{stat.st_size},{'+'.join(langs)},{ppi}"
+
+    def dirty_boxes(self) -> List[OCRBox]:
+        # Boxes whose OCR results are missing or were produced for a different
+        # geometry, type, image or settings
+        page_fingerprint = self.recognition_fingerprint()
+        return [box for box in self.layout.boxes if box.is_dirty(page_fingerprint)]
+
     def recognize_boxes(
-        self, box_index: Optional[int] = None, convert_empty_textboxes: bool = True
+        self,
+        box_index: Optional[int] = None,
+        convert_empty_textboxes: bool = True,
+        only_dirty: bool = False,
     ) -> None:
         langs = self.settings.get("langs") or ["eng"]
         ppi = self.settings.get("ppi") or 300
-        self.ocr_engine = OCREngineTesserOCR(langs)
 
         if box_index is not None:
             if not self.is_valid_box_index(box_index):
@@ -112,18 +348,77 @@ class Page:
                 return
 
             boxes_to_recognize = [self.layout.boxes[box_index]]
+        elif only_dirty:
+            boxes_to_recognize = self.dirty_boxes()
+            if not boxes_to_recognize:
+                logger.info(f"No boxes to recognize for page: {self.image_path}")
+                return
         else:
             boxes_to_recognize = self.layout.boxes
 
+        self.ocr_engine = OCREngineTesserOCR(langs)
         self.ocr_engine.recognize_boxes(self.image_path, ppi, boxes_to_recognize)
 
+        recognized_ids = {box.id for box in boxes_to_recognize}
+
         if convert_empty_textboxes and box_index is None:
             # Convert empty TextBoxes to ImageBoxes
             for i, box in enumerate(self.layout.boxes):
-                if isinstance(box, TextBox):
+                if isinstance(box, TextBox) and box.id in recognized_ids:
                     if not box.has_text():
                         self.convert_box(i, BoxType.FLOWING_IMAGE)
 
+        # Converted boxes keep their id, so they are marked in their new type
+        page_fingerprint = self.recognition_fingerprint()
+        recognized_boxes = [box for box in self.layout.boxes if box.id in recognized_ids]
+        for box in recognized_boxes:
+            box.mark_recognized(page_fingerprint)
+
+        if box_index is None and not only_dirty:
+            self.notify_recognition_callbacks()
+        else:
+            self.notify_recognition_callbacks(recognized_boxes)
+
+    def copy_layout_from(self, page: "Page") -> None:
+        # Duplicate pages take over the boxes of the page they duplicate
+        # instead of being analyzed and recognized again. The OCR results are
+        # only taken over for images of the same size, the boxes of a rescaled
+        # scan are scaled and recognized on their own.
+        scale_x = self.image_info.width / max(page.image_info.width, 1)
+        scale_y = self.image_info.height / max(page.image_info.height, 1)
+        same_size = self.image_size == page.image_size
+        source_fingerprint = page.recognition_fingerprint()
+        page_fingerprint = self.recognition_fingerprint()
+        boxes = []
+
+        for box in page.layout.boxes:
+            new_box = box.convert_to(box.type)
+            new_box.id = new_box_id()
+            new_box.ocr_fingerprint = None
+
+            if not same_size:
+                new_box.set_geometry(
+                    round(box.x * scale_x),
+                    round(box.y * scale_y),
+                    round(box.width * scale_x),
+                    round(box.height * scale_y),
+                )
+                new_box.ocr_results = None
+            elif box.has_ocr_results():
+                # Not yet decoded results are shared, decoded ones are copied
+                # so editing one page doesn't change the other
+                pending = box.pending_ocr_results()
+                new_box.ocr_results = (
+                    pending if pending is not None else copy.deepcopy(box.ocr_results)
+                )
+                if not box.is_dirty(source_fingerprint):
+                    new_box.mark_recognized(page_fingerprint)
+            boxes.append(new_box)
+
+        self.layout.boxes = boxes
+        self.layout.header_y = round(page.layout.header_y * scale_y)
+        self.layout.footer_y = round(page.layout.footer_y * scale_y)
+
     def convert_box(self, box_index: int, box_type: BoxType) -> None:
         if not self.is_valid_box_index(box_index):
             logger.error("Invalid box index: %d", box_index)
@@ -131,7 +426,11 @@ class Page:
 
         box = self.layout.boxes[box_index]
         new_box = box.convert_to(box_type)
-        self.layout.boxes[box_index] = new_box
+        self.layout.replace_box(box_index, new_box)
+        self.notify_recognition_callbacks([new_box])
+
+    def get_statistics(self) -> OCRStatistics:
+        return OCRStatistics.from_boxes(self.layout.boxes, self.id)
 
     def generate_page_export_data(self) -> dict:
         langs = self.settings.get("langs") or ["eng"]
@@ -140,10 +439,16 @@ class Page:
             "image_path": self.image_path,
             "order": self.order,
             "lang": langs[0],
+            "width": self.layout.region[2],
+            "height": self.layout.region[3],
+            "ppi": self.settings.get("ppi") or 300,
             "boxes": [],
         }
 
         for box in self.layout.boxes:
+            # Results not decoded yet are decoded for the export only, they
+            # are not kept on the box
+            pending = box.pending_ocr_results()
             export_data_entry = {
                 "id": box.id,
                 "position": box.position(),
@@ -151,7 +456,7 @@ class Page:
                 "class": box.class_,
                 "tag": box.tag,
                 "confidence": box.confidence,
-                "ocr_results": box.ocr_results,
+                "ocr_results": pending.load() if pending is not None else box.ocr_results,
             }
             export_data["boxes"].append(export_data_entry)
 
@@ -163,13 +468,26 @@ class Page:
     def set_footer(self, footer: int) -> None:
         self.layout.footer_y = footer
 
-    def to_dict(self) -> dict:
+    def to_dict(self, include_ocr_results: bool = True) -> dict:
+        source_hash = self.get_source_hash()
         data = {
             "page": {
+                "id": self.id,
                 "image_path": self.image_path,
                 "order": self.order,
-                "layout": self.layout.to_dict(),
+                "layout": self.layout.to_dict(include_ocr_results),
                 "settings": self.settings.to_dict(),
+                "image_hash": self.image_hash,
+                "duplicate_of": self.duplicate_of,
+                "source_hash": (
+                    {
+                        "mtime_ns": source_hash[0],
+                        "size": source_hash[1],
+                        "hash": source_hash[2],
+                    }
+                    if source_hash is not None
+                    else None
+                ),
             },
         }
 
@@ -183,6 +501,17 @@ class Page:
             page_data["image_path"],
             order=page_data.get("order", 0),
         )
+        # Pages of older projects get a new id
+        page.id = page_data.get("id", page.id)
+        page.image_hash = page_data.get("image_hash")
+        page.duplicate_of = page_data.get("duplicate_of")
+        source_hash = page_data.get("source_hash")
+        if source_hash is not None:
+            page.source_hash = (
+                source_hash["mtime_ns"],
+                source_hash["size"],
+                source_hash["hash"],
+            )
 
         for box_data in page_data["layout"]["boxes"]:
             box_type = box_data["type"]
@@ -1,17 +1,197 @@
-from typing import List, Optional
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from loguru import logger
 
 from page.ocr_box import OCRBox  # type: ignore
+from page.spatial_index import SpatialGrid  # type: ignore
+from page.reading_order import compute_reading_order  # type: ignore
+
+
+@dataclass
+class LayoutChangeSet:
+    # Boxes by id, a box added and removed again within one batch is in none
+    added: Dict[str, OCRBox] = field(default_factory=dict)
+    removed: Dict[str, OCRBox] = field(default_factory=dict)
+    changed: Dict[str, OCRBox] = field(default_factory=dict)
+    reordered: bool = False
+    # The whole box list was replaced
+    reset: bool = False
+
+    def is_empty(self) -> bool:
+        return not (
+            self.added or self.removed or self.changed or self.reordered or self.reset
+        )
+
+    def box_added(self, box: OCRBox) -> None:
+        if self.removed.pop(box.id, None) is not None:
+            # Replaced by a box with the same id
+            self.changed[box.id] = box
+        else:
+            self.added[box.id] = box
+
+    def box_removed(self, box: OCRBox) -> None:
+        self.changed.pop(box.id, None)
+        if self.added.pop(box.id, None) is None:
+            self.removed[box.id] = box
+
+    def box_changed(self, box: OCRBox) -> None:
+        if box.id not in self.added:
+            self.changed[box.id] = box
 
 
 class PageLayout:
     def __init__(self, boxes: List[OCRBox]) -> None:
-        self.boxes: List[OCRBox] = boxes
+        # Built on first spatial query, dropped whenever the box list changes
+        self._spatial_index: Optional[SpatialGrid] = None
+        self._boxes_by_id: Dict[str, OCRBox] = {}
+        # Boxes from this index on may have a stale order
+        self._order_dirty_from: Optional[int] = None
+        # Called with the layout and a LayoutChangeSet after every change, or
+        # once per batch
+        self._change_callbacks: List[Callable] = []
+        self._batch_depth = 0
+        self._changes = LayoutChangeSet()
+        # Spatial index updates collected in a batch, None for removed boxes
+        self._index_updates: Dict[str, Optional[OCRBox]] = {}
+        # Boxes whose callbacks are called when the batch ends
+        self._box_notifications: Dict[str, OCRBox] = {}
+        self.boxes = boxes
         self.region: tuple = (0, 0, 0, 0)  # (x, y, width, height)
         self.header_y: int = 0
         self.footer_y: int = 0
 
+    @property
+    def boxes(self) -> List[OCRBox]:
+        return self._boxes
+
+    @boxes.setter
+    def boxes(self, boxes: List[OCRBox]) -> None:
+        # The boxes keep their order until sort_boxes() or update_order()
+        with self.batch():
+            self._boxes = boxes
+            self._order_dirty_from = None
+            for box in boxes:
+                box._layout = self
+            self.rebuild_id_index()
+            self.invalidate_spatial_index()
+            self._index_updates.clear()
+            self._changes.reset = True
+
+    def add_change_callback(self, callback: Callable) -> None:
+        if callback not in self._change_callbacks:
+            self._change_callbacks.append(callback)
+
+    def remove_change_callback(self, callback: Callable) -> None:
+        if callback in self._change_callbacks:
+            self._change_callbacks.remove(callback)
+
+    @contextmanager
+    def batch(self) -> Iterator[LayoutChangeSet]:
+        # Defers spatial index updates and notifications until the outermost
+        # batch ends, then reports all changes at once. Every mutation runs in
+        # its own batch, so single changes are reported immediately.
+        self._batch_depth += 1
+        try:
+            yield self._changes
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self.commit_changes()
+
+    def in_batch(self) -> bool:
+        return self._batch_depth > 0
+
+    def commit_changes(self) -> None:
+        changes = self._changes
+        self._changes = LayoutChangeSet()
+        box_notifications = list(self._box_notifications.values())
+        self._box_notifications.clear()
+
+        if self._spatial_index is not None and self._index_updates:
+            if len(self._index_updates) > len(self._boxes) // 2:
+                # Rebuilding is cheaper than updating most of the boxes
+                self.invalidate_spatial_index()
+        if self._spatial_index is None:
+            self._index_updates.clear()
+
+        for box in box_notifications:
+            box.run_callbacks()
+
+        if self._change_callbacks and not changes.is_empty():
+            logger.debug(
+                f"Layout changed: {len(changes.added)} added, {len(changes.removed)} removed, {len(changes.changed)} changed"
+            )
+            for callback in self._change_callbacks:
+                callback(self, changes)
+
+    def defer_box_callbacks(self, box: OCRBox) -> bool:
+        if not self.in_batch():
+            return False
+        self._box_notifications[box.id] = box
+        return True
+
+    def flush_index_updates(self) -> None:
+        index_updates = self._index_updates
+        self._index_updates = {}
+
+        if self._spatial_index is None:
+            return
+
+        for box_id, box in index_updates.items():
+            if box is None:
+                self._spatial_index.remove(box_id)
+            else:
+                self._spatial_index.update(box)
+
+    def rebuild_id_index(self) -> None:
+        self._boxes_by_id = {box.id: box for box in self._boxes}
+
+    def invalidate_spatial_index(self) -> None:
+        self._spatial_index = None
+
+    def spatial_index(self) -> SpatialGrid:
+        # Lists can also be changed in place, so rebuild if the boxes differ
+        self.flush_index_updates()
+        if self._spatial_index is None or len(self._spatial_index) != len(self.boxes):
+            self._spatial_index = SpatialGrid.from_boxes(self.boxes)
+        return self._spatial_index
+
+    def box_geometry_changed(self, box: OCRBox) -> None:
+        with self.batch():
+            self._index_updates[box.id] = box
+            self._changes.box_changed(box)
+
+    def boxes_at(self, x: int, y: int) -> List[OCRBox]:
+        return self.sorted_by_order(self.spatial_index().query_point(x, y))
+
+    def boxes_in_region(
+        self, x: int, y: int, width: int, height: int, contained: bool = False
+    ) -> List[OCRBox]:
+        return self.sorted_by_order(
+            self.spatial_index().query_rect(x, y, width, height, contained)
+        )
+
+    def nearest_boxes(
+        self, x: int, y: int, count: int = 1, max_distance: Optional[float] = None
+    ) -> List[OCRBox]:
+        return self.spatial_index().nearest(x, y, count, max_distance)
+
+    def overlapping_boxes(self, box: OCRBox) -> List[OCRBox]:
+        return [
+            other
+            for other in self.boxes_in_region(box.x, box.y, box.width, box.height)
+            if other is not box
+        ]
+
+    def overlapping_pairs(self) -> List[Tuple[OCRBox, OCRBox]]:
+        return self.spatial_index().overlapping_pairs()
+
+    def sorted_by_order(self, boxes: List[OCRBox]) -> List[OCRBox]:
+        boxes.sort(key=lambda box: box.order)
+        return boxes
+
     def get_page_region(self) -> tuple:
         return (
             self.region[0],
@@ -24,47 +204,137 @@ class PageLayout:
         self.boxes.sort(key=lambda box: box.order)
         self.update_order()
 
+    def sort_by_reading_order(self) -> None:
+        footer_y = self.region[3] - self.footer_y if self.footer_y else None
+        order = compute_reading_order(self.boxes, self.header_y, footer_y)
+        self.boxes[:] = [self.boxes[index] for index in order]
+        self.update_order()
+
     def update_order(self) -> None:
-        for index, box in enumerate(self.boxes):
-            box.order = index
+        with self.batch():
+            for index, box in enumerate(self.boxes):
+                box._order = index
+            self._order_dirty_from = None
+            self._changes.reordered = True
+
+    def invalidate_order(self, index: int) -> None:
+        if self._order_dirty_from is None or index < self._order_dirty_from:
+            self._order_dirty_from = index
+
+    def ensure_order(self) -> None:
+        # Only renumbers the boxes after the first change since the last call
+        dirty_from = self._order_dirty_from
+        if dirty_from is None:
+            return
+
+        self._order_dirty_from = None
+        boxes = self.boxes
+        for index in range(dirty_from, len(boxes)):
+            boxes[index]._order = index
 
     def move_box(self, index: int, new_index: int) -> None:
         box_to_move = self.boxes.pop(index)
         self.boxes.insert(new_index, box_to_move)
-        self.update_order()
+        self.invalidate_order(min(index, new_index))
+
+        with self.batch():
+            self._changes.reordered = True
 
     def remove_box(self, index: int) -> None:
-        self.boxes.pop(index)
-        self.update_order()
+        box = self.boxes.pop(index)
+        self.detach_box(box)
+        self.invalidate_order(index)
+
+    def attach_box(self, box: OCRBox) -> None:
+        with self.batch():
+            box._layout = self
+            self._boxes_by_id[box.id] = box
+            self._index_updates[box.id] = box
+            self._changes.box_added(box)
+
+    def detach_box(self, box: OCRBox) -> None:
+        with self.batch():
+            if box._layout is self:
+                box._layout = None
+            if self._boxes_by_id.get(box.id) is box:
+                del self._boxes_by_id[box.id]
+            self._index_updates[box.id] = None
+            self._changes.box_removed(box)
+
+    def index_of(self, box: OCRBox) -> int:
+        # The order is the index unless the list was changed behind our back
+        index = box.order
+        if index < len(self.boxes) and self.boxes[index] is box:
+            return index
+        return self.boxes.index(box)
 
     def remove_box_by_id(self, box_id: str) -> None:
-        for index, box in enumerate(self.boxes):
-            if box.id == box_id:
-                self.remove_box(index)
-                return
+        box = self.get_box_by_id(box_id)
+
+        if box is not None:
+            self.remove_box(self.index_of(box))
 
     def add_box(self, box: OCRBox, index: Optional[int] = None) -> None:
         if index is None:
-            self.boxes.append(box)
-        else:
-            self.boxes.insert(index, box)
-        self.update_order()
+            index = len(self.boxes)
+        index = min(max(index, 0), len(self.boxes))
+
+        self.boxes.insert(index, box)
+        self.attach_box(box)
+        self.invalidate_order(index)
+
+    def add_boxes(self, boxes: Iterable[OCRBox], index: Optional[int] = None) -> None:
+        boxes = list(boxes)
+        if index is None:
+            index = len(self.boxes)
+        index = min(max(index, 0), len(self.boxes))
+
+        with self.batch():
+            self.boxes[index:index] = boxes
+            for box in boxes:
+                self.attach_box(box)
+            self.invalidate_order(index)
+
+    def remove_boxes(self, box_ids: Iterable[str]) -> None:
+        box_ids = set(box_ids)
+        first_index = None
+        remaining = []
+
+        with self.batch():
+            for index, box in enumerate(self.boxes):
+                if box.id in box_ids:
+                    if first_index is None:
+                        first_index = index
+                    self.detach_box(box)
+                else:
+                    remaining.append(box)
+
+            if first_index is not None:
+                self.boxes[:] = remaining
+                self.invalidate_order(first_index)
 
     def get_box(self, index: int) -> OCRBox:
         return self.boxes[index]
-    
+
     def get_box_by_id(self, box_id: str) -> Optional[OCRBox]:
-        for box in self.boxes:
-            if box.id == box_id:
-                return box
-        return None
+        box = self._boxes_by_id.get(box_id)
+
+        if box is None or box.id != box_id or box._layout is not self:
+            # Ids changed or the list was modified directly, start over
+            self.rebuild_id_index()
+            box = self._boxes_by_id.get(box_id)
+        return box
 
     def replace_box(self, index: int, box: OCRBox) -> None:
-        self.boxes[index] = box
+        with self.batch():
+            self.detach_box(self.boxes[index])
+            self.boxes[index] = box
+            box.order = index
+            self.attach_box(box)
 
-    def to_dict(self) -> dict:
+    def to_dict(self, include_ocr_results: bool = True) -> dict:
         return {
-            "boxes": [box.to_dict() for box in self.boxes],
+            "boxes": [box.to_dict(include_ocr_results) for box in self.boxes],
             "region": self.region,
             "header_y": self.header_y,
             "footer_y": self.footer_y,
@@ -91,10 +361,10 @@ class PageLayout:
         return self.boxes[index]
 
     def __setitem__(self, index: int, box: OCRBox) -> None:
-        self.boxes[index] = box
+        self.replace_box(index, box)
 
     def __delitem__(self, index: int) -> None:
-        self.boxes.pop(index)
+        self.remove_box(index)
 
     def __str__(self) -> str:
         return f"PageLayout(boxes={self.boxes})"
@@ -0,0 +1,205 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import hashlib
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from loguru import logger
+
+from page.image_cache import load_image  # type: ignore
+
+PYRAMID_FOLDER = "pyramid"
+# Longest side of the reduced levels in pixels, smallest first. The full
+# level is the source image itself.
+PYRAMID_LEVELS = [("thumbnail", 256), ("preview", 1536)]
+FULL_LEVEL = "full"
+JPEG_QUALITY = 90
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Modification time in ns, size and hash of a source file
+SourceHash = Tuple[int, int, str]
+
+
+def source_hash(image_path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(image_path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def level_size(size: Tuple[int, int], max_side: int) -> Tuple[int, int]:
+    width, height = size
+    scale = min(1.0, max_side / max(width, height, 1))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def select_level(size: Tuple[int, int], target_size: Tuple[int, int]) -> str:
+    # Smallest level at least as large as the target in both directions
+    for level, max_side in PYRAMID_LEVELS:
+        width, height = level_size(size, max_side)
+        if width >= target_size[0] and height >= target_size[1]:
+            return level
+    return FULL_LEVEL
+
+
+def prepare_for_jpeg(image: np.ndarray) -> np.ndarray:
+    if image.ndim == 3 and image.shape[2] == 4:
+        image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+    if image.dtype != np.uint8:
+        image = cv2.normalize(image, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+    return image
+
+
+class PagePyramid:
+    # Reduced copies of the page images in the project folder, named after
+    # the hash of the source file, so a changed source gets new levels
+    def __init__(self, folder: str, max_workers: int = 2) -> None:
+        self.folder = folder
+        self.max_workers = max_workers
+        # Source hash by path, with the modification time and size of the
+        # file it was computed for
+        self.hashes: Dict[str, SourceHash] = {}
+        self.pending: Dict[str, Future] = {}
+        self.lock = threading.Lock()
+        self.executor: Optional[ThreadPoolExecutor] = None
+
+    def get_source_hash(self, image_path: str) -> str:
+        # Only hashed again when the file changed
+        digest = self.cached_source_hash(image_path)
+        if digest is not None:
+            return digest
+
+        stat = os.stat(image_path)
+        digest = source_hash(image_path)
+        with self.lock:
+            self.hashes[os.path.abspath(image_path)] = (
+                stat.st_mtime_ns,
+                stat.st_size,
+                digest,
+            )
+        return digest
+
+    def cached_source_hash(self, image_path: str) -> Optional[str]:
+        # Without reading the file, None if it wasn't hashed yet or changed
+        stat = os.stat(image_path)
+        with self.lock:
+            known = self.hashes.get(os.path.abspath(image_path))
+        if known is None or known[:2] != (stat.st_mtime_ns, stat.st_size):
+            return None
+        return known[2]
+
+    def known_source_hash(self, image_path: str) -> Optional[SourceHash]:
+        # Last hash of the file with its modification time and size, to be
+        # stored with the page
+        with self.lock:
+            return self.hashes.get(os.path.abspath(image_path))
+
+    def remember_source_hash(self, image_path: str, known: SourceHash) -> None:
+        # Hash stored with a page, a hash computed since takes precedence
+        with self.lock:
+            self.hashes.setdefault(os.path.abspath(image_path), known)
+
+    def level_path(self, image_path: str, level: str) -> str:
+        if level == FULL_LEVEL:
+            return image_path
+        return os.path.join(self.folder, f"{self.get_source_hash(image_path)}_{level}.jpg")
+
+    def missing_levels(self, image_path: str) -> List[Tuple[str, int]]:
+        return [
+            (level, max_side)
+            for level, max_side in PYRAMID_LEVELS
+            if not os.path.exists(self.level_path(image_path, level))
+        ]
+
+    def generate(self, image_path: str) -> None:
+        missing = self.missing_levels(image_path)
+        if not missing:
+            return
+
+        os.makedirs(self.folder, exist_ok=True)
+        # Decoded outside of the image cache, generating the levels of a whole
+        # import would push out the pages in use
+        image = prepare_for_jpeg(load_image(image_path))
+        height, width = image.shape[:2]
+
+        # Largest level first, every level is reduced from the previous one
+        for level, max_side in reversed(missing):
+            image = cv2.resize(
+                image, level_size((width, height), max_side), interpolation=cv2.INTER_AREA
+            )
+            path = self.level_path(image_path, level)
+            # Written under a temporary name, readers never see partial files
+            temp_path = f"{path}.{threading.get_ident()}.tmp.jpg"
+            cv2.imwrite(temp_path, image, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+            os.replace(temp_path, path)
+
+        logger.debug(f"Generated image pyramid for: {image_path}")
+
+    def generate_in_background(self, image_path: str) -> Future:
+        with self.lock:
+            future = self.pending.get(image_path)
+            if future is not None:
+                return future
+
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="pyramid"
+                )
+            future = self.executor.submit(self.generate, image_path)
+            self.pending[image_path] = future
+
+        future.add_done_callback(lambda _: self.finish(image_path, future))
+        return future
+
+    def finish(self, image_path: str, future: Future) -> None:
+        with self.lock:
+            if self.pending.get(image_path) is future:
+                del self.pending[image_path]
+
+        if future.exception() is not None:
+            logger.error(f"Failed to generate image pyramid for {image_path}: {future.exception()}")
+
+    def get_path(
+        self, image_path: str, size: Tuple[int, int], target_size: Tuple[int, int]
+    ) -> str:
+        # Path of the smallest level covering target_size for an image of the
+        # given size, levels not generated yet are generated first
+        level = select_level(size, target_size)
+        path = self.level_path(image_path, level)
+
+        if level != FULL_LEVEL and not os.path.exists(path):
+            with self.lock:
+                future = self.pending.get(image_path)
+            try:
+                if future is not None:
+                    future.result()
+                else:
+                    self.generate(image_path)
+            except Exception as e:
+                logger.error(f"Falling back to the source image of {image_path}: {e}")
+                return image_path
+        return path
+
+    def find_path(
+        self, image_path: str, size: Tuple[int, int], target_size: Tuple[int, int]
+    ) -> Optional[str]:
+        # Like get_path(), but never hashes or generates anything, so it can be
+        # used on the GUI thread. None if the level isn't there yet.
+        level = select_level(size, target_size)
+        if level == FULL_LEVEL:
+            return image_path
+
+        digest = self.cached_source_hash(image_path)
+        if digest is None:
+            return None
+        path = os.path.join(self.folder, f"{digest}_{level}.jpg")
+        return path if os.path.exists(path) else None
+
+    def wait(self) -> None:
+        with self.lock:
+            futures = list(self.pending.values())
+        for future in futures:
+            future.result()
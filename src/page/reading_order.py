@@ -0,0 +1,180 @@
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from page.ocr_box import OCRBox  # type: ignore
+from page.box_type import BoxType  # type: ignore
+
+# Box types are compared by name, boxes may come from another import of the
+# box_type module
+HEADING_TYPES = {BoxType.HEADING_TEXT.name, BoxType.HEADING_IMAGE.name}
+CAPTION_TYPES = {BoxType.CAPTION_TEXT.name}
+IMAGE_TYPES = {
+    BoxType.FLOWING_IMAGE.name,
+    BoxType.HEADING_IMAGE.name,
+    BoxType.PULLOUT_IMAGE.name,
+}
+
+# Boxes at least this wide relative to their region are treated as spanning
+# all columns of it, like headings or wide images
+SPANNING_RATIO = 0.6
+
+
+def find_gaps(
+    starts: np.ndarray, ends: np.ndarray, min_gap: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Projects the intervals onto one axis, returns the order by start and the
+    # positions in that order where a gap of at least min_gap begins
+    order = np.argsort(starts, kind="stable")
+    reach = np.maximum.accumulate(ends[order])
+    gaps = starts[order][1:] - reach[:-1]
+    return order, np.flatnonzero(gaps >= min_gap) + 1
+
+
+class ReadingOrder:
+    # Recursive XY-cut over box rectangles held in NumPy arrays. Regions are
+    # split into columns at vertical gaps first, left to right, and otherwise
+    # into rows at horizontal gaps, top to bottom. Rows are only cut next to
+    # spanning boxes, so paragraphs of neighbouring columns that happen to
+    # line up don't end up interleaved.
+    def __init__(self, rects: np.ndarray, spanning: np.ndarray, min_gap: float) -> None:
+        # rects are (left, top, right, bottom) rows
+        self.left = rects[:, 0]
+        self.top = rects[:, 1]
+        self.right = rects[:, 2]
+        self.bottom = rects[:, 3]
+        self.widths = self.right - self.left
+        self.spanning = spanning
+        self.min_gap = min_gap
+
+    def order(self, indices: np.ndarray) -> List[int]:
+        result: List[int] = []
+        self.cut(indices, result)
+        return result
+
+    def cut(self, indices: np.ndarray, result: List[int]) -> None:
+        if len(indices) <= 1:
+            result.extend(indices.tolist())
+            return
+
+        order, cuts = find_gaps(self.left[indices], self.right[indices], self.min_gap)
+        if cuts.size:
+            for column in np.split(indices[order], cuts):
+                self.cut(column, result)
+            return
+
+        order, cuts = find_gaps(self.top[indices], self.bottom[indices], self.min_gap)
+        if not cuts.size:
+            # Nothing left to cut, overlapping boxes are read top to bottom
+            order = np.lexsort((self.left[indices], self.top[indices]))
+            result.extend(indices[order].tolist())
+            return
+
+        rows = np.split(indices[order], cuts)
+        region_width = self.right[indices].max() - self.left[indices].min()
+        row_spanning = [
+            bool(
+                self.spanning[row].any()
+                or (self.widths[row] >= region_width * SPANNING_RATIO).any()
+            )
+            for row in rows
+        ]
+
+        groups = [[rows[0]]]
+        for row_index in range(1, len(rows)):
+            if row_spanning[row_index - 1] or row_spanning[row_index]:
+                groups.append([rows[row_index]])
+            else:
+                groups[-1].append(rows[row_index])
+
+        if len(groups) == 1:
+            # No spanning boxes and no columns, cut every row
+            groups = [[row] for row in rows]
+
+        for group in groups:
+            self.cut(np.concatenate(group), result)
+
+
+def box_rects(boxes: Sequence[OCRBox]) -> np.ndarray:
+    rects = np.array(
+        [(box.x, box.y, box.x + box.width, box.y + box.height) for box in boxes],
+        dtype=np.float64,
+    )
+    return rects.reshape(-1, 4)
+
+
+def attach_captions(
+    order: List[int], rects: np.ndarray, captions: List[int], images: List[int]
+) -> List[int]:
+    # Every caption is read right after the image closest to it
+    if not images:
+        return order
+
+    image_rects = rects[images]
+    followers: dict = {}
+
+    for caption in captions:
+        dx = np.maximum(
+            0,
+            np.maximum(
+                image_rects[:, 0] - rects[caption, 2],
+                rects[caption, 0] - image_rects[:, 2],
+            ),
+        )
+        dy = np.maximum(
+            0,
+            np.maximum(
+                image_rects[:, 1] - rects[caption, 3],
+                rects[caption, 1] - image_rects[:, 3],
+            ),
+        )
+        image = images[int(np.argmin(np.hypot(dx, dy)))]
+        followers.setdefault(image, []).append(caption)
+
+    result = []
+    for index in order:
+        result.append(index)
+        result.extend(followers.get(index, []))
+    return result
+
+
+def compute_reading_order(
+    boxes: Sequence[OCRBox],
+    header_y: int = 0,
+    footer_y: Optional[int] = None,
+    min_gap: float = 1,
+) -> List[int]:
+    # Returns the indices of the boxes in reading order. Boxes above header_y
+    # come first and boxes below footer_y last, each sorted on their own.
+    count = len(boxes)
+    if count == 0:
+        return []
+
+    rects = box_rects(boxes)
+    type_names = [box.type.name for box in boxes]
+    spanning = np.array([name in HEADING_TYPES for name in type_names], dtype=bool)
+
+    images = [index for index, name in enumerate(type_names) if name in IMAGE_TYPES]
+    captions = [
+        index for index, name in enumerate(type_names) if name in CAPTION_TYPES
+    ]
+    if not images:
+        # Without images captions are ordered like any other text
+        captions = []
+
+    sections = np.zeros(count, dtype=np.int8)
+    if header_y:
+        sections[rects[:, 3] <= header_y] = -1
+    if footer_y is not None:
+        sections[rects[:, 1] >= footer_y] = 1
+    if captions:
+        sections[captions] = 2
+
+    reading_order = ReadingOrder(rects, spanning, min_gap)
+    order: List[int] = []
+    for section in (-1, 0, 1):
+        indices = np.flatnonzero(sections == section)
+        if indices.size:
+            order.extend(reading_order.order(indices))
+
+    return attach_captions(order, rects, captions, images)
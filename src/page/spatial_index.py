@@ -0,0 +1,207 @@
+import heapq
+import math
+from statistics import median
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from page.ocr_box import OCRBox  # type: ignore
+
+CellRange = Tuple[int, int, int, int]
+
+MIN_CELL_SIZE = 16
+
+
+def rect_distance(box: OCRBox, x: float, y: float) -> float:
+    # Distance of a point to the box, 0 if the point is inside
+    dx = max(box.x - x, 0, x - (box.x + box.width))
+    dy = max(box.y - y, 0, y - (box.y + box.height))
+    return math.hypot(dx, dy)
+
+
+class SpatialGrid:
+    # Uniform grid over box ids. Cells only narrow down the candidates, every
+    # query checks the current geometry of the boxes, so results are exact
+    # as long as geometry changes are reported through update().
+    def __init__(self, cell_size: int) -> None:
+        self.cell_size = max(int(cell_size), MIN_CELL_SIZE)
+        self.cells: Dict[Tuple[int, int], Set[str]] = {}
+        self.boxes: Dict[str, OCRBox] = {}
+        self.box_cells: Dict[str, CellRange] = {}
+
+    @classmethod
+    def from_boxes(cls, boxes: List[OCRBox]) -> "SpatialGrid":
+        # Cells about the size of a typical box keep both the number of cells
+        # per box and the number of boxes per cell small
+        sizes = [max(box.width, box.height) for box in boxes]
+        grid = cls(int(median(sizes)) if sizes else MIN_CELL_SIZE)
+
+        for box in boxes:
+            grid.insert(box)
+        return grid
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    def cell_range(self, x: float, y: float, width: float, height: float) -> CellRange:
+        cell_size = self.cell_size
+        return (
+            int(x // cell_size),
+            int(y // cell_size),
+            int((x + max(width, 0)) // cell_size),
+            int((y + max(height, 0)) // cell_size),
+        )
+
+    def insert(self, box: OCRBox) -> None:
+        if box.id in self.boxes:
+            self.remove(box.id)
+
+        cell_range = self.cell_range(box.x, box.y, box.width, box.height)
+        self.boxes[box.id] = box
+        self.box_cells[box.id] = cell_range
+
+        x1, y1, x2, y2 = cell_range
+        for cell_x in range(x1, x2 + 1):
+            for cell_y in range(y1, y2 + 1):
+                self.cells.setdefault((cell_x, cell_y), set()).add(box.id)
+
+    def remove(self, box_id: str) -> None:
+        cell_range = self.box_cells.pop(box_id, None)
+        self.boxes.pop(box_id, None)
+
+        if cell_range is None:
+            return
+
+        x1, y1, x2, y2 = cell_range
+        for cell_x in range(x1, x2 + 1):
+            for cell_y in range(y1, y2 + 1):
+                cell = self.cells.get((cell_x, cell_y))
+                if cell is not None:
+                    cell.discard(box_id)
+                    if not cell:
+                        del self.cells[(cell_x, cell_y)]
+
+    def update(self, box: OCRBox) -> None:
+        # Only touches the cells if the box moved into different ones
+        cell_range = self.cell_range(box.x, box.y, box.width, box.height)
+
+        if self.box_cells.get(box.id) != cell_range or self.boxes.get(box.id) is not box:
+            self.insert(box)
+
+    def candidates(self, cell_range: CellRange) -> Iterable[OCRBox]:
+        x1, y1, x2, y2 = cell_range
+
+        if (x2 - x1 + 1) * (y2 - y1 + 1) > len(self.cells):
+            # Large regions: walking the occupied cells is cheaper
+            box_ids: Set[str] = set()
+            for (cell_x, cell_y), cell in self.cells.items():
+                if x1 <= cell_x <= x2 and y1 <= cell_y <= y2:
+                    box_ids |= cell
+        else:
+            box_ids = set()
+            for cell_x in range(x1, x2 + 1):
+                for cell_y in range(y1, y2 + 1):
+                    cell = self.cells.get((cell_x, cell_y))
+                    if cell:
+                        box_ids |= cell
+
+        return (self.boxes[box_id] for box_id in box_ids)
+
+    def query_point(self, x: float, y: float) -> List[OCRBox]:
+        return [
+            box
+            for box in self.candidates(self.cell_range(x, y, 0, 0))
+            if box.x <= x <= box.x + box.width and box.y <= y <= box.y + box.height
+        ]
+
+    def query_rect(
+        self, x: float, y: float, width: float, height: float, contained: bool = False
+    ) -> List[OCRBox]:
+        # Boxes intersecting the rectangle, or lying inside it if contained
+        right = x + width
+        bottom = y + height
+        boxes = []
+
+        for box in self.candidates(self.cell_range(x, y, width, height)):
+            if contained:
+                if (
+                    box.x >= x
+                    and box.y >= y
+                    and box.x + box.width <= right
+                    and box.y + box.height <= bottom
+                ):
+                    boxes.append(box)
+            elif (
+                box.x < right
+                and box.x + box.width > x
+                and box.y < bottom
+                and box.y + box.height > y
+            ):
+                boxes.append(box)
+        return boxes
+
+    def nearest(
+        self,
+        x: float,
+        y: float,
+        count: int = 1,
+        max_distance: Optional[float] = None,
+    ) -> List[OCRBox]:
+        # Searches rings of cells around the point until the found boxes are
+        # closer than anything further out could be
+        if not self.cells:
+            return []
+
+        center_x = int(x // self.cell_size)
+        center_y = int(y // self.cell_size)
+        occupied_x = [cell_x for cell_x, _ in self.cells]
+        occupied_y = [cell_y for _, cell_y in self.cells]
+        max_ring = max(
+            abs(center_x - min(occupied_x)),
+            abs(center_x - max(occupied_x)),
+            abs(center_y - min(occupied_y)),
+            abs(center_y - max(occupied_y)),
+        )
+
+        seen: Set[str] = set()
+        found: List[Tuple[float, int, OCRBox]] = []
+
+        for ring in range(max_ring + 1):
+            ring_ids: Set[str] = set()
+            for cell_x in range(center_x - ring, center_x + ring + 1):
+                for cell_y in range(center_y - ring, center_y + ring + 1):
+                    if max(abs(cell_x - center_x), abs(cell_y - center_y)) != ring:
+                        continue
+                    cell = self.cells.get((cell_x, cell_y))
+                    if cell:
+                        ring_ids |= cell - seen
+
+            for box_id in ring_ids:
+                box = self.boxes[box_id]
+                distance = rect_distance(box, x, y)
+                if max_distance is None or distance <= max_distance:
+                    heapq.heappush(found, (distance, len(seen), box))
+                seen.add(box_id)
+
+            # Anything not seen yet is at least this far away
+            reach = ring * self.cell_size
+            if max_distance is not None and reach > max_distance:
+                break
+            if len(found) >= count and heapq.nsmallest(count, found)[-1][0] <= reach:
+                break
+
+        return [box for _, _, box in heapq.nsmallest(count, found)]
+
+    def overlapping_pairs(self) -> List[Tuple[OCRBox, OCRBox]]:
+        pairs: Dict[Tuple[str, str], Tuple[OCRBox, OCRBox]] = {}
+
+        for cell in self.cells.values():
+            if len(cell) < 2:
+                continue
+
+            cell_boxes = sorted((self.boxes[box_id] for box_id in cell), key=lambda box: box.id)
+            for index, box in enumerate(cell_boxes):
+                for other in cell_boxes[index + 1 :]:
+                    key = (box.id, other.id)
+                    if key not in pairs and box.intersects(other):
+                        pairs[key] = (box, other)
+
+        return list(pairs.values())
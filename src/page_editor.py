@@ -1,4 +1,5 @@
 import sys
+from PySide6.QtGui import QKeySequence, QUndoStack
 from PySide6.QtWidgets import QApplication, QDialog
 from platformdirs import user_data_dir
 
@@ -32,7 +33,14 @@ def main():
     project.analyze_pages()
     # page.recognize_boxes()
 
-    dialog = PageEditorView(page)
+    undo_stack = QUndoStack()
+    dialog = PageEditorView(page, undo_stack)
+
+    undo_action = undo_stack.createUndoAction(dialog, "&Undo")
+    undo_action.setShortcut(QKeySequence("Ctrl+z"))
+    redo_action = undo_stack.createRedoAction(dialog, "&Redo")
+    redo_action.setShortcut(QKeySequence("Ctrl+y"))
+    dialog.addActions([undo_action, redo_action])
 
     dialog.show()
     sys.exit(app.exec())
@@ -21,6 +21,8 @@ class BoxItemState(Enum):
 class BoxItem(QGraphicsRectItem, QObject):
     box_moved = Signal(str, int, int)
     box_resized = Signal(str, int, int, int, int)
+    # End of a drag, the moves and resizes of the next one are a new step
+    box_released = Signal(str)
 
     def __init__(
         self,
@@ -253,3 +255,4 @@ class BoxItem(QGraphicsRectItem, QObject):
         self.resizing = False
         self.set_movable(False)
         super().mouseReleaseEvent(event)
+        self.box_released.emit(self.box_id)
@@ -0,0 +1,141 @@
+import concurrent.futures
+import copy
+from typing import Callable, Dict, Optional
+
+from loguru import logger
+from PySide6.QtCore import QObject, QTimer, Qt, Signal, Slot
+from tesserocr import PyTessBaseAPI  # type: ignore
+
+from page.page import Page  # type: ignore
+from page.ocr_box import OCRBox, TextBox  # type: ignore
+from ocr_engine.ocr_engine_tesserocr import generate_lang_str, perform_ocr  # type: ignore
+
+# Time without further edits before a box is recognized again
+DEBOUNCE_MS = 150
+
+
+class BoxRecognizer(QObject):
+    # Recognizes edited boxes again on a worker thread. Edits of the same box
+    # within DEBOUNCE_MS are merged and results of superseded jobs dropped.
+    # Results are applied on the GUI thread, then on_recognized is called with
+    # the box.
+    job_finished = Signal(str, int, object)
+
+    def __init__(
+        self, page: Page, on_recognized: Optional[Callable[[OCRBox], None]] = None
+    ) -> None:
+        super().__init__()
+        self.page = page
+        self.on_recognized = on_recognized
+        # One worker, the tesseract handle is only used from its thread
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="box_recognizer"
+        )
+        self.api: Optional[PyTessBaseAPI] = None
+        self.api_settings: Optional[tuple] = None
+        self.timers: Dict[str, QTimer] = {}
+        self.futures: Dict[str, concurrent.futures.Future] = {}
+        # Latest job per box, results of older jobs are stale
+        self.generations: Dict[str, int] = {}
+
+        self.job_finished.connect(
+            self.apply_result, Qt.ConnectionType.QueuedConnection
+        )
+
+    def schedule(self, box: OCRBox) -> None:
+        if not isinstance(box, TextBox):
+            return
+
+        self.generations[box.id] = self.generations.get(box.id, 0) + 1
+
+        timer = self.timers.get(box.id)
+        if timer is None:
+            timer = QTimer(self)
+            timer.setSingleShot(True)
+            timer.timeout.connect(lambda box_id=box.id: self.start(box_id))
+            self.timers[box.id] = timer
+        timer.start(DEBOUNCE_MS)
+
+    def start(self, box_id: str) -> None:
+        box = self.page.layout.get_box_by_id(box_id)
+        if box is None:
+            return
+
+        previous = self.futures.get(box_id)
+        if previous is not None:
+            previous.cancel()
+
+        # The worker gets a copy, the box itself may change meanwhile
+        langs = self.page.settings.get("langs") or ["eng"]
+        ppi = self.page.settings.get("ppi") or 300
+        self.futures[box_id] = self.executor.submit(
+            self.recognize,
+            copy.copy(box),
+            self.generations[box_id],
+            self.page.image_path,
+            tuple(langs),
+            ppi,
+        )
+
+    def recognize(
+        self, box: OCRBox, generation: int, image_path: str, langs: tuple, ppi: int
+    ) -> None:
+        if self.generations.get(box.id) != generation:
+            return
+
+        try:
+            if self.api is None or self.api_settings != (image_path, langs, ppi):
+                if self.api is None:
+                    self.api = PyTessBaseAPI()
+                self.api.Init(lang=generate_lang_str(list(langs)))
+                self.api.SetImageFile(image_path)
+                self.api.SetSourceResolution(ppi)
+                self.api_settings = (image_path, langs, ppi)
+
+            perform_ocr(self.api, box)
+        except Exception as e:
+            logger.error(f"Error recognizing box {box.id}: {e}")
+            return
+
+        self.job_finished.emit(box.id, generation, box)
+
+    @Slot(str, int, object)
+    def apply_result(self, box_id: str, generation: int, result: OCRBox) -> None:
+        if self.generations.get(box_id) != generation:
+            return
+        self.futures.pop(box_id, None)
+
+        box = self.page.layout.get_box_by_id(box_id)
+        if box is None or (box.x, box.y, box.width, box.height) != (
+            result.x,
+            result.y,
+            result.width,
+            result.height,
+        ):
+            return
+
+        box.ocr_results = result.ocr_results
+        box.confidence = result.confidence
+        box.mark_recognized(self.page.recognition_fingerprint())
+        self.page.notify_recognition_callbacks([box])
+        logger.debug(f"Recognized edited box {box_id}")
+
+        if self.on_recognized is not None:
+            self.on_recognized(box)
+
+    def end_api(self) -> None:
+        if self.api is not None:
+            self.api.End()
+            self.api = None
+
+    def shutdown(self) -> None:
+        # Running jobs finish, their results are dropped as stale
+        for timer in self.timers.values():
+            timer.stop()
+        self.generations.clear()
+        for future in self.futures.values():
+            future.cancel()
+        self.futures.clear()
+        # Released on the worker thread once the running job is done
+        self.executor.submit(self.end_api)
+        self.executor.shutdown(wait=False)
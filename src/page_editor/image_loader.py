@@ -0,0 +1,45 @@
+import concurrent.futures
+from typing import Callable, Optional
+
+from loguru import logger
+from PySide6.QtCore import QObject, Qt, Signal, Slot
+from PySide6.QtGui import QImage
+
+
+class ImageLoader(QObject):
+    # Decodes page images on a worker thread. QImage may be used off the GUI
+    # thread, the callback gets it on the GUI thread to turn it into a pixmap.
+    image_loaded = Signal(str, object)
+
+    def __init__(self, on_loaded: Callable[[str, QImage], None]) -> None:
+        super().__init__()
+        self.on_loaded = on_loaded
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="image_loader"
+        )
+        self.future: Optional[concurrent.futures.Future] = None
+        self.closed = False
+
+        self.image_loaded.connect(self.deliver, Qt.ConnectionType.QueuedConnection)
+
+    def load(self, image_path: str) -> None:
+        # Only the latest image is of interest
+        if self.future is not None:
+            self.future.cancel()
+        self.future = self.executor.submit(self.decode, image_path)
+
+    def decode(self, image_path: str) -> None:
+        image = QImage(image_path)
+        if image.isNull():
+            logger.error(f"Could not decode image: {image_path}")
+            return
+        self.image_loaded.emit(image_path, image)
+
+    @Slot(str, object)
+    def deliver(self, image_path: str, image: QImage) -> None:
+        if not self.closed:
+            self.on_loaded(image_path, image)
+
+    def shutdown(self) -> None:
+        self.closed = True
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,48 @@
+from PySide6.QtGui import QUndoCommand
+
+from page.layout_history import (  # type: ignore
+    GeometryCommand,
+    InsertBoxesCommand,
+    LayoutCommand,
+    LayoutHistory,
+    RemoveBoxesCommand,
+    ReplaceBoxCommand,
+    TextCommand,
+)
+
+
+def command_text(command: LayoutCommand) -> str:
+    if isinstance(command, GeometryCommand):
+        return "Move Box"
+    if isinstance(command, TextCommand):
+        return "Edit Text"
+    if isinstance(command, ReplaceBoxCommand):
+        return "Change Box Type"
+    if isinstance(command, RemoveBoxesCommand):
+        return "Delete Boxes"
+    if isinstance(command, InsertBoxesCommand):
+        return "Add Boxes"
+    return "Edit Layout"
+
+
+class LayoutUndoCommand(QUndoCommand):
+    # Entry of a QUndoStack for a step of a LayoutHistory, so the undo and
+    # redo actions of the window drive the history. Both stacks grow and
+    # shrink together, steps the history already dropped to stay within its
+    # memory limit do nothing.
+    def __init__(self, history: LayoutHistory, command: LayoutCommand) -> None:
+        super().__init__(command_text(command))
+        self.history = history
+        # The edit was applied before it was pushed
+        self.pushed = False
+        self.applied = True
+
+    def undo(self) -> None:
+        self.applied = self.history.undo()
+
+    def redo(self) -> None:
+        if not self.pushed:
+            self.pushed = True
+            return
+        if self.applied:
+            self.history.redo()
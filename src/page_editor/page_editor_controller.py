@@ -1,34 +1,70 @@
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional
 
 from loguru import logger
 from page.page import Page  # type: ignore
 
-from PySide6.QtGui import QPixmap, QAction
+from PySide6.QtGui import QImage, QPixmap, QAction, QUndoStack
 from PySide6.QtWidgets import QMenu, QGraphicsScene
 
 from ocr_engine.layout_analyzer_tesserocr import LayoutAnalyzerTesserOCR  # type: ignore
 from ocr_engine.ocr_engine_tesserocr import OCREngineTesserOCR  # type: ignore
 from page.box_type import BoxType  # type: ignore
-from page.ocr_box import OCRBox  # type: ignore
+from page.ocr_box import OCRBox, TextBox  # type: ignore
+from page.layout_history import LayoutCommand, LayoutHistory  # type: ignore
+from page.page_layout import LayoutChangeSet, PageLayout  # type: ignore
+from page_editor.box_recognizer import BoxRecognizer  # type: ignore
+from page_editor.layout_undo_command import LayoutUndoCommand  # type: ignore
+from page_editor.image_loader import ImageLoader  # type: ignore
+
+# Size of the image shown while the full resolution image is loaded
+PREVIEW_TARGET_SIZE = (1024, 1024)
 
 
 class PageEditorController:
-    def __init__(self, page: Page, scene):
+    def __init__(self, page: Page, scene, undo_stack: Optional[QUndoStack] = None):
         self.page: Page = page
         self.scene = scene
+        self.history = LayoutHistory(page.layout, page=page)
+        # Steps of the history are pushed to the undo stack of the window, so
+        # its undo and redo actions apply to the layout
+        self.undo_stack = undo_stack if undo_stack is not None else QUndoStack()
+        self.history.add_push_callback(self.on_history_push)
+        # Boxes shown in the scene by id
+        self.boxes: Dict[str, OCRBox] = {}
+        page.layout.add_change_callback(self.on_layout_changed)
+        # Edited boxes are recognized again in the background
+        self.box_recognizer = BoxRecognizer(page, self.on_box_recognized)
+        self.image_loader = ImageLoader(self.on_image_loaded)
         self.delete_box_action: Optional[QAction] = None
         self.add_box_action: Optional[QAction] = None
+        self.analyze_boxes_action: Optional[QAction] = None
+        self.align_boxes_action: Optional[QAction] = None
 
     # def set_page_image(self, image_path: str) -> None:
     #     self.page.image_path = image_path
     #     self.scene.set_page_image(QPixmap(image_path))
 
     def load_page(self) -> None:
-        self.scene.set_page_image(QPixmap(self.page.image_path))
+        # A reduced copy is shown first if one was generated already, scaled
+        # to the page coordinates, and replaced by the full image once it is
+        # decoded on a worker thread
+        preview_path = self.page.find_image_path(PREVIEW_TARGET_SIZE)
+        if preview_path is not None and preview_path != self.page.image_path:
+            preview = QPixmap(preview_path)
+            if not preview.isNull():
+                self.scene.set_page_image(
+                    preview, self.page.image_size[0] / preview.width()
+                )
+
+        self.image_loader.load(self.page.image_path)
 
         for box in self.page.layout.boxes:
             self.add_box(box)
 
+    def on_image_loaded(self, image_path: str, image: QImage) -> None:
+        if image_path == self.page.image_path:
+            self.scene.set_page_image(QPixmap.fromImage(image))
+
     def create_actions(self) -> None:
         self.delete_box_action = QAction("Delete Box", None)
         self.delete_box_action.triggered.connect(self.remove_box)
@@ -36,21 +72,77 @@ class PageEditorController:
         self.add_box_action = QAction("Add Text Box", None)
         self.add_box_action.triggered.connect(self.add_new_box)
 
+        self.analyze_boxes_action = QAction("Analyze Selected Boxes", None)
+        self.analyze_boxes_action.triggered.connect(self.analyze_selected_boxes)
+
+        self.align_boxes_action = QAction("Align Selected Boxes", None)
+        self.align_boxes_action.triggered.connect(self.align_selected_boxes)
+
+    def selected_box_indices(self) -> List[int]:
+        indices = []
+        for box_id, box_item in self.scene.boxes.items():
+            box = self.page.layout.get_box_by_id(box_id)
+            if box is not None and box_item.isSelected():
+                indices.append(self.page.layout.index_of(box))
+        return indices
+
+    def analyze_selected_boxes(self) -> None:
+        # All selected boxes in one call, sharing the decoded image and the
+        # analyzer handles
+        self.page.analyze_boxes(self.selected_box_indices())
+
+    def align_selected_boxes(self) -> None:
+        self.page.align_boxes(self.selected_box_indices())
+
+    def close(self) -> None:
+        self.box_recognizer.shutdown()
+        self.image_loader.shutdown()
+        self.page.layout.remove_change_callback(self.on_layout_changed)
+        self.history.remove_push_callback(self.on_history_push)
+        # The steps refer to this history, they are useless without it
+        self.undo_stack.clear()
+        self.history.clear()
+
     def add_new_box(self, box: OCRBox) -> None:
-        self.page.layout.add_box(box)
-        self.add_box(box)
+        # The scene follows through on_layout_changed()
+        self.history.add_boxes([box])
         logger.info(f"Added new box {box.id}")
 
     def add_box(self, box: OCRBox) -> None:
         self.scene.add_box(box)
         box.add_callback(self.on_ocr_box_updated)
+        self.boxes[box.id] = box
         logger.info(f"Added box {box.id}")
 
     def remove_box(self, box_id: str) -> None:
-        self.page.layout.remove_box_by_id(box_id)
-        self.scene.remove_box(box_id)
+        self.history.remove_boxes([box_id])
         logger.info(f"Removed box {box_id}")
 
+    def remove_box_item(self, box_id: str) -> None:
+        self.scene.remove_box(box_id)
+        self.boxes.pop(box_id, None)
+
+    def convert_box(self, box_id: str, box_type: BoxType) -> None:
+        box = self.page.layout.get_box_by_id(box_id)
+        if box is not None:
+            self.history.convert_box(box, box_type)
+
+    def on_history_push(self, command: LayoutCommand) -> None:
+        self.undo_stack.push(LayoutUndoCommand(self.history, command))
+
+    def on_layout_changed(self, layout: PageLayout, changes: LayoutChangeSet) -> None:
+        # Keeps the scene in line with edits, undo and redo
+        for box_id in changes.removed:
+            self.remove_box_item(box_id)
+        for box in changes.added.values():
+            if box.id not in self.boxes:
+                self.add_box(box)
+        for box_id, box in changes.changed.items():
+            if self.boxes.get(box_id) is not box:
+                # Replaced by a box of another type
+                self.remove_box_item(box_id)
+                self.add_box(box)
+
     def on_ocr_box_updated(self, ocr_box: OCRBox, source: Optional[str] = None) -> None:
         if self.scene and source != "Backend":
             box_item = self.scene.boxes.get(ocr_box.id)
@@ -58,6 +150,15 @@ class PageEditorController:
                 box_item.setRect(ocr_box.x, ocr_box.y, ocr_box.width, ocr_box.height)
                 logger.info(f"Updated box {ocr_box.id}")
 
+    def on_box_edited(self, ocr_box: OCRBox) -> None:
+        self.box_recognizer.schedule(ocr_box)
+
+    def on_box_recognized(self, ocr_box: OCRBox) -> None:
+        box_item = self.scene.boxes.get(ocr_box.id) if self.scene else None
+        if box_item and isinstance(ocr_box, TextBox):
+            box_item.setToolTip(ocr_box.get_text())
+            box_item.update()
+
     # def recognize_text(self, box_id: int) -> str:
     #     box = self.page.layout.boxes[box_id]
     #     # text = box.recognize_text()
@@ -69,4 +170,8 @@ class PageEditorController:
             context_menu.addAction(self.delete_box_action)
         if self.add_box_action:
             context_menu.addAction(self.add_box_action)
+        if self.analyze_boxes_action and self.scene.selectedItems():
+            context_menu.addAction(self.analyze_boxes_action)
+        if self.align_boxes_action and self.scene.selectedItems():
+            context_menu.addAction(self.align_boxes_action)
         return context_menu
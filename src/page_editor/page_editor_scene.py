@@ -27,6 +27,7 @@ class PageEditorScene(QGraphicsScene):
         if self.controller:
             box_item.box_moved.connect(self.on_box_moved)
             box_item.box_resized.connect(self.on_box_resized)
+            box_item.box_released.connect(self.on_box_released)
 
         self.addItem(box_item)
         self.boxes[box.id] = box_item
@@ -40,7 +41,8 @@ class PageEditorScene(QGraphicsScene):
         if self.controller:
             ocr_box = self.controller.page.layout.get_box_by_id(box_id)
             if ocr_box:
-                ocr_box.update_position(x, y, "GUI")
+                self.controller.history.move_box(ocr_box, x, y, "GUI")
+                self.controller.on_box_edited(ocr_box)
 
     def on_box_resized(
         self, box_id: str, x: int, y: int, width: int, height: int
@@ -48,13 +50,20 @@ class PageEditorScene(QGraphicsScene):
         if self.controller:
             ocr_box = self.controller.page.layout.get_box_by_id(box_id)
             if ocr_box:
-                ocr_box.update_size(width, height, "GUI")
+                self.controller.history.resize_box(ocr_box, width, height, "GUI")
+                self.controller.on_box_edited(ocr_box)
 
-    def set_page_image(self, page_pixmap: QPixmap) -> None:
+    def on_box_released(self, box_id: str) -> None:
+        # A drag is one undo step, however many moves it took
+        if self.controller:
+            self.controller.history.end_merge()
+
+    def set_page_image(self, page_pixmap: QPixmap, scale: float = 1.0) -> None:
         if self.page_image_item:
             self.removeItem(self.page_image_item)
 
         self.page_image_item = QGraphicsPixmapItem(page_pixmap)
+        self.page_image_item.setScale(scale)
         self.page_image_item.setZValue(-1)
         self.page_image_item.setCacheMode(
             QGraphicsPixmapItem.CacheMode.DeviceCoordinateCache
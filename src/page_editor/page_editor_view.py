@@ -1,6 +1,14 @@
 from typing import Optional
 from PySide6.QtWidgets import QGraphicsView
-from PySide6.QtGui import QPainter, QImage, QPixmap, QMouseEvent, QEnterEvent
+from PySide6.QtGui import (
+    QPainter,
+    QImage,
+    QPixmap,
+    QMouseEvent,
+    QEnterEvent,
+    QCloseEvent,
+    QUndoStack,
+)
 from PySide6.QtCore import Qt, QEvent
 
 
@@ -11,7 +19,7 @@ from page.box_type import BoxType  # type: ignore
 
 
 class PageEditorView(QGraphicsView):
-    def __init__(self, page: Page) -> None:
+    def __init__(self, page: Page, undo_stack: Optional[QUndoStack] = None) -> None:
         super().__init__()
         self.setDragMode(QGraphicsView.DragMode.ScrollHandDrag)
         self.setTransformationAnchor(QGraphicsView.ViewportAnchor.AnchorUnderMouse)
@@ -30,9 +38,10 @@ class PageEditorView(QGraphicsView):
         self.max_zoom = 100
         self.min_zoom = -100
         self.accumulated_delta = 0
+        self.undo_stack = undo_stack
 
         self.page_editor_scene = PageEditorScene()
-        controller = PageEditorController(page, self.page_editor_scene)
+        controller = PageEditorController(page, self.page_editor_scene, undo_stack)
 
         self.page_editor_scene.controller = controller
 
@@ -44,10 +53,24 @@ class PageEditorView(QGraphicsView):
 
         self.page_editor_scene.controller.load_page()
 
+    def closeEvent(self, event: QCloseEvent) -> None:
+        if self.page_editor_scene.controller:
+            self.page_editor_scene.controller.close()
+        return super().closeEvent(event)
+
     def set_page(self, page: Page) -> None:
-        # self.page_editor_scene.set_page(page)
-        # self.page_editor_scene.update()
-        pass
+        # The controller of the previous page stops its background work
+        if self.page_editor_scene.controller:
+            self.page_editor_scene.controller.close()
+
+        self.page_editor_scene.clear()
+        self.page_editor_scene.boxes.clear()
+        self.page_editor_scene.page_image_item = None
+
+        self.page_editor_scene.controller = PageEditorController(
+            page, self.page_editor_scene, self.undo_stack
+        )
+        self.page_editor_scene.controller.load_page()
 
     def wheelEvent(self, event):
         if event.modifiers() & Qt.KeyboardModifier.ControlModifier:
@@ -0,0 +1,209 @@
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from page.box_alignment import binarize_image  # type: ignore
+
+# Pages are compared on row ink profiles of this many rows, so pages of any
+# resolution line up
+PROFILE_ROWS = 512
+# Fraction of ink pixels for a row to count as printed
+INK_THRESHOLD = 0.002
+# Headers and footers lie within this fraction of the page height
+MAX_BAND_FRACTION = 0.15
+# Minimum whitespace between a header or footer and the body
+MIN_GAP_FRACTION = 0.01
+# How far the same band may move from page to page
+TOLERANCE_FRACTION = 0.01
+# Fraction of pages a band has to appear on to count as recurring
+MIN_PAGE_RATIO = 0.5
+
+
+def row_ink_profile(image: np.ndarray) -> np.ndarray:
+    # Fraction of ink pixels per row, resampled to PROFILE_ROWS. The page is
+    # scaled down first, binarizing full resolution scans would dominate. Text
+    # lines are many pixels high, so plain linear sampling keeps them.
+    height, width = image.shape[:2]
+    scale = min(1.0, 2 * PROFILE_ROWS / height)
+    if scale < 1.0:
+        image = cv2.resize(
+            image,
+            (max(1, int(width * scale)), max(1, int(height * scale))),
+            interpolation=cv2.INTER_LINEAR,
+        )
+
+    profile = cv2.reduce(binarize_image(image), 1, cv2.REDUCE_AVG, dtype=cv2.CV_32F)
+    return cv2.resize(profile, (1, PROFILE_ROWS), interpolation=cv2.INTER_AREA).ravel()
+
+
+def find_top_bands(
+    has_ink: np.ndarray, max_rows: int, min_gap: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # First printed band of every page (row), if it ends within max_rows and
+    # is followed by at least min_gap empty rows. Returns the band starts and
+    # ends and the row the body starts at, -1 for pages without such a band.
+    page_count, row_count = has_ink.shape
+    rows = np.arange(row_count)
+    no_band = np.full(page_count, -1)
+
+    printed = has_ink.any(axis=1)
+    starts = np.where(printed, has_ink.argmax(axis=1), row_count)
+
+    # gap_starts[page, row]: the min_gap rows from row on are all empty
+    empty = np.concatenate(
+        [np.zeros((page_count, 1), dtype=np.int32), np.cumsum(~has_ink, axis=1)],
+        axis=1,
+    )
+    window_end = np.minimum(rows + min_gap, row_count)
+    gap_starts = (empty[:, window_end] - empty[:, rows]) >= min_gap
+
+    # The band ends where the first gap after its start begins
+    after_start = gap_starts & (rows >= starts[:, None])
+    has_gap = after_start.any(axis=1)
+    ends = np.where(has_gap, after_start.argmax(axis=1), row_count)
+
+    # The body starts at the first printed row after the gap
+    after_end = has_ink & (rows >= ends[:, None])
+    has_body = after_end.any(axis=1)
+    bodies = np.where(has_body, after_end.argmax(axis=1), row_count)
+
+    valid = printed & has_gap & has_body & (ends <= max_rows)
+    return (
+        np.where(valid, starts, no_band),
+        np.where(valid, ends, no_band),
+        np.where(valid, bodies, no_band),
+    )
+
+
+def recurring_bands(
+    starts: np.ndarray, ends: np.ndarray, tolerance: int, min_pages: int
+) -> np.ndarray:
+    # Pages whose band lies where the bands of most other pages lie
+    found = starts >= 0
+    if found.sum() < max(min_pages, 2):
+        return np.zeros(len(starts), dtype=bool)
+
+    median_start = np.median(starts[found])
+    median_end = np.median(ends[found])
+    matches = (
+        found
+        & (np.abs(starts - median_start) <= tolerance)
+        & (np.abs(ends - median_end) <= tolerance)
+    )
+
+    if matches.sum() < max(min_pages, 2):
+        return np.zeros(len(starts), dtype=bool)
+    return matches
+
+
+def relative_box_bands(
+    layouts: Sequence[Any], from_bottom: bool = False
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Page index and relative top and bottom of every box, measured from the
+    # bottom of the page if from_bottom, so footers are found like headers
+    page_indices: List[int] = []
+    tops: List[float] = []
+    bottoms: List[float] = []
+
+    for page_index, layout in enumerate(layouts):
+        height = layout.region[3]
+        if height <= 0:
+            continue
+
+        for box in layout.boxes:
+            top = box.y / height
+            bottom = (box.y + box.height) / height
+            if from_bottom:
+                top, bottom = 1 - bottom, 1 - top
+            page_indices.append(page_index)
+            tops.append(top)
+            bottoms.append(bottom)
+
+    return np.array(page_indices, dtype=np.int64), np.array(tops), np.array(bottoms)
+
+
+def recurring_box_bottoms(
+    bands: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    page_count: int,
+    max_fraction: float,
+    tolerance: float,
+    min_pages: int,
+) -> np.ndarray:
+    # Boxes near the top of the page found at the same height on enough
+    # pages, like running heads the layout analysis already boxed. Returns
+    # the relative bottom of the lowest of them per page, 0 if there are none.
+    page_indices, tops, bottoms = bands
+    result = np.zeros(page_count)
+
+    near_top = bottoms <= max_fraction
+    page_indices = page_indices[near_top]
+    tops = tops[near_top]
+    bottoms = bottoms[near_top]
+    if not len(page_indices):
+        return result
+
+    # Boxes at the same height fall into the same cell
+    keys = np.stack([np.round(tops / tolerance), np.round(bottoms / tolerance)], axis=1)
+    unique_keys, key_indices = np.unique(keys, axis=0, return_inverse=True)
+    key_indices = key_indices.ravel()
+
+    # Number of different pages per cell
+    pairs = np.unique(np.stack([key_indices, page_indices], axis=1), axis=0)
+    page_counts = np.bincount(pairs[:, 0], minlength=len(unique_keys))
+
+    recurring = page_counts[key_indices] >= max(min_pages, 2)
+    np.maximum.at(result, page_indices[recurring], bottoms[recurring])
+    return result
+
+
+def detect_header_footer(
+    images: Iterable[np.ndarray],
+    layouts: Sequence[Any],
+    heights: Optional[Sequence[int]] = None,
+    min_page_ratio: float = MIN_PAGE_RATIO,
+) -> List[Tuple[int, int]]:
+    # Header and footer heights in pixels of heights for every page, 0 where
+    # the page has no recurring header or footer. Without heights the images
+    # are taken at full size. The images are only read once, one after the
+    # other.
+    profiles = []
+    image_heights = []
+    for image in images:
+        profiles.append(row_ink_profile(image))
+        image_heights.append(image.shape[0])
+
+    if not profiles:
+        return []
+
+    has_ink = np.stack(profiles) > INK_THRESHOLD
+
+    max_rows = int(PROFILE_ROWS * MAX_BAND_FRACTION)
+    min_gap = max(1, int(PROFILE_ROWS * MIN_GAP_FRACTION))
+    tolerance = max(1, int(PROFILE_ROWS * TOLERANCE_FRACTION))
+    min_pages = int(np.ceil(len(profiles) * min_page_ratio))
+
+    page_heights = np.array(
+        heights if heights is not None else image_heights, dtype=np.float64
+    )
+    results = []
+
+    for flipped in (False, True):
+        page_has_ink = has_ink[:, ::-1] if flipped else has_ink
+        starts, ends, bodies = find_top_bands(page_has_ink, max_rows, min_gap)
+        matches = recurring_bands(starts, ends, tolerance, min_pages)
+
+        # The boundary lies in the middle of the gap below the band
+        boundaries = np.where(matches, (ends + bodies) / 2 / PROFILE_ROWS, 0.0)
+
+        box_bottoms = recurring_box_bottoms(
+            relative_box_bands(layouts, flipped),
+            len(profiles),
+            MAX_BAND_FRACTION,
+            TOLERANCE_FRACTION,
+            min_pages,
+        )
+        boundaries = np.maximum(boundaries, box_bottoms)
+        results.append(np.round(boundaries * page_heights).astype(int))
+
+    return list(zip(results[0].tolist(), results[1].tolist()))
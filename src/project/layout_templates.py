@@ -0,0 +1,180 @@
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+from loguru import logger
+
+from page.box_alignment import (  # type: ignore
+    binarize_image,
+    component_membership,
+    content_rects,
+    ink_components,
+)
+from page.ocr_box import BOX_TYPE_MAP, OCRBox  # type: ignore
+from page.box_type import BoxType  # type: ignore
+
+# Pages are compared on a coarse grid of ink cells
+SIGNATURE_SIZE = (32, 48)  # (width, height)
+# Fraction of ink in a cell for it to count as printed
+CELL_INK_THRESHOLD = 0.01
+# Largest signature distance for a page to be tried against a template
+MAX_SIGNATURE_DISTANCE = 0.25
+# A match is kept if the template boxes cover this much of the page ink...
+MIN_INK_COVERAGE = 0.95
+# ...and this many of them still contain ink
+MIN_BOX_HIT_RATIO = 0.9
+# Template boxes catch ink up to this fraction of the page size outside of
+# them, pages of a book are never scanned at exactly the same position
+MATCH_MARGIN = 0.02
+# Refined boxes keep a small margin around their ink
+BOX_PADDING = 4
+
+
+def page_signature(image: np.ndarray) -> np.ndarray:
+    # Printed cells of a coarse grid over the page
+    height, width = image.shape[:2]
+    scale = min(1.0, 1024 / height)
+    if scale < 1.0:
+        image = cv2.resize(
+            image,
+            (max(1, int(width * scale)), max(1, int(height * scale))),
+            interpolation=cv2.INTER_LINEAR,
+        )
+
+    ink = binarize_image(image).astype(np.float32)
+    cells = cv2.resize(ink, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA)
+    return (cells > CELL_INK_THRESHOLD).ravel()
+
+
+def signature_distances(signatures: np.ndarray, signature: np.ndarray) -> np.ndarray:
+    # Share of printed cells that differ, for all templates at once
+    differing = (signatures != signature).sum(axis=1)
+    printed = (signatures | signature).sum(axis=1)
+    return np.where(printed > 0, differing / np.maximum(printed, 1), 0.0)
+
+
+class LayoutTemplate:
+    # Boxes of an analyzed page, relative to the page size
+    def __init__(
+        self, signature: np.ndarray, rects: np.ndarray, box_types: List[str]
+    ) -> None:
+        self.signature = signature
+        # (left, top, right, bottom) rows as fractions of the page size
+        self.rects = rects
+        self.box_types = box_types
+        self.uses = 0
+
+    def page_rects(self, width: int, height: int) -> np.ndarray:
+        scale = np.array([width, height, width, height], dtype=np.float64)
+        return np.round(self.rects * scale).astype(np.int64)
+
+
+class LayoutTemplates:
+    # Layouts of analyzed pages, reused for pages that look the same instead
+    # of running layout analysis again. A match is refined by snapping the
+    # template boxes to the ink of the new page and rejected if the boxes no
+    # longer cover the page content.
+    def __init__(self, max_distance: float = MAX_SIGNATURE_DISTANCE) -> None:
+        self.max_distance = max_distance
+        self.templates: List[LayoutTemplate] = []
+        self.signatures = np.zeros((0, SIGNATURE_SIZE[0] * SIGNATURE_SIZE[1]), dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.templates)
+
+    def add(self, image: np.ndarray, boxes: List[OCRBox]) -> Optional[LayoutTemplate]:
+        if not boxes:
+            return None
+
+        height, width = image.shape[:2]
+        scale = np.array([width, height, width, height], dtype=np.float64)
+        rects = (
+            np.array(
+                [
+                    (box.x, box.y, box.x + box.width, box.y + box.height)
+                    for box in boxes
+                ],
+                dtype=np.float64,
+            )
+            / scale
+        )
+
+        template = LayoutTemplate(
+            page_signature(image), rects, [box.type.name for box in boxes]
+        )
+        self.templates.append(template)
+        self.signatures = np.vstack([self.signatures, template.signature])
+        return template
+
+    def candidates(self, signature: np.ndarray) -> List[Tuple[float, LayoutTemplate]]:
+        if not self.templates:
+            return []
+
+        distances = signature_distances(self.signatures, signature)
+        order = np.argsort(distances, kind="stable")
+        return [
+            (float(distances[index]), self.templates[index])
+            for index in order
+            if distances[index] <= self.max_distance
+        ]
+
+    def match(
+        self, image: np.ndarray, region: Tuple[int, int, int, int]
+    ) -> Optional[List[OCRBox]]:
+        # Boxes for the page from the closest template that passes
+        # verification, None if layout analysis has to run
+        candidates = self.candidates(page_signature(image))
+        if not candidates:
+            return None
+
+        components = ink_components(binarize_image(image))
+        region_x, region_y, region_width, region_height = region
+        in_region = (
+            (components[:, 0] >= region_x)
+            & (components[:, 1] >= region_y)
+            & (components[:, 2] <= region_x + region_width)
+            & (components[:, 3] <= region_y + region_height)
+        )
+        components = components[in_region]
+        height, width = image.shape[:2]
+
+        for distance, template in candidates:
+            boxes = self.verify(template, components, width, height)
+            if boxes is not None:
+                template.uses += 1
+                logger.debug(f"Reusing layout template, signature distance {distance:.3f}")
+                return boxes
+
+        return None
+
+    def verify(
+        self, template: LayoutTemplate, components: np.ndarray, width: int, height: int
+    ) -> Optional[List[OCRBox]]:
+        margin = int(max(width, height) * MATCH_MARGIN)
+        rects = template.page_rects(width, height)
+        rects[:, :2] -= margin
+        rects[:, 2:] += margin
+        refined, has_content = content_rects(rects, components, BOX_PADDING)
+
+        if has_content.mean() < MIN_BOX_HIT_RATIO:
+            return None
+
+        if len(components):
+            areas = (components[:, 2] - components[:, 0]) * (
+                components[:, 3] - components[:, 1]
+            )
+            covered = component_membership(rects[has_content], components).any(axis=0)
+            if areas[covered].sum() < areas.sum() * MIN_INK_COVERAGE:
+                return None
+
+        boxes = []
+        for (left, top, right, bottom), content, box_type in zip(
+            refined.tolist(), has_content, template.box_types
+        ):
+            if content:
+                boxes.append(
+                    BOX_TYPE_MAP[box_type](
+                        left, top, right - left, bottom - top, BoxType[box_type]
+                    )
+                )
+        return boxes
@@ -0,0 +1,115 @@
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Largest Hamming distance between the 64 bit hashes of two pages for them to
+# count as the same scan
+DUPLICATE_DISTANCE = 6
+
+HASH_SIZE = 8
+# The DCT runs on a larger image than the hash, as in the usual pHash
+DCT_SIZE = 32
+# Pages are first scaled down cheaply to this size
+PRESCALE_SIZE = 256
+
+
+class DuplicatePolicy(str, Enum):
+    KEEP = "keep"
+    # Duplicates are not added at all
+    SKIP = "skip"
+    # Duplicates are added, but reference the page they duplicate
+    LINK = "link"
+
+
+def perceptual_hash(image: np.ndarray) -> int:
+    # 64 bit pHash: signs of the low frequency DCT coefficients relative to
+    # their median, stable under rescaling, recompression and small shifts
+    if image.ndim == 3:
+        if image.shape[2] == 4:
+            image = cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY)
+        else:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    height, width = image.shape[:2]
+    if height > PRESCALE_SIZE or width > PRESCALE_SIZE:
+        image = cv2.resize(
+            image, (PRESCALE_SIZE, PRESCALE_SIZE), interpolation=cv2.INTER_LINEAR
+        )
+
+    small = cv2.resize(
+        image.astype(np.float32), (DCT_SIZE, DCT_SIZE), interpolation=cv2.INTER_AREA
+    )
+    coefficients = cv2.dct(small)[:HASH_SIZE, :HASH_SIZE].ravel()
+    # The DC term only reflects the overall brightness
+    bits = coefficients > np.median(coefficients[1:])
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def hamming_distances(hashes: np.ndarray, image_hash: int) -> np.ndarray:
+    differing = np.bitwise_xor(hashes, np.uint64(image_hash))
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(differing)
+    # NumPy before 2.0
+    return np.unpackbits(differing.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+class PageHashIndex:
+    # Perceptual hashes of the pages of a project by page id, compared all at
+    # once against the hash of a new page
+    def __init__(self) -> None:
+        self.page_ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.hashes = np.zeros(0, dtype=np.uint64)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, page_id: str) -> bool:
+        return page_id in self.positions
+
+    def add(self, page_id: str, image_hash: int) -> None:
+        if page_id in self.positions:
+            self.hashes[self.positions[page_id]] = image_hash
+            return
+
+        if self._size == len(self.hashes):
+            # Grow geometrically, so adding pages one by one stays linear
+            hashes = np.zeros(max(16, 2 * len(self.hashes)), dtype=np.uint64)
+            hashes[: self._size] = self.hashes[: self._size]
+            self.hashes = hashes
+
+        self.positions[page_id] = self._size
+        self.page_ids.append(page_id)
+        self.hashes[self._size] = image_hash
+        self._size += 1
+
+    def remove(self, page_id: str) -> None:
+        position = self.positions.pop(page_id, None)
+        if position is None:
+            return
+
+        # The last entry takes the place of the removed one
+        last = self._size - 1
+        if position != last:
+            last_page_id = self.page_ids[last]
+            self.page_ids[position] = last_page_id
+            self.hashes[position] = self.hashes[last]
+            self.positions[last_page_id] = position
+        self.page_ids.pop()
+        self._size -= 1
+
+    def find(
+        self, image_hash: int, max_distance: int = DUPLICATE_DISTANCE
+    ) -> Optional[Tuple[str, int]]:
+        # Closest page within max_distance and its distance
+        if not self._size:
+            return None
+
+        distances = hamming_distances(self.hashes[: self._size], image_hash)
+        position = int(np.argmin(distances))
+        if distances[position] > max_distance:
+            return None
+        return self.page_ids[position], int(distances[position])
@@ -0,0 +1,236 @@
+from collections import deque
+import concurrent.futures
+import multiprocessing
+import os
+from typing import Any, Callable, Deque, Iterator, List, Optional, Tuple, Union
+
+from loguru import logger
+from pypdf import PdfReader
+
+from page.page import Page  # type: ignore
+from project.page_hash import DuplicatePolicy  # type: ignore
+
+try:
+    import pypdfium2 as pdfium  # type: ignore
+except ImportError:
+    pdfium = None
+
+NUM_THREADS = 4
+# Pages whose images are held in memory at the same time
+MAX_IN_FLIGHT = 8
+# Pages rendered by one worker process in a row, the document is opened once
+# per chunk
+RENDER_CHUNK_SIZE = 8
+PDF_POINTS_PER_INCH = 72
+
+
+def write_file(file_path: str, data: bytes) -> None:
+    # Written under a temporary name, so a crash never leaves a partial image
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, file_path)
+
+
+def render_pages(
+    pdf_path: str, page_numbers: List[int], ppi: int, path_prefix: str
+) -> List[str]:
+    # Runs in a worker process, renders the pages to PNG files
+    pdf = pdfium.PdfDocument(pdf_path)
+    image_paths = []
+
+    try:
+        for page_number in page_numbers:
+            page = pdf[page_number]
+            image = page.render(scale=ppi / PDF_POINTS_PER_INCH).to_pil()
+            page.close()
+
+            image_path = f"{path_prefix}_{page_number}.png"
+            temp_path = f"{image_path}.tmp"
+            image.save(temp_path, format="PNG", dpi=(ppi, ppi))
+            os.replace(temp_path, image_path)
+            image_paths.append(image_path)
+    finally:
+        pdf.close()
+
+    return image_paths
+
+
+# Work items of the producer: an embedded image (file name, data) or a chunk
+# of page numbers to render
+ImportItem = Union[Tuple[str, bytes], List[int]]
+
+
+class PdfImporter:
+    # Imports the pages of a PDF. Embedded images are read from the PDF on
+    # the calling thread and written to the project folder by a worker pool,
+    # which also creates the pages (reading only the image headers) and hashes
+    # them for duplicate detection. Pages without exactly one embedded image
+    # (vector pages, pages made of image strips) can be rendered instead, in
+    # chunks of pages by a process pool. Pages are added to the project in PDF
+    # order, at most max_in_flight embedded images are held in memory and
+    # two chunks per process are rendered ahead.
+    def __init__(
+        self,
+        project: Any,
+        duplicates: DuplicatePolicy = DuplicatePolicy.KEEP,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        num_threads: int = NUM_THREADS,
+        on_page: Optional[Callable[[Page], None]] = None,
+        rasterize: Optional[bool] = False,
+        num_processes: Optional[int] = None,
+    ) -> None:
+        self.project = project
+        self.duplicates = duplicates
+        self.max_in_flight = max_in_flight
+        self.num_threads = num_threads
+        # Called with every added page, e.g. to queue it for layout analysis
+        self.on_page = on_page
+        # True renders every page, None only pages without exactly one
+        # embedded image
+        self.rasterize = rasterize
+        self.num_processes = num_processes or os.cpu_count() or 1
+
+        if self.rasterize is not False and pdfium is None:
+            logger.error(
+                "Rendering PDF pages needs pypdfium2, importing embedded images only"
+            )
+            self.rasterize = False
+
+    def needs_rendering(self, pdf_page: Any) -> bool:
+        if self.rasterize is None:
+            return len(pdf_page.images) != 1
+        return bool(self.rasterize)
+
+    def items(
+        self, pdf_path: str, from_page: int = 0, to_page: int = -1
+    ) -> Iterator[ImportItem]:
+        pdf_reader = PdfReader(pdf_path)
+        total_pages = len(pdf_reader.pages)
+        if to_page == -1 or to_page >= total_pages:
+            to_page = total_pages - 1
+
+        pdf_file_name = os.path.splitext(os.path.basename(pdf_path))[0]
+        chunk: List[int] = []
+        # Short documents are still spread over all processes
+        chunk_size = min(
+            RENDER_CHUNK_SIZE, max(1, (to_page - from_page + 1) // self.num_processes)
+        )
+
+        for i in range(from_page, to_page + 1):
+            logger.info(f"Importing PDF page: {i} / {total_pages}")
+            pdf_page = pdf_reader.pages[i]
+
+            if self.needs_rendering(pdf_page):
+                chunk.append(i)
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+                continue
+
+            # Rendered pages before this one come first
+            if chunk:
+                yield chunk
+                chunk = []
+
+            for image in pdf_page.images:
+                yield f"{pdf_file_name}_{i}_{image.name}", image.data
+
+        if chunk:
+            yield chunk
+
+    def create_page(self, image_path: str) -> Page:
+        page = Page(image_path)
+        if self.duplicates != DuplicatePolicy.KEEP:
+            page.get_image_hash()
+        return page
+
+    def import_image(self, image_path: str, data: bytes) -> List[Page]:
+        write_file(image_path, data)
+        return [self.create_page(image_path)]
+
+    def run(self, pdf_path: str, from_page: int = 0, to_page: int = -1) -> List[Page]:
+        logger.info(
+            f"Importing PDF: {pdf_path}, from_page: {from_page}, to_page: {to_page}"
+        )
+        pages: List[Page] = []
+        # Futures of the items in PDF order and whether they render pages
+        pending: Deque[Tuple[concurrent.futures.Future, bool]] = deque()
+        ppi = self.project.settings.get("ppi") or 300
+        pdf_file_name = os.path.splitext(os.path.basename(pdf_path))[0]
+        path_prefix = os.path.join(self.project.project_folder, pdf_file_name)
+
+        def add_next() -> None:
+            future, rendered = pending.popleft()
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Failed to import PDF page: {e}")
+                return
+
+            for page in result:
+                if rendered:
+                    # Rendered files are new, reading their headers is cheap
+                    page = self.create_page(page)
+
+                page = self.project.add_new_page(page, self.duplicates)
+                if page is None:
+                    continue
+                if rendered:
+                    # The resolution is known, no need to guess from the paper size
+                    page.settings.set("ppi", ppi)
+
+                logger.info(f"Added image: {page.image_path}")
+                pages.append(page)
+                if self.on_page is not None:
+                    self.on_page(page)
+
+        def is_full() -> bool:
+            rendering = sum(1 for _, rendered in pending if rendered)
+            return (
+                len(pending) - rendering >= self.max_in_flight
+                or rendering >= 2 * self.num_processes
+            )
+
+        # Spawned, forking would copy the threads and locks of the GUI and of
+        # the pools of the importer into the workers
+        processes = (
+            concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.num_processes,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            if self.rasterize is not False
+            else None
+        )
+
+        try:
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.num_threads
+            ) as executor:
+                for item in self.items(pdf_path, from_page, to_page):
+                    if isinstance(item, list):
+                        future = processes.submit(
+                            render_pages, pdf_path, item, ppi, path_prefix
+                        )
+                        pending.append((future, True))
+                    else:
+                        file_name, data = item
+                        image_path = os.path.join(
+                            self.project.project_folder, file_name
+                        )
+                        future = executor.submit(self.import_image, image_path, data)
+                        pending.append((future, False))
+
+                    while is_full() or (
+                        pending and pending[0][0].done()
+                    ):
+                        add_next()
+
+                while pending:
+                    add_next()
+        finally:
+            if processes is not None:
+                processes.shutdown()
+
+        logger.info(f"Finished importing PDF: {pdf_path}, {len(pages)} pages added")
+        return pages
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Callable, List, Optional, Tuple
 import uuid
 
 from loguru import logger
@@ -7,19 +7,39 @@ from exporter.exporter_html import ExporterHTML  # type: ignore
 from exporter.exporter_txt import ExporterTxt  # type: ignore
 from exporter.exporter_odt import ExporterODT  # type: ignore
 from exporter.exporter_epub import ExporterEPUB  # type: ignore
+from exporter.exporter_hocr import ExporterHOCR  # type: ignore
+from exporter.exporter_alto import ExporterALTO  # type: ignore
+from exporter.exporter_xml_based import ExporterXMLBased  # type: ignore
 from page.page import Page  # type: ignore
+from page.image_cache import image_cache  # type: ignore
+from page.image_probe import ImageInfo  # type: ignore
+from page.page_pyramid import PYRAMID_FOLDER, PagePyramid  # type: ignore
+from ocr_engine.ocr_statistics import OCRStatistics  # type: ignore
+from project.text_index import TextIndex, TextIndexHit  # type: ignore
+from project.header_footer import PROFILE_ROWS, detect_header_footer  # type: ignore
+from project.layout_templates import LayoutTemplates  # type: ignore
+from project.page_hash import (  # type: ignore
+    DUPLICATE_DISTANCE,
+    DuplicatePolicy,
+    PageHashIndex,
+)
+from project.pdf_importer import PdfImporter  # type: ignore
 from papersize import SIZES, parse_length  # type: ignore
-from pypdf import PdfReader
 
 from enum import Enum, auto
 import os
 
+# Lowest resolution taken from image files
+MIN_FILE_PPI = 100
+
 
 class ExporterType(Enum):
     TXT = auto()
     HTML = auto()
     ODT = auto()
     EPUB = auto()
+    HOCR = auto()
+    ALTO = auto()
 
 
 EXPORTER_MAP = {
@@ -27,11 +47,15 @@ EXPORTER_MAP = {
     ExporterType.HTML: ExporterHTML,
     ExporterType.ODT: ExporterODT,
     ExporterType.EPUB: ExporterEPUB,
+    ExporterType.HOCR: ExporterHOCR,
+    ExporterType.ALTO: ExporterALTO,
 }
 
 
 class Project:
-    version = 4
+    version = 5
+    # Older versions that can still be loaded, 4 is the JSON project format
+    compatible_versions = [4, 5]
 
     def __init__(self, name, description) -> None:
         self.uuid = str(uuid.uuid4())
@@ -39,6 +63,12 @@ class Project:
         self.description = description
         self.pages: List[Page] = []
         self.project_folder = ""
+        self.text_index = TextIndex()
+        # Perceptual hashes of the pages for duplicate detection, pages of
+        # older projects are hashed on the first check
+        self.page_hashes = PageHashIndex()
+        # Created once the project has a folder
+        self.pyramid: Optional[PagePyramid] = None
         self.settings = ProjectSettings(
             {
                 "ppi": 300,
@@ -46,109 +76,306 @@ class Project:
                 "paper_size": "a4",
                 "export_scaling_factor": 1.2,
                 "export_path": "",
+                "export_single_file": True,
             }
         )
 
-    def calculate_ppi(self, image, paper_size) -> int:
+    def calculate_ppi(self, image_info: ImageInfo, paper_size) -> int:
+        # The resolution stored in the file, unless it is too low to be one
+        # of a scan, as with the 72 ppi many programs write by default
+        if image_info.dpi is not None and image_info.dpi[1] >= MIN_FILE_PPI:
+            return int(round(image_info.dpi[1]))
+
         # TODO: Let's assume 1:1 pixel ratio for now, so ignore width
         height_in = int(parse_length(SIZES[paper_size].split(" x ")[1], "in"))
-        height_px = image.shape[0]
-        return int(height_px / height_in)
-
-    def add_image(self, image_path: str):
+        return int(image_info.height / height_in)
+
+    def get_pyramid(self) -> Optional[PagePyramid]:
+        if not self.project_folder:
+            return None
+
+        folder = os.path.join(self.project_folder, PYRAMID_FOLDER)
+        if self.pyramid is None or self.pyramid.folder != folder:
+            self.pyramid = PagePyramid(folder)
+        return self.pyramid
+
+    def attach_pyramid(self, page: Page) -> None:
+        # Thumbnails and previews are generated in the background, so page
+        # lists and the editor don't have to decode the full image
+        page.pyramid = self.get_pyramid()
+        if page.pyramid is not None:
+            # The levels of an unchanged file are found without hashing it
+            if page.source_hash is not None:
+                page.pyramid.remember_source_hash(page.image_path, page.source_hash)
+            page.pyramid.generate_in_background(page.image_path)
+
+    def update_pyramids(self) -> None:
+        for page in self.pages:
+            self.attach_pyramid(page)
+
+    def add_image(
+        self,
+        image_path: str,
+        duplicates: DuplicatePolicy = DuplicatePolicy.KEEP,
+        max_distance: int = DUPLICATE_DISTANCE,
+    ) -> Optional[Page]:
         if not os.path.exists(image_path):
             logger.error(f"Image file does not exist: {image_path}")
-            return
+            return None
 
         logger.info(f"Adding image: {image_path}")
-        self.add_page(Page(image_path))
-
-    def add_images(self, image_paths: List[str]):
+        return self.add_new_page(Page(image_path), duplicates, max_distance)
+
+    def add_new_page(
+        self,
+        page: Page,
+        duplicates: DuplicatePolicy = DuplicatePolicy.KEEP,
+        max_distance: int = DUPLICATE_DISTANCE,
+    ) -> Optional[Page]:
+        # Adds a page created from a new image, None if it was skipped as a
+        # duplicate
+        if duplicates != DuplicatePolicy.KEEP:
+            duplicate = self.find_duplicate(page, max_distance)
+
+            if duplicate is not None:
+                if duplicates == DuplicatePolicy.SKIP:
+                    logger.info(
+                        f"Skipping image: {page.image_path}, duplicate of page {duplicate.order}"
+                    )
+                    return None
+                page.duplicate_of = duplicate.id
+
+        self.add_page(page)
+        return page
+
+    def add_images(
+        self,
+        image_paths: List[str],
+        duplicates: DuplicatePolicy = DuplicatePolicy.KEEP,
+        max_distance: int = DUPLICATE_DISTANCE,
+    ):
         for image_path in image_paths:
-            self.add_image(image_path)
+            self.add_image(image_path, duplicates, max_distance)
+
+    def update_page_hashes(self) -> None:
+        for page in self.pages:
+            if page.id not in self.page_hashes:
+                self.page_hashes.add(page.id, page.get_image_hash())
+
+    def find_duplicate(
+        self, page: Page, max_distance: int = DUPLICATE_DISTANCE
+    ) -> Optional[Page]:
+        self.update_page_hashes()
+        match = self.page_hashes.find(page.get_image_hash(), max_distance)
+        if match is None:
+            return None
+
+        page_id, _ = match
+        return next((other for other in self.pages if other.id == page_id), None)
+
+    def linked_page(self, page: Page) -> Optional[Page]:
+        # Page a page added with DuplicatePolicy.LINK duplicates
+        if page.duplicate_of is None:
+            return None
+        return next((other for other in self.pages if other.id == page.duplicate_of), None)
 
     def add_page(self, page: Page, index: Optional[int] = None):
         page.set_settings(self.settings)
-        ppi = self.calculate_ppi(page.image, self.settings.get("paper_size"))
+        ppi = self.calculate_ppi(page.image_info, self.settings.get("paper_size"))
         page.settings.set("ppi", ppi)
+        page.add_recognition_callback(self.text_index.index_page)
+        if page.image_hash is not None:
+            self.page_hashes.add(page.id, page.image_hash)
+        self.attach_pyramid(page)
         if index is None:
+            # Appending only numbers the new page, adding many images stays
+            # linear
+            page.order = len(self.pages)
             self.pages.append(page)
         else:
             self.pages.insert(index, page)
-        self.update_order()
+            self.update_order()
 
     def remove_page(self, index: int):
-        self.pages.pop(index)
+        self.detach_page(self.pages.pop(index))
         self.update_order()
 
+    def detach_page(self, page: Page) -> None:
+        page.remove_recognition_callback(self.text_index.index_page)
+        self.text_index.remove_page(page.id)
+        self.page_hashes.remove(page.id)
+        image_cache.discard(page.image_path)
+
     def get_page(self, index: int) -> Page:
         return self.pages[index]
 
     def get_page_count(self) -> int:
         return len(self.pages)
 
-    def analyze_pages(self):
+    def analyze_pages(self, reading_order: bool = False, use_templates: bool = False):
+        # Templates are only kept for one run, layouts may change in between
+        templates = LayoutTemplates() if use_templates else None
+
+        for page in self.pages:
+            if self.linked_page(page) is None:
+                logger.info(f"Analyzing page: {page.image_path}")
+                page.analyze_page(reading_order, templates)
+
+        # After the pages they duplicate, which may come later in the project
         for page in self.pages:
-            logger.info(f"Analyzing page: {page.image_path}")
-            page.analyze_page()
+            linked_page = self.linked_page(page)
+            if linked_page is not None:
+                logger.info(
+                    f"Copying layout of page {linked_page.order} to duplicate: {page.image_path}"
+                )
+                page.copy_layout_from(linked_page)
+
+    def detect_header_footer(self, pages: Optional[List[Page]] = None) -> None:
+        # Sets header and footer heights from bands recurring across the
+        # pages, so layout analysis and OCR skip running heads and page numbers
+        pages = pages if pages is not None else self.pages
+        # Images are passed lazily, so only one of them has to be decoded at
+        # a time. The ink profiles only need a reduced grayscale image, which
+        # is read outside of the image cache.
+        bands = detect_header_footer(
+            (page.reduced_image(2 * PROFILE_ROWS) for page in pages),
+            [page.layout for page in pages],
+            [page.image_size[1] for page in pages],
+        )
+
+        for page, (header_y, footer_y) in zip(pages, bands):
+            page.set_header(header_y)
+            page.set_footer(footer_y)
+
+        logger.info(
+            f"Detected headers on {sum(1 for header_y, _ in bands if header_y)} and footers on {sum(1 for _, footer_y in bands if footer_y)} of {len(pages)} pages"
+        )
 
-    def recognize_page_boxes(self):
+    def sort_by_reading_order(self, pages: Optional[List[Page]] = None) -> None:
+        for page in pages if pages is not None else self.pages:
+            page.layout.sort_by_reading_order()
+
+    def recognize_page_boxes(self, only_dirty: bool = False):
+        # With only_dirty, only boxes changed since their last recognition
+        # are recognized again
+        linked_pages = []
         for page in self.pages:
+            linked_page = self.linked_page(page)
+            # Duplicates take over the results of the page they duplicate,
+            # unless the scan was rescaled
+            if linked_page is not None and page.image_size == linked_page.image_size:
+                linked_pages.append((page, linked_page))
+                continue
             logger.info(f"Recognizing boxes for page: {page.image_path}")
-            page.recognize_boxes()
+            page.recognize_boxes(only_dirty=only_dirty)
+
+        for page, linked_page in linked_pages:
+            logger.info(
+                f"Copying OCR results of page {linked_page.order} to duplicate: {page.image_path}"
+            )
+            page.copy_layout_from(linked_page)
+            page.notify_recognition_callbacks()
+
+    def search(
+        self, query: str, prefix: bool = False
+    ) -> List[Tuple[Page, TextIndexHit]]:
+        self.update_text_index()
+        return self.resolve_hits(self.text_index.search(query, prefix))
+
+    def search_fuzzy(
+        self, query: str, max_distance: Optional[int] = None
+    ) -> List[Tuple[Page, TextIndexHit]]:
+        # Tolerates OCR errors, hits are ranked by their edit distance
+        self.update_text_index()
+        return self.resolve_hits(self.text_index.search_fuzzy(query, max_distance))
+
+    def update_text_index(self) -> None:
+        # Pages not covered by the index yet (e.g. from older projects) are
+        # indexed on first search
+        for page in self.pages:
+            if not self.text_index.has_page(page.id):
+                self.text_index.index_page(page)
+
+    def resolve_hits(
+        self, hits: List[TextIndexHit]
+    ) -> List[Tuple[Page, TextIndexHit]]:
+        pages = {page.id: page for page in self.pages}
+        results = []
+
+        for hit in hits:
+            page = pages.get(hit.page_id)
+            box = page.layout.get_box_by_id(hit.box_id) if page else None
+
+            # Drop hits of boxes that were removed since they were indexed
+            if box is None:
+                self.text_index.remove_box(hit.box_id)
+                continue
+            results.append((page, box.order, hit))
+
+        results.sort(
+            key=lambda result: (
+                result[2].distance,
+                result[0].order,
+                result[1],
+                result[2].position,
+            )
+        )
+        return [(page, hit) for page, _, hit in results]
+
+    def get_statistics(self) -> OCRStatistics:
+        return OCRStatistics.from_pages(self.pages)
 
     def set_settings(self, settings: ProjectSettings):
         self.settings = settings
 
-    def import_pdf(self, pdf_path: str, from_page: int = 0, to_page: int = -1):
-        logger.info(
-            f"Importing PDF: {pdf_path}, from_page: {from_page}, to_page: {to_page}"
+    def import_pdf(
+        self,
+        pdf_path: str,
+        from_page: int = 0,
+        to_page: int = -1,
+        duplicates: DuplicatePolicy = DuplicatePolicy.KEEP,
+        on_page: Optional[Callable[[Page], None]] = None,
+        rasterize: Optional[bool] = False,
+    ) -> List[Page]:
+        # on_page is called with every added page as soon as it is added,
+        # e.g. to start layout analysis while the import is still running.
+        # With rasterize, pages are rendered at the project ppi instead of
+        # importing their embedded images, with None only pages that don't
+        # consist of exactly one image.
+        importer = PdfImporter(
+            self, duplicates, on_page=on_page, rasterize=rasterize
         )
-
-        pdf_reader = PdfReader(pdf_path)
-        total_pages = len(pdf_reader.pages)
-        if to_page == -1 or to_page >= total_pages:
-            to_page = total_pages - 1
-
-        for i in range(from_page, to_page + 1):
-            logger.info(f"Importing PDF page: {i} / {total_pages}")
-            page = pdf_reader.pages[i]
-            for image in page.images:
-                # Write image to project folder
-                pdf_file_name = pdf_path.split("/")[-1].split(".")[0]
-                project_folder = self.project_folder
-                image_path = f"{project_folder}/{pdf_file_name}_{i}_{image.name}"
-
-                with open(image_path, "wb") as f:
-                    f.write(image.data)
-                self.add_image(image_path)
-                logger.info(f"Added image: {image_path}")
-        logger.info(f"Finished importing PDF: {pdf_path}")
+        return importer.run(pdf_path, from_page, to_page)
 
     def export(self, exporter_type: ExporterType):
         export_path = self.settings.get("export_path")
         export_scaling_factor = self.settings.get("export_scaling_factor")
 
-        langs = self.settings.get("langs") or ["eng"]
+        exporter = EXPORTER_MAP[exporter_type](export_path, f"{self.name}")
+        exporter.scaling_factor = export_scaling_factor
 
+        if isinstance(exporter, ExporterXMLBased):
+            exporter.single_file = self.settings.get("export_single_file", True)
+
+        # Streaming exporters get the pages one at a time, so the export data
+        # of the whole project is never in memory at once
+        pages = (page.generate_page_export_data() for page in self.pages)
         project_export_data = {
             "name": self.name,
             "description": self.description,
-            "pages": [page.generate_page_export_data() for page in self.pages],
+            "pages": pages if exporter.streams_pages else list(pages),
             "settings": self.settings.to_dict(),
         }
 
-        exporter = EXPORTER_MAP[exporter_type](export_path, f"{self.name}")
-        exporter.scaling_factor = export_scaling_factor
         exporter.export_project(project_export_data)
 
-    def to_dict(self) -> dict:
+    def to_dict(self, include_ocr_results: bool = True) -> dict:
         return {
             "project": {
                 "version": self.version,
                 "name": self.name,
                 "description": self.description,
-                "pages": [page.to_dict() for page in self.pages],
+                "pages": [page.to_dict(include_ocr_results) for page in self.pages],
                 "uuid": self.uuid,
                 "settings": self.settings.to_dict(),
             }
@@ -159,7 +386,7 @@ class Project:
         project_data = data["project"]
 
         # Check version
-        if project_data.get("version", 1) != cls.version:
+        if project_data.get("version", 1) not in cls.compatible_versions:
             raise ValueError(
                 f"Unsupported project version: {project_data['version']}, current version: {cls.version}"
             )
@@ -184,6 +411,11 @@ class Project:
         self.update_order()
 
     def replace_page(self, index: int, page: Page) -> None:
+        self.detach_page(self.pages[index])
+        page.add_recognition_callback(self.text_index.index_page)
+        if page.image_hash is not None:
+            self.page_hashes.add(page.id, page.image_hash)
+        self.attach_pyramid(page)
         self.pages[index] = page
         self.update_order()
 
@@ -201,12 +433,10 @@ class Project:
         return self.pages[index]
 
     def __setitem__(self, index: int, page: Page) -> None:
-        self.pages[index] = page
-        self.update_order()
+        self.replace_page(index, page)
 
     def __delitem__(self, index: int) -> None:
-        self.pages.pop(index)
-        self.update_order()
+        self.remove_page(index)
 
     def __str__(self) -> str:
         return f"Project(name={self.name}, description={self.description}, pages={self.pages}, uuid={self.uuid})"
@@ -0,0 +1,285 @@
+import json
+import mmap
+import os
+import struct
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from loguru import logger
+from ocr_engine.ocr_result import FONT_ATTRIBUTES, LANGUAGES  # type: ignore
+from ocr_engine.ocr_result_codec import (  # type: ignore
+    LazyOCRResultBlock,
+    OCRResultTables,
+    encode_ocr_result_block,
+)
+from page.ocr_box import OCRBox  # type: ignore
+from project.project import Project  # type: ignore
+
+# Binary project file:
+#   header struct (magic, project version, offset and length of the JSON index)
+#   data section: concatenated encode_ocr_result_block() blobs
+#               followed by the encoded full-text index
+#   JSON index: Project.to_dict() without OCR results, every box instead
+#               references its encoded OCR results by offset and length,
+#               "text_index" references the full-text index and "ocr_tables"
+#               holds the font attributes and languages shared by all blobs
+# The index is written last, so blobs can be streamed to disk one by one.
+PROJECT_FILE_EXTENSION = "ocrproj"
+PROJECT_FILE_MAGIC = b"OCRPROJ\x00"
+PROJECT_FILE_HEADER = struct.Struct("<8sIQQ")
+
+
+class ProjectFileSource:
+    # Read-only mapping of a project file, the file handle is only needed to
+    # create the mapping. Reads return copies, so blocks read before close()
+    # stay valid.
+    def __init__(self, file_path: str) -> None:
+        self.file_path = file_path
+        self.mmap: Optional[mmap.mmap] = None
+        self.open()
+
+    def open(self) -> None:
+        if self.mmap is None:
+            with open(self.file_path, "rb") as f:
+                self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self) -> None:
+        if self.mmap is not None:
+            self.mmap.close()
+            self.mmap = None
+
+    def read(self, offset: int, length: int) -> bytes:
+        if self.mmap is None:
+            raise ValueError(f"Project file is closed: {self.file_path}")
+        return self.mmap[offset : offset + length]
+
+
+class ProjectFileReference:
+    __slots__ = ("source", "offset", "length")
+
+    def __init__(self, source: ProjectFileSource, offset: int, length: int) -> None:
+        self.source = source
+        self.offset = offset
+        self.length = length
+
+    def read(self) -> bytes:
+        return self.source.read(self.offset, self.length)
+
+
+def project_file_sources(project: Project) -> Set[ProjectFileSource]:
+    # Files the project still reads OCR results or its text index from
+    sources = set()
+    for page in project.pages:
+        for box in page.layout.boxes:
+            reference = box.pending_ocr_results()
+            if reference is not None and isinstance(reference.source, ProjectFileSource):
+                sources.add(reference.source)
+
+    reference = project.text_index.pending()
+    if isinstance(reference, ProjectFileReference):
+        sources.add(reference.source)
+    return sources
+
+
+def close_project_file(project: Project) -> None:
+    # Results not loaded yet can't be loaded afterwards
+    for source in project_file_sources(project):
+        source.close()
+
+
+def compact_ocr_result_tables(projects: Iterable[Project]) -> None:
+    # Font attributes and languages are interned for the whole process, drop
+    # the ones only closed projects used. Words and tables of the remaining
+    # projects are renumbered, results still in a file keep their table.
+    words = []
+    tables: Dict[int, OCRResultTables] = {}
+
+    for project in projects:
+        for page in project.pages:
+            for box in page.layout.boxes:
+                reference = box.pending_ocr_results()
+                if reference is not None:
+                    tables[id(reference.tables)] = reference.tables
+                    continue
+
+                ocr_results = box.ocr_results
+                if ocr_results is None or isinstance(ocr_results, dict):
+                    continue
+                for paragraph in ocr_results.paragraphs:
+                    for line in paragraph.lines:
+                        words.extend(line.words)
+
+    font_attributes_ids = {word.font_attributes_id for word in words}
+    language_ids = {word.language_id for word in words}
+    for table in tables.values():
+        font_attributes_ids.update(table.font_attributes_ids)
+        language_ids.update(table.language_ids)
+
+    font_attributes_count = len(FONT_ATTRIBUTES)
+    language_count = len(LANGUAGES)
+    font_attributes_map = FONT_ATTRIBUTES.compact(font_attributes_ids)
+    language_map = LANGUAGES.compact(language_ids)
+
+    for word in words:
+        word.font_attributes_id = font_attributes_map[word.font_attributes_id]
+        word.language_id = language_map[word.language_id]
+    for table in tables.values():
+        table.remap_ids(font_attributes_map, language_map)
+
+    logger.info(
+        f"Compacted OCR result tables: {font_attributes_count} -> {len(FONT_ATTRIBUTES)} font attributes, {language_count} -> {len(LANGUAGES)} languages"
+    )
+
+
+def save_project_file(project: Project, file_path: str) -> None:
+    project_dict = project.to_dict(include_ocr_results=False)
+    # Boxes whose OCR results were never loaded are copied over as raw bytes
+    # and pointed at the new file afterwards
+    pending_boxes: List[Tuple[OCRBox, int, int]] = []
+    blob_count = 0
+
+    # Raw blobs index into the tables of the file they were loaded from, so
+    # the new tables start out as a copy of those
+    source_tables = next(
+        (
+            box.pending_ocr_results().tables
+            for page in project.pages
+            for box in page.layout.boxes
+            if box.pending_ocr_results() is not None
+        ),
+        None,
+    )
+    tables = source_tables.copy() if source_tables is not None else OCRResultTables()
+
+    # Write to a temporary file first, so a failed save never leaves a
+    # truncated project behind
+    temp_file_path = f"{file_path}.tmp"
+    with open(temp_file_path, "wb") as f:
+        f.write(PROJECT_FILE_HEADER.pack(PROJECT_FILE_MAGIC, Project.version, 0, 0))
+        offset = PROJECT_FILE_HEADER.size
+
+        for page, page_data in zip(project.pages, project_dict["project"]["pages"]):
+            for box, box_data in zip(
+                page.layout.boxes, page_data["page"]["layout"]["boxes"]
+            ):
+                reference = box.pending_ocr_results()
+
+                if reference is not None:
+                    if reference.tables is source_tables:
+                        blob = reference.read()
+                    else:
+                        blob = encode_ocr_result_block(reference.load(), tables)
+                    pending_boxes.append((box, offset, len(blob)))
+                elif box.ocr_results is None or isinstance(box.ocr_results, dict):
+                    continue
+                else:
+                    blob = encode_ocr_result_block(box.ocr_results, tables)
+
+                f.write(blob)
+                box_data["ocr_results"] = {"offset": offset, "length": len(blob)}
+                offset += len(blob)
+                blob_count += 1
+
+        # The full-text index is copied as is if it was never searched
+        text_index_pending = project.text_index.pending() is not None
+        text_index_data = project.text_index.encode()
+        f.write(text_index_data)
+        project_dict["project"]["text_index"] = {
+            "offset": offset,
+            "length": len(text_index_data),
+        }
+        text_index_offset = offset
+        offset += len(text_index_data)
+
+        project_dict["project"]["ocr_tables"] = tables.to_dict()
+        index = json.dumps(project_dict).encode("utf-8")
+        f.write(index)
+        f.seek(0)
+        f.write(
+            PROJECT_FILE_HEADER.pack(
+                PROJECT_FILE_MAGIC, Project.version, offset, len(index)
+            )
+        )
+
+    # Everything still needed was copied, pending results are read from the
+    # new file from now on. A file being replaced must not be mapped.
+    old_sources = project_file_sources(project)
+    replaced_sources = [
+        source
+        for source in old_sources
+        if os.path.abspath(source.file_path) == os.path.abspath(file_path)
+    ]
+    for source in replaced_sources:
+        source.close()
+
+    try:
+        os.replace(temp_file_path, file_path)
+    except OSError:
+        for source in replaced_sources:
+            source.open()
+        raise
+
+    if pending_boxes or text_index_pending:
+        source = ProjectFileSource(file_path)
+        for box, offset, length in pending_boxes:
+            box.ocr_results = LazyOCRResultBlock(source, offset, length, tables)
+
+        if text_index_pending:
+            project.text_index.set_pending(
+                ProjectFileReference(
+                    source, text_index_offset, len(text_index_data)
+                )
+            )
+
+    for old_source in old_sources:
+        old_source.close()
+
+    logger.info(f"Saved project file: {file_path} ({blob_count} OCR result blocks)")
+
+
+def load_project_file(file_path: str, lazy: bool = True) -> Project:
+    with open(file_path, "rb") as f:
+        magic, version, index_offset, index_length = PROJECT_FILE_HEADER.unpack(
+            f.read(PROJECT_FILE_HEADER.size)
+        )
+
+        if magic != PROJECT_FILE_MAGIC:
+            raise ValueError(f"Not a project file: {file_path}")
+
+        if version not in Project.compatible_versions:
+            raise ValueError(
+                f"Unsupported project version: {version}, current version: {Project.version}"
+            )
+
+        f.seek(index_offset)
+        project_dict = json.loads(f.read(index_length))
+
+    source = ProjectFileSource(file_path)
+    # Blobs of files written before the tables were shared carry their own
+    tables = OCRResultTables.from_dict(project_dict["project"].get("ocr_tables", {}))
+
+    # Only the page and box geometry is materialized here, OCR results are
+    # decoded on first access unless lazy loading is disabled
+    for page_data in project_dict["project"]["pages"]:
+        for box_data in page_data["page"]["layout"]["boxes"]:
+            reference = box_data.get("ocr_results")
+
+            if reference:
+                lazy_ocr_results = LazyOCRResultBlock(
+                    source, reference["offset"], reference["length"], tables
+                )
+                box_data["ocr_results"] = (
+                    lazy_ocr_results if lazy else lazy_ocr_results.load()
+                )
+
+    project = Project.from_dict(project_dict)
+
+    # Projects saved before the full-text index existed are indexed on demand
+    text_index_reference = project_dict["project"].get("text_index")
+    if text_index_reference:
+        project.text_index.set_pending(
+            ProjectFileReference(
+                source, text_index_reference["offset"], text_index_reference["length"]
+            )
+        )
+
+    return project
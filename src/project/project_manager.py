@@ -4,6 +4,13 @@ from typing import Optional
 
 from loguru import logger
 from project.project import Project # type: ignore
+from project.project_file import ( # type: ignore
+    PROJECT_FILE_EXTENSION,
+    close_project_file,
+    compact_ocr_result_tables,
+    load_project_file,
+    save_project_file,
+)
 
 
 class ProjectManager:
@@ -26,11 +33,20 @@ class ProjectManager:
         for folder in projects:
             logger.info(f"Loading project: {folder}")
             uuid = folder
-            file_path = os.path.join(project_folder, folder, f"{uuid}.json")
+            file_path = os.path.join(
+                project_folder, folder, f"{uuid}.{PROJECT_FILE_EXTENSION}"
+            )
+            json_file_path = os.path.join(project_folder, folder, f"{uuid}.json")
 
             if os.path.exists(file_path):
                 self.import_project(file_path)
                 logger.info(f"Loaded project: {file_path}")
+            elif os.path.exists(json_file_path):
+                # Migrate projects saved in the old JSON format, the JSON file
+                # is kept as a backup
+                self.import_project(json_file_path)
+                self.save_project(self.get_project_count() - 1)
+                logger.info(f"Migrated project: {json_file_path} -> {file_path}")
             else:
                 logger.error(
                     f"Empty project folder found: {file_path}, removing folder"
@@ -45,10 +61,13 @@ class ProjectManager:
         if not os.path.exists(project_root_path):
             os.makedirs(project_root_path)
         project.project_folder = project_root_path
+        project.update_pyramids()
 
     def remove_project(self, index: int):
         # Delete project folder
         project = self.projects.pop(index)
+        close_project_file(project)
+        compact_ocr_result_tables(self.projects)
 
         project_root_path = os.path.join(self.project_folder, project.uuid)
 
@@ -70,10 +89,14 @@ class ProjectManager:
     def import_project(self, file_path: str) -> None:
         try:
             logger.info(f"Importing project: {file_path}")
-            with open(file_path, "r") as f:
-                loaded_data = json.load(f)
 
-            project = Project.from_dict(loaded_data)
+            if file_path.endswith(".json"):
+                with open(file_path, "r") as f:
+                    loaded_data = json.load(f)
+
+                project = Project.from_dict(loaded_data)
+            else:
+                project = load_project_file(file_path)
 
             logger.info(f"Project pages: {project.get_page_count()}")
 
@@ -84,14 +107,12 @@ class ProjectManager:
     def save_project(self, index: int) -> None:
         logger.info(f"Saving project: {index}")
         project = self.get_project(index)
-        project_dict = project.to_dict()
 
         file_path = os.path.join(
-            self.project_folder, project.uuid, f"{project.uuid}.json"
+            self.project_folder, project.uuid, f"{project.uuid}.{PROJECT_FILE_EXTENSION}"
         )
 
-        with open(file_path, "w") as f:
-            json.dump(project_dict, f)
+        save_project_file(project, file_path)
         logger.info(f"Finsihed saving project: {file_path}")
 
     def new_project(self, name: str, description: str) -> Project:
@@ -0,0 +1,553 @@
+import bisect
+import json
+import re
+import struct
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from itertools import chain
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from ocr_engine.ocr_result import BoundingBox, OCRResultBlock  # type: ignore
+
+# Version of the serialized index, an index with a different version is
+# dropped on load and rebuilt from the OCR results
+TEXT_INDEX_VERSION = 3
+
+TOKEN_PATTERN = re.compile(r"\w+")
+HYPHENS = ("-", "\u00ad", "\u00ac", "\u2010")
+
+# Character sequences Tesseract commonly confuses, replacing one by the other
+# counts as a single edit
+OCR_CONFUSIONS = {
+    ("rn", "m"),
+    ("m", "rn"),
+    ("cl", "d"),
+    ("d", "cl"),
+    ("vv", "w"),
+    ("w", "vv"),
+    ("li", "h"),
+    ("h", "li"),
+}
+# Confusions replacing two characters of the searched term by one
+TWO_CHARACTER_CONFUSIONS = tuple(a for a, b in OCR_CONFUSIONS if len(a) == 2)
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.casefold())
+
+
+def trigrams(term: str) -> Set[str]:
+    padded = f"  {term} "
+    return {padded[index : index + 3] for index in range(len(padded) - 2)}
+
+
+def default_max_distance(term: str) -> int:
+    if len(term) <= 3:
+        return 0
+    elif len(term) <= 6:
+        return 1
+    return 2
+
+
+def ocr_distance(a: str, b: str, max_distance: int) -> int:
+    # Levenshtein distance treating OCR_CONFUSIONS as single edits, returns
+    # max_distance + 1 as soon as the distance is known to be larger
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    rows = [list(range(len(b) + 1))]
+
+    for i in range(1, len(a) + 1):
+        row = [i] + [0] * len(b)
+        previous = rows[-1]
+
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            distance = min(previous[j] + 1, row[j - 1] + 1, previous[j - 1] + cost)
+
+            if i > 1 and (a[i - 2 : i], b[j - 1]) in OCR_CONFUSIONS:
+                distance = min(distance, rows[-2][j - 1] + 1)
+            if j > 1 and (a[i - 1], b[j - 2 : j]) in OCR_CONFUSIONS:
+                distance = min(distance, previous[j - 2] + 1)
+
+            row[j] = distance
+
+        rows.append(row)
+
+        # The two row transitions above look back two rows
+        if min(row) > max_distance and min(previous) > max_distance:
+            return max_distance + 1
+
+    return min(rows[-1][-1], max_distance + 1)
+
+
+@dataclass(frozen=True)
+class TextIndexHit:
+    page_id: str
+    box_id: str
+    # Word index of the first matched word inside the box
+    position: int
+    # Union of the matched word boxes (left, top, right, bottom) in page pixels
+    bbox: BoundingBox
+    # Edit distance of the match for approximate searches
+    distance: int = 0
+
+
+class TextIndexBox:
+    __slots__ = ("page_id", "terms", "bboxes", "joined")
+
+    def __init__(self, page_id: str) -> None:
+        self.page_id = page_id
+        # Term ids and word boxes in reading order, a word containing several
+        # tokens (e.g. "e-mail") adds one entry per token with the same box
+        self.terms = array("I")
+        self.bboxes = array("i")
+        # Words hyphenated at the end of a line, position of the first part ->
+        # term id of both parts joined
+        self.joined: Dict[int, int] = {}
+
+    def match(
+        self, start: int, phrase: List[Dict[int, int]]
+    ) -> Optional[Tuple[int, int]]:
+        # Returns end position and distance if the phrase starts at start
+        terms = self.terms
+        position = start
+        total_distance = 0
+
+        for term_distances in phrase:
+            if position >= len(terms):
+                return None
+
+            distance = term_distances.get(terms[position])
+            if distance is not None:
+                position += 1
+            else:
+                joined = self.joined.get(position)
+                distance = term_distances.get(joined) if joined is not None else None
+                if distance is None:
+                    return None
+                position += 2
+
+            total_distance += distance
+
+        return min(position, len(terms)), total_distance
+
+    def bbox(self, start: int, end: int) -> BoundingBox:
+        bboxes = self.bboxes
+        return (
+            min(bboxes[index * 4] for index in range(start, end)),
+            min(bboxes[index * 4 + 1] for index in range(start, end)),
+            max(bboxes[index * 4 + 2] for index in range(start, end)),
+            max(bboxes[index * 4 + 3] for index in range(start, end)),
+        )
+
+
+class TextIndex:
+    def __init__(self) -> None:
+        self.terms: List[str] = []
+        self.term_ids: Dict[str, int] = {}
+        # Term id -> ids of the boxes containing it
+        self.postings: List[Set[str]] = []
+        self.boxes: Dict[str, TextIndexBox] = {}
+        # Page id -> ids of its indexed boxes, pages without text are kept too,
+        # so they are known to be indexed
+        self.pages: Dict[str, Set[str]] = {}
+
+        self._sorted_terms: Optional[List[str]] = None
+        # Trigram -> term ids, covers the first _trigram_term_count terms and is
+        # extended on demand
+        self._trigrams: Dict[str, array] = {}
+        # Term length -> term ids, for queries too short for the trigrams to
+        # rule out any term, covers the same terms
+        self._length_buckets: Dict[int, array] = {}
+        self._trigram_term_count = 0
+        # Serialized index that has not been decoded yet, anything with a
+        # read() method returning the encoded bytes
+        self._pending: Any = None
+
+    def set_pending(self, reference: Any) -> None:
+        self.clear()
+        self._pending = reference
+
+    def pending(self) -> Any:
+        return self._pending
+
+    def _ensure_loaded(self) -> None:
+        if self._pending is None:
+            return
+
+        reference = self._pending
+        self._pending = None
+        self.decode(reference.read())
+
+    def clear(self) -> None:
+        self.terms = []
+        self.term_ids = {}
+        self.postings = []
+        self.boxes = {}
+        self.pages = {}
+        self._sorted_terms = None
+        self._trigrams = {}
+        self._length_buckets = {}
+        self._trigram_term_count = 0
+        self._pending = None
+
+    def has_page(self, page_id: str) -> bool:
+        self._ensure_loaded()
+        return page_id in self.pages
+
+    def term_id(self, term: str) -> int:
+        term_id = self.term_ids.get(term)
+
+        if term_id is None:
+            term_id = len(self.terms)
+            self.term_ids[term] = term_id
+            self.terms.append(term)
+            self.postings.append(set())
+            self._sorted_terms = None
+        return term_id
+
+    def index_page(self, page: Any, boxes: Optional[Iterable[Any]] = None) -> None:
+        # Reindexes the given boxes of the page, or the whole page if no boxes
+        # are given
+        self._ensure_loaded()
+
+        if boxes is None:
+            self.remove_page(page.id)
+            boxes = page.layout.boxes
+
+        page_box_ids = self.pages.setdefault(page.id, set())
+
+        for box in boxes:
+            self.remove_box(box.id)
+
+            # Boxes loaded from older projects may still carry the raw dict
+            ocr_results = box.ocr_results
+            if ocr_results is None or isinstance(ocr_results, dict):
+                continue
+
+            if self.add_box(page.id, box.id, ocr_results):
+                page_box_ids.add(box.id)
+
+    def add_box(self, page_id: str, box_id: str, ocr_results: OCRResultBlock) -> bool:
+        # False if the box has no words to index, e.g. only OCR noise
+        entry = TextIndexBox(page_id)
+        # Last token of the previous line if it ended with a hyphen
+        hyphenated: Optional[Tuple[int, str]] = None
+
+        for paragraph in ocr_results.paragraphs:
+            for line in paragraph.lines:
+                for word in line.words:
+                    bbox = word.bbox or (0, 0, 0, 0)
+                    tokens = tokenize(word.text)
+
+                    if hyphenated is not None and tokens:
+                        position, first_part = hyphenated
+                        entry.joined[position] = self.term_id(first_part + tokens[0])
+                    hyphenated = None
+
+                    for token in tokens:
+                        entry.terms.append(self.term_id(token))
+                        entry.bboxes.extend(bbox)
+
+                if line.words:
+                    text = line.words[-1].text.rstrip()
+                    tokens = tokenize(text)
+                    if tokens and text.endswith(HYPHENS):
+                        hyphenated = (len(entry.terms) - 1, tokens[-1])
+
+        if not entry.terms:
+            return False
+
+        self.boxes[box_id] = entry
+        for term_id in set(entry.terms) | set(entry.joined.values()):
+            self.postings[term_id].add(box_id)
+        return True
+
+    def remove_box(self, box_id: str) -> None:
+        self._ensure_loaded()
+        entry = self.boxes.pop(box_id, None)
+
+        if entry is None:
+            return
+
+        for term_id in set(entry.terms) | set(entry.joined.values()):
+            self.postings[term_id].discard(box_id)
+
+        page_box_ids = self.pages.get(entry.page_id)
+        if page_box_ids is not None:
+            page_box_ids.discard(box_id)
+
+    def remove_page(self, page_id: str) -> None:
+        self._ensure_loaded()
+
+        for box_id in list(self.pages.pop(page_id, ())):
+            self.remove_box(box_id)
+
+    def prefix_term_ids(self, prefix: str) -> List[int]:
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self.terms)
+
+        start = bisect.bisect_left(self._sorted_terms, prefix)
+        term_ids = []
+
+        for term in self._sorted_terms[start:]:
+            if not term.startswith(prefix):
+                break
+            term_ids.append(self.term_ids[term])
+        return term_ids
+
+    def similar_term_ids(self, term: str, max_distance: int) -> Dict[int, int]:
+        # Term ids within max_distance of term, mapped to their distance
+        if max_distance == 0:
+            term_id = self.term_ids.get(term)
+            return {term_id: 0} if term_id is not None else {}
+
+        term_distances = {}
+        for term_id in self.candidate_term_ids(term, max_distance):
+            if not self.postings[term_id]:
+                continue
+
+            distance = ocr_distance(term, self.terms[term_id], max_distance)
+            if distance <= max_distance:
+                term_distances[term_id] = distance
+        return term_distances
+
+    def candidate_term_ids(self, term: str, max_distance: int) -> Iterable[int]:
+        # Superset of the term ids within max_distance of term
+        self.update_trigrams()
+        term_trigrams = trigrams(term)
+        # Every edit changes at most three trigrams, a confusion replacing two
+        # characters of term by one four, so closer terms share at least this
+        # many
+        confusions = sum(term.count(source) for source in TWO_CHARACTER_CONFUSIONS)
+        min_shared = (
+            len(term_trigrams) - 3 * max_distance - min(confusions, max_distance)
+        )
+
+        if min_shared > 0:
+            shared = Counter(
+                chain.from_iterable(
+                    self._trigrams.get(trigram, ()) for trigram in term_trigrams
+                )
+            )
+            return (term_id for term_id, count in shared.items() if count >= min_shared)
+
+        # Only terms of a length within reach can be close enough
+        return chain.from_iterable(
+            self._length_buckets.get(length, ())
+            for length in range(len(term) - max_distance, len(term) + max_distance + 1)
+        )
+
+    def update_trigrams(self) -> None:
+        for term_id in range(self._trigram_term_count, len(self.terms)):
+            term = self.terms[term_id]
+            for trigram in trigrams(term):
+                term_ids = self._trigrams.get(trigram)
+                if term_ids is None:
+                    term_ids = self._trigrams[trigram] = array("I")
+                term_ids.append(term_id)
+            self.add_to_length_bucket(term_id, term)
+        self._trigram_term_count = len(self.terms)
+
+    def add_to_length_bucket(self, term_id: int, term: str) -> None:
+        term_ids = self._length_buckets.get(len(term))
+        if term_ids is None:
+            term_ids = self._length_buckets[len(term)] = array("I")
+        term_ids.append(term_id)
+
+    def search(self, query: str, prefix: bool = False) -> List[TextIndexHit]:
+        # Finds all occurrences of the words of the query in a row within one
+        # box, with prefix set the last word only has to be a prefix
+        self._ensure_loaded()
+        tokens = tokenize(query)
+        phrase: List[Dict[int, int]] = []
+
+        for index, token in enumerate(tokens):
+            if prefix and index == len(tokens) - 1:
+                phrase.append(dict.fromkeys(self.prefix_term_ids(token), 0))
+            else:
+                phrase.append(self.similar_term_ids(token, 0))
+
+        return self.search_phrase(phrase)
+
+    def search_fuzzy(
+        self, query: str, max_distance: Optional[int] = None
+    ) -> List[TextIndexHit]:
+        # Like search, but every word may be up to max_distance edits away,
+        # by default depending on the length of the word
+        self._ensure_loaded()
+        phrase = [
+            self.similar_term_ids(
+                token,
+                default_max_distance(token) if max_distance is None else max_distance,
+            )
+            for token in tokenize(query)
+        ]
+
+        hits = self.search_phrase(phrase)
+        hits.sort(key=lambda hit: hit.distance)
+        return hits
+
+    def search_phrase(self, phrase: List[Dict[int, int]]) -> List[TextIndexHit]:
+        # Every position in the phrase matches any of its term ids
+        if not phrase or not all(phrase):
+            return []
+
+        # Candidate boxes contain every word of the phrase, start with the
+        # rarest one to keep the intersection small
+        candidates: Optional[Set[str]] = None
+        for term_distances in sorted(phrase, key=self.posting_count):
+            box_ids: Set[str] = set().union(
+                *(self.postings[term_id] for term_id in term_distances)
+            )
+            candidates = box_ids if candidates is None else candidates & box_ids
+
+            if not candidates:
+                return []
+
+        hits = []
+        first = phrase[0]
+        for box_id in candidates or ():
+            entry = self.boxes[box_id]
+            terms = entry.terms
+            joined = entry.joined
+
+            for start in range(len(terms)):
+                if terms[start] not in first and joined.get(start) not in first:
+                    continue
+
+                match = entry.match(start, phrase)
+                if match is not None:
+                    end, distance = match
+                    hits.append(
+                        TextIndexHit(
+                            entry.page_id,
+                            box_id,
+                            start,
+                            entry.bbox(start, end),
+                            distance,
+                        )
+                    )
+        return hits
+
+    def posting_count(self, term_ids: Iterable[int]) -> int:
+        return sum(len(self.postings[term_id]) for term_id in term_ids)
+
+    def encode(self) -> bytes:
+        if self._pending is not None:
+            return self._pending.read()
+
+        # Only terms still in use are written, ids are renumbered on the way
+        used_terms: Dict[int, int] = {}
+        terms = array("I")
+        bboxes = array("i")
+
+        pages = []
+        for page_id, box_ids in self.pages.items():
+            page_boxes = []
+            for box_id in box_ids:
+                entry = self.boxes.get(box_id)
+                if entry is None:
+                    continue
+                joined = [
+                    [position, used_terms.setdefault(term_id, len(used_terms))]
+                    for position, term_id in entry.joined.items()
+                ]
+                page_boxes.append([box_id, len(entry.terms), joined])
+                terms.extend(
+                    used_terms.setdefault(term_id, len(used_terms))
+                    for term_id in entry.terms
+                )
+                bboxes.extend(entry.bboxes)
+            pages.append([page_id, page_boxes])
+
+        vocabulary = [""] * len(used_terms)
+        for term_id, new_term_id in used_terms.items():
+            vocabulary[new_term_id] = self.terms[term_id]
+
+        # The trigram postings are stored too, so fuzzy searches after loading
+        # don't have to rebuild them
+        self.update_trigrams()
+        trigram_counts = []
+        trigram_term_ids = array("I")
+        for trigram, term_ids in self._trigrams.items():
+            new_term_ids = [
+                used_terms[term_id] for term_id in term_ids if term_id in used_terms
+            ]
+            if new_term_ids:
+                trigram_counts.append([trigram, len(new_term_ids)])
+                trigram_term_ids.extend(new_term_ids)
+
+        header = json.dumps(
+            {
+                "version": TEXT_INDEX_VERSION,
+                "terms": vocabulary,
+                "pages": pages,
+                "trigrams": trigram_counts,
+            }
+        ).encode("utf-8")
+        terms_data = terms.tobytes()
+
+        # The trigram term ids follow the word boxes, their count is the sum
+        # of the trigram counts
+        return b"".join(
+            (
+                struct.pack("<III", len(header), len(terms_data), len(bboxes) * 4),
+                header,
+                terms_data,
+                bboxes.tobytes(),
+                trigram_term_ids.tobytes(),
+            )
+        )
+
+    def decode(self, data: bytes) -> None:
+        self.clear()
+        header_length, terms_length, bboxes_length = struct.unpack_from("<III", data)
+        offset = struct.calcsize("<III")
+        header = json.loads(data[offset : offset + header_length])
+        offset += header_length
+
+        if header.get("version") != TEXT_INDEX_VERSION:
+            # Pages missing from the index are indexed again on demand
+            return
+
+        terms = array("I")
+        terms.frombytes(data[offset : offset + terms_length])
+        offset += terms_length
+        bboxes = array("i")
+        bboxes.frombytes(data[offset : offset + bboxes_length])
+        offset += bboxes_length
+        trigram_term_ids = array("I")
+        trigram_term_ids.frombytes(data[offset:])
+
+        self.terms = header["terms"]
+        self.term_ids = {term: term_id for term_id, term in enumerate(self.terms)}
+        self.postings = [set() for _ in self.terms]
+
+        word_offset = 0
+        for page_id, page_boxes in header["pages"]:
+            page_box_ids = self.pages.setdefault(page_id, set())
+
+            for box_id, word_count, joined in page_boxes:
+                entry = TextIndexBox(page_id)
+                entry.terms = terms[word_offset : word_offset + word_count]
+                entry.bboxes = bboxes[word_offset * 4 : (word_offset + word_count) * 4]
+                entry.joined = {position: term_id for position, term_id in joined}
+                word_offset += word_count
+
+                self.boxes[box_id] = entry
+                page_box_ids.add(box_id)
+                for term_id in set(entry.terms) | set(entry.joined.values()):
+                    self.postings[term_id].add(box_id)
+
+        trigram_offset = 0
+        for trigram, count in header["trigrams"]:
+            self._trigrams[trigram] = trigram_term_ids[
+                trigram_offset : trigram_offset + count
+            ]
+            trigram_offset += count
+        for term_id, term in enumerate(self.terms):
+            self.add_to_length_bucket(term_id, term)
+        self._trigram_term_count = len(self.terms)
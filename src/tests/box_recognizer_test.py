@@ -0,0 +1,71 @@
+import copy
+import time
+from tempfile import TemporaryDirectory
+
+import cv2
+import numpy as np
+from PySide6.QtCore import QCoreApplication
+
+# The boxes have to be of the classes the recognizer checks against
+from src.page_editor.box_recognizer import BoxRecognizer, DEBOUNCE_MS, Page, TextBox
+
+app = QCoreApplication.instance() or QCoreApplication([])
+
+
+def create_page(temp_dir: str) -> Page:
+    page_image_path = f"{temp_dir}/page.png"
+    cv2.imwrite(page_image_path, np.full((400, 400), 255, dtype=np.uint8))
+    page = Page(page_image_path)
+    page.layout.add_boxes([TextBox(100, 100, 200, 50)])
+    return page
+
+
+def test_box_recognizer_debounce():
+    with TemporaryDirectory() as temp_dir:
+        page = create_page(temp_dir)
+        box = page.layout[0]
+        recognizer = BoxRecognizer(page)
+        started = []
+        recognizer.start = started.append
+
+        # Edits in quick succession start a single job
+        for _ in range(3):
+            recognizer.schedule(box)
+        deadline = time.monotonic() + 3 * DEBOUNCE_MS / 1000
+        while time.monotonic() < deadline:
+            app.processEvents()
+
+        assert started == [box.id]
+        assert recognizer.generations[box.id] == 3
+        recognizer.shutdown()
+
+
+def test_box_recognizer_drops_stale_results():
+    with TemporaryDirectory() as temp_dir:
+        page = create_page(temp_dir)
+        box = page.layout[0]
+        recognized = []
+        recognizer = BoxRecognizer(page, recognized.append)
+
+        recognizer.schedule(box)
+        result = copy.copy(box)
+        recognizer.schedule(box)
+
+        # The box was edited again after the first job started
+        recognizer.apply_result(box.id, 1, result)
+        assert recognized == [] and page.dirty_boxes() == [box]
+
+        # Results for another geometry are stale as well
+        moved = copy.copy(box)
+        moved.x += 10
+        recognizer.apply_result(box.id, 2, moved)
+        assert recognized == []
+
+        recognizer.apply_result(box.id, 2, copy.copy(box))
+        assert recognized == [box] and page.dirty_boxes() == []
+
+        # Nothing is applied after shutdown
+        recognizer.schedule(box)
+        recognizer.shutdown()
+        recognizer.apply_result(box.id, 3, copy.copy(box))
+        assert recognized == [box]
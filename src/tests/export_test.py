@@ -1,12 +1,25 @@
 import os
+import sys
 from tempfile import TemporaryDirectory
+from xml.etree import ElementTree
 from src.project.project import ExporterType, Project
 from src.exporter.exporter_epub import ExporterEPUB
 from src.page.page import Page
 from src.exporter.exporter_txt import ExporterTxt
-from src.page.ocr_box import OCRBox
+from src.exporter.exporter_hocr import ExporterHOCR
+from src.exporter.exporter_alto import ExporterALTO
+from src.ocr_engine.ocr_result import (
+    OCRResultBlock,
+    OCRResultLine,
+    OCRResultParagraph,
+    OCRResultWord,
+)
+from src.page.box_type import BoxType
+from src.page.ocr_box import OCRBox, TextBox
+from src.project.project_file import load_project_file, save_project_file
 from src.project.project_settings import ProjectSettings
 from iso639 import Lang  # type: ignore
+from PIL import Image
 
 project_settings = ProjectSettings(
     {
@@ -68,3 +81,118 @@ def test_export_project_epub():
         project.export(ExporterType.EPUB)
 
         assert os.path.exists(f"{temp_dir}/Lines.epub")
+
+
+def create_test_page_export_data() -> dict:
+    word_1 = OCRResultWord()
+    word_1.text = "Drei"
+    word_1.bbox = (100, 200, 160, 230)
+    word_1.confidence = 95.5
+    word_1.word_font_attributes = {"bold": True, "pointsize": 12}
+
+    word_2 = OCRResultWord()
+    word_2.text = "<Rennpferde>"
+    word_2.bbox = (170, 200, 320, 230)
+    word_2.confidence = 88.0
+
+    line = OCRResultLine()
+    line.bbox = (100, 200, 320, 230)
+    line.baseline = ((100, 226), (320, 228))
+    line.add_word(word_1)
+    line.add_word(word_2)
+
+    paragraph = OCRResultParagraph()
+    paragraph.bbox = (100, 200, 320, 230)
+    paragraph.add_line(line)
+
+    block = OCRResultBlock()
+    block.bbox = (100, 200, 320, 230)
+    block.add_paragraph(paragraph)
+
+    return {
+        "image_path": image_path,
+        "order": 0,
+        "lang": "deu",
+        "width": 2000,
+        "height": 3000,
+        "ppi": 300,
+        "boxes": [
+            {
+                "id": "text",
+                "position": {"x": 90, "y": 190, "width": 240, "height": 50},
+                "type": BoxType.FLOWING_TEXT,
+                "ocr_results": block,
+            },
+            {
+                "id": "image",
+                "position": {"x": 90, "y": 400, "width": 500, "height": 300},
+                "type": BoxType.FLOWING_IMAGE,
+                "ocr_results": None,
+            },
+        ],
+    }
+
+
+def test_export_hocr_alto():
+    page_export_data = create_test_page_export_data()
+    project_export_data = {
+        "name": "Test",
+        "description": "Test",
+        "pages": [page_export_data, {**page_export_data, "order": 1}],
+        "settings": project_settings.to_dict(),
+    }
+
+    with TemporaryDirectory() as temp_dir:
+        exporter_hocr = ExporterHOCR(temp_dir, "test")
+        exporter_hocr.export_project(project_export_data)
+
+        hocr = ElementTree.parse(f"{temp_dir}/test.hocr")
+        namespace = {"x": "http://www.w3.org/1999/xhtml"}
+        assert len(hocr.findall(".//x:div[@class='ocr_page']", namespace)) == 2
+        words = hocr.findall(".//x:span[@class='ocrx_word']", namespace)
+        assert len(words) == 4
+        assert words[1].text == "<Rennpferde>"
+        assert words[1].get("title") == "bbox 170 200 320 230; x_wconf 88"
+
+        exporter_alto = ExporterALTO(temp_dir, "test")
+        exporter_alto.single_file = False
+        exporter_alto.export_project(project_export_data)
+
+        assert os.path.exists(f"{temp_dir}/test_0.alto.xml")
+        alto = ElementTree.parse(f"{temp_dir}/test_1.alto.xml")
+        namespace = {"a": "http://www.loc.gov/standards/alto/ns-v4#"}
+        strings = alto.findall(".//a:String", namespace)
+        assert [string.get("CONTENT") for string in strings] == ["Drei", "<Rennpferde>"]
+        assert strings[0].get("STYLE") == "bold"
+        assert strings[1].get("WIDTH") == "150"
+
+
+def test_export_project_streaming():
+    with TemporaryDirectory() as temp_dir:
+        page_image_path = f"{temp_dir}/page.png"
+        Image.new("L", (2000, 3000), 255).save(page_image_path)
+
+        project = Project("Streaming", "Streaming")
+        for _ in range(3):
+            project.add_image(page_image_path)
+            text_box = TextBox(90, 190, 240, 50, BoxType.FLOWING_TEXT)
+            text_box.ocr_results = create_test_page_export_data()["boxes"][0]["ocr_results"]
+            project.pages[-1].layout.add_box(text_box)
+
+        file_path = f"{temp_dir}/project.ocrproj"
+        save_project_file(project, file_path)
+        loaded = load_project_file(file_path)
+        loaded.settings.set("export_path", temp_dir)
+
+        # The pages are written one at a time, without decoding the OCR
+        # results into the loaded boxes. The loader imports the project
+        # module without the src prefix.
+        loaded.export(sys.modules[type(loaded).__module__].ExporterType.HOCR)
+
+        hocr = ElementTree.parse(f"{temp_dir}/Streaming.hocr")
+        namespace = {"x": "http://www.w3.org/1999/xhtml"}
+        assert len(hocr.findall(".//x:div[@class='ocr_page']", namespace)) == 3
+        assert len(hocr.findall(".//x:span[@class='ocrx_word']", namespace)) == 6
+        assert all(
+            page.layout[0].pending_ocr_results() is not None for page in loaded.pages
+        )
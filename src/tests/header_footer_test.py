@@ -0,0 +1,80 @@
+import sys
+from tempfile import TemporaryDirectory
+
+import cv2
+import numpy as np
+
+from src.project.project import Project
+from src.page.ocr_box import OCRBox
+
+
+def create_test_page_image(
+    file_path: str, page_number: int, header: bool, scale: int = 1
+) -> None:
+    image = np.full((1400, 1000), 255, dtype=np.uint8)
+
+    if header:
+        # Running heads alternate sides
+        x = 100 if page_number % 2 else 600
+        cv2.rectangle(image, (x, 40), (x + 300, 60), 0, -1)
+
+    for y in range(150 + page_number * 7, 1200, 40):
+        cv2.rectangle(image, (100, y), (900, y + 20), 0, -1)
+
+    cv2.rectangle(image, (480, 1340), (520, 1360), 0, -1)
+    if scale != 1:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_NEAREST)
+    cv2.imwrite(file_path, image)
+
+
+def test_detect_header_footer():
+    with TemporaryDirectory() as temp_dir:
+        project = Project("Test Project", "A test project")
+
+        for page_number in range(6):
+            file_path = f"{temp_dir}/{page_number}.png"
+            create_test_page_image(file_path, page_number, page_number != 3)
+            project.add_image(file_path)
+
+        project.detect_header_footer()
+
+        for page in project.pages:
+            if page.order == 3:
+                assert page.layout.header_y == 0
+            else:
+                assert 60 < page.layout.header_y < 150 + page.order * 7
+            assert 1400 - 1340 < page.layout.footer_y < 1400 - 1200
+
+        # Layout boxes at the same height on most pages count as well
+        for page in project.pages[:4]:
+            page.layout.add_box(OCRBox(100, 100, 800, 60))
+        project.detect_header_footer()
+        assert [page.layout.header_y for page in project.pages] == [160] * 4 + [
+            project.pages[4].layout.header_y,
+            project.pages[5].layout.header_y,
+        ]
+        assert 60 < project.pages[4].layout.header_y < 150
+
+
+def test_detect_header_footer_reduced():
+    with TemporaryDirectory() as temp_dir:
+        project = Project("Test Project", "A test project")
+
+        for page_number in range(4):
+            file_path = f"{temp_dir}/{page_number}.jpg"
+            create_test_page_image(file_path, page_number, True, scale=3)
+            project.add_image(file_path)
+
+        # Only a reduced grayscale image is decoded, the image cache is left
+        # alone
+        page = project.pages[0]
+        assert page.reduced_image(1024).shape == (4200 // 4, 3000 // 4)
+        image_cache = sys.modules[type(page).__module__].image_cache
+        image_cache.clear()
+        project.detect_header_footer()
+        assert len(image_cache) == 0
+
+        # Heights are in pixels of the full image
+        for page in project.pages:
+            assert 3 * 60 < page.layout.header_y < 3 * (150 + page.order * 7)
+            assert 3 * (1400 - 1340) < page.layout.footer_y < 3 * (1400 - 1200)
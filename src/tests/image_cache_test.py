@@ -0,0 +1,62 @@
+from tempfile import TemporaryDirectory
+
+import numpy as np
+from PIL import Image
+
+from src.page.page import Page
+from src.page.image_cache import ImageCache
+from src.page.image_probe import probe_image
+
+
+def create_test_image(file_path: str, width: int, height: int) -> None:
+    image = np.full((height, width), 255, dtype=np.uint8)
+    image[height // 4 : height // 2, width // 4 : width // 2] = 0
+    Image.fromarray(image).save(file_path, dpi=(300, 300))
+
+
+def test_image_cache_eviction():
+    with TemporaryDirectory() as temp_dir:
+        paths = [f"{temp_dir}/{number}.png" for number in range(3)]
+        for path in paths:
+            create_test_image(path, 100, 100)
+
+        loads = []
+
+        def loader(path: str) -> np.ndarray:
+            loads.append(path)
+            return np.zeros((100, 100), dtype=np.uint8)
+
+        # Room for two images
+        cache = ImageCache(25_000)
+        first = cache.get(paths[0], loader)
+        assert cache.get(paths[0], loader) is first
+        cache.get(paths[1], loader)
+        cache.get(paths[0], loader)
+        cache.get(paths[2], loader)
+
+        # The least recently used image was dropped
+        assert len(cache) == 2 and cache.memory_used == 20_000
+        assert loads == [paths[0], paths[1], paths[2]]
+        cache.get(paths[1], loader)
+        assert loads[-1] == paths[1]
+
+        cache.set_memory_budget(5_000)
+        assert len(cache) == 1
+
+        cache.discard(paths[1])
+        assert len(cache) == 0 and cache.memory_used == 0
+
+
+def test_page_image_metadata():
+    with TemporaryDirectory() as temp_dir:
+        image_path = f"{temp_dir}/page.png"
+        create_test_image(image_path, 640, 480)
+
+        image_info = probe_image(image_path)
+        assert (image_info.width, image_info.height, image_info.bit_depth) == (640, 480, 8)
+        assert [round(dpi) for dpi in image_info.dpi] == [300, 300]
+
+        page = Page(image_path)
+        assert page.layout.region == (0, 0, 640, 480)
+        assert page.image.shape == (480, 640)
+        assert page.image is page.image
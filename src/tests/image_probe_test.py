@@ -0,0 +1,91 @@
+import io
+from tempfile import TemporaryDirectory
+
+import numpy as np
+from PIL import Image
+
+from src.page.image_probe import probe_image, probe_pil, probe_tiff
+from src.project.project import Project
+
+
+def test_probe_image():
+    rng = np.random.default_rng(0)
+    color = rng.integers(0, 255, (300, 200, 3), dtype=np.uint8)
+    gray = color[:, :, 0]
+
+    with TemporaryDirectory() as temp_dir:
+        images = [
+            ("color.png", Image.fromarray(color), {"dpi": (300, 300)}),
+            ("gray.png", Image.fromarray(gray), {}),
+            ("color.jpg", Image.fromarray(color), {"dpi": (150, 150)}),
+            ("gray.jpg", Image.fromarray(gray), {}),
+            ("color.tif", Image.fromarray(color), {"dpi": (400, 400)}),
+            (
+                "bilevel.tif",
+                Image.fromarray(gray > 128),
+                {"dpi": (600, 600), "compression": "group4"},
+            ),
+            ("color.bmp", Image.fromarray(color), {}),
+        ]
+
+        for file_name, image, options in images:
+            image.save(f"{temp_dir}/{file_name}", **options)
+            # Same results as PIL, without decoding
+            assert probe_image(f"{temp_dir}/{file_name}") == probe_pil(
+                f"{temp_dir}/{file_name}"
+            ), file_name
+
+        image_info = probe_image(f"{temp_dir}/bilevel.tif")
+        assert (image_info.width, image_info.height) == (200, 300)
+        assert (image_info.bit_depth, image_info.channels) == (1, 1)
+        assert image_info.dpi == (600, 600)
+
+        # Cached until the file changes
+        assert probe_image(f"{temp_dir}/gray.png") is probe_image(f"{temp_dir}/gray.png")
+        Image.fromarray(gray[:100]).save(f"{temp_dir}/gray.png")
+        assert probe_image(f"{temp_dir}/gray.png").height == 100
+
+
+class CountingFile(io.BytesIO):
+    def __init__(self, data: bytes) -> None:
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def test_probe_tiff_reads_only_the_ifd():
+    image = Image.fromarray(np.zeros((1000, 1000, 3), dtype=np.uint8))
+    data = io.BytesIO()
+    image.save(data, format="TIFF", dpi=(300, 300))
+
+    # PIL writes the IFD after the image data
+    file = CountingFile(data.getvalue())
+    image_info = probe_tiff(file)
+    assert (image_info.width, image_info.height, image_info.dpi) == (
+        1000,
+        1000,
+        (300, 300),
+    )
+    assert file.bytes_read < 1024
+
+
+def test_project_ppi_from_image():
+    with TemporaryDirectory() as temp_dir:
+        image = Image.fromarray(np.zeros((3508, 100), dtype=np.uint8))
+        image.save(f"{temp_dir}/scan.png", dpi=(400, 400))
+        image.save(f"{temp_dir}/screen.png", dpi=(72, 72))
+        image.save(f"{temp_dir}/plain.png")
+
+        project = Project("Test Project", "A test project")
+        project.settings.set("paper_size", "a4")
+        pages = [
+            project.add_image(f"{temp_dir}/{name}.png")
+            for name in ("scan", "screen", "plain")
+        ]
+
+        # Default resolutions fall back to the paper size guess
+        assert [page.settings.get("ppi") for page in pages] == [400, 318, 318]
@@ -0,0 +1,50 @@
+import cv2
+import numpy as np
+
+from src.project.layout_templates import LayoutTemplates, page_signature
+from src.page.ocr_box import OCRBox, TextBox
+from src.page.box_type import BoxType
+
+
+def create_test_page_image(blocks: list, offset: int = 0) -> np.ndarray:
+    image = np.full((1400, 1000), 255, dtype=np.uint8)
+
+    for left, top, right, bottom in blocks:
+        for y in range(top + offset, bottom + offset, 30):
+            cv2.rectangle(image, (left, y), (right, y + 15), 0, -1)
+    return image
+
+
+def test_layout_templates():
+    two_columns = [(100, 100, 900, 200), (100, 300, 480, 1250), (520, 300, 900, 1250)]
+    image = create_test_page_image(two_columns)
+    boxes = [
+        TextBox(90, 90, 820, 115, BoxType.HEADING_TEXT),
+        TextBox(90, 290, 400, 950, BoxType.FLOWING_TEXT),
+        TextBox(510, 290, 400, 950, BoxType.FLOWING_TEXT),
+    ]
+
+    templates = LayoutTemplates()
+    region = (0, 0, 1000, 1400)
+    assert templates.match(image, region) is None
+    templates.add(image, boxes)
+
+    # The same layout with the text a little further down
+    matched = templates.match(create_test_page_image(two_columns, 12), region)
+    assert matched is not None
+    assert [box.type.name for box in matched] == [box.type.name for box in boxes]
+    assert [(box.x, box.y, box.x + box.width) for box in matched] == [
+        (96, 108, 905),
+        (96, 308, 485),
+        (516, 308, 905),
+    ]
+    assert templates.templates[0].uses == 1
+
+    # Ink outside the template boxes fails verification
+    extra_block = two_columns + [(100, 1280, 900, 1330)]
+    assert templates.match(create_test_page_image(extra_block), region) is None
+
+    # A different layout doesn't even get verified
+    one_column = [(300, 100, 700, 1300)]
+    signature = page_signature(create_test_page_image(one_column))
+    assert templates.candidates(signature) == []
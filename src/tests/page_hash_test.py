@@ -0,0 +1,125 @@
+from tempfile import TemporaryDirectory
+
+import cv2
+import numpy as np
+
+from src.project.project import Project
+from src.project.page_hash import DuplicatePolicy, PageHashIndex, perceptual_hash
+from src.page.ocr_box import TextBox
+from src.page.box_type import BoxType
+from src.ocr_engine.ocr_result import (
+    OCRResultBlock,
+    OCRResultLine,
+    OCRResultParagraph,
+    OCRResultWord,
+)
+
+
+def create_test_page_image(file_path: str, seed: int, scale: float = 1.0) -> None:
+    rng = np.random.default_rng(seed)
+    image = np.full((1400, 1000), 255, dtype=np.uint8)
+
+    for _ in range(12):
+        x, y = rng.integers(50, 700), rng.integers(50, 1200)
+        cv2.rectangle(image, (int(x), int(y)), (int(x) + 250, int(y) + 80), 0, -1)
+
+    if scale != 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    cv2.imwrite(file_path, image)
+
+
+def test_page_hash_index():
+    index = PageHashIndex()
+    for number in range(40):
+        index.add(f"page {number}", number * 0x0101010101010101)
+
+    index.remove("page 3")
+    assert len(index) == 39 and "page 3" not in index
+    assert index.find(3 * 0x0101010101010101) is None
+    assert index.find(0x0101010101010101 | 0x80) == ("page 1", 1)
+    assert index.find(39 * 0x0101010101010101, max_distance=0) == ("page 39", 0)
+
+
+def test_duplicate_pages():
+    with TemporaryDirectory() as temp_dir:
+        for seed in range(3):
+            create_test_page_image(f"{temp_dir}/{seed}.png", seed)
+        # The same scan at a different resolution
+        create_test_page_image(f"{temp_dir}/0_small.jpg", 0, 0.5)
+
+        image = cv2.imread(f"{temp_dir}/0.png", cv2.IMREAD_UNCHANGED)
+        small_image = cv2.imread(f"{temp_dir}/0_small.jpg", cv2.IMREAD_UNCHANGED)
+        assert bin(perceptual_hash(image) ^ perceptual_hash(small_image)).count("1") <= 2
+
+        project = Project("Test Project", "A test project")
+        project.add_images([f"{temp_dir}/{seed}.png" for seed in range(3)])
+
+        assert project.add_image(f"{temp_dir}/0_small.jpg", DuplicatePolicy.SKIP) is None
+        assert len(project.pages) == 3
+
+        page = project.add_image(f"{temp_dir}/0_small.jpg", DuplicatePolicy.LINK)
+        assert page.duplicate_of == project.pages[0].id
+
+        project.remove_page(0)
+        page = project.add_image(f"{temp_dir}/0.png", DuplicatePolicy.LINK)
+        assert page.duplicate_of == project.pages[2].id
+        assert project.add_image(f"{temp_dir}/1.png", DuplicatePolicy.SKIP) is None
+
+
+def create_test_ocr_result_block(text: str) -> OCRResultBlock:
+    line = OCRResultLine()
+    for index, word_text in enumerate(text.split()):
+        line.add_word(OCRResultWord(word_text, (110 + index * 60, 110, 50, 30), 90.0))
+    paragraph = OCRResultParagraph()
+    paragraph.add_line(line)
+    block = OCRResultBlock()
+    block.add_paragraph(paragraph)
+    return block
+
+
+def test_linked_pages(monkeypatch):
+    with TemporaryDirectory() as temp_dir:
+        for seed in range(2):
+            create_test_page_image(f"{temp_dir}/{seed}.png", seed)
+        create_test_page_image(f"{temp_dir}/0_copy.png", 0)
+
+        project = Project("Test Project", "A test project")
+        project.add_images([f"{temp_dir}/0.png", f"{temp_dir}/1.png"])
+        duplicate = project.add_image(f"{temp_dir}/0_copy.png", DuplicatePolicy.LINK)
+        original = project.pages[0]
+        assert duplicate.duplicate_of == original.id
+
+        analyzed = []
+        recognized = []
+
+        def analyze_page(page, reading_order=False, templates=None):
+            analyzed.append(page.order)
+            page.layout.boxes = [TextBox(100, 100, 400, 200, BoxType.FLOWING_TEXT)]
+
+        def recognize_boxes(page, box_index=None, convert_empty_textboxes=True, only_dirty=False):
+            recognized.append(page.order)
+            for box in page.layout.boxes:
+                box.ocr_results = create_test_ocr_result_block(f"page {page.order}")
+                box.mark_recognized(page.recognition_fingerprint())
+            page.notify_recognition_callbacks()
+
+        monkeypatch.setattr(type(duplicate), "analyze_page", analyze_page)
+        monkeypatch.setattr(type(duplicate), "recognize_boxes", recognize_boxes)
+
+        # The duplicate takes over layout and OCR results of the page it
+        # duplicates instead of being analyzed and recognized again
+        project.analyze_pages()
+        project.recognize_page_boxes()
+        assert analyzed == [0, 1]
+        assert recognized == [0, 1]
+
+        box = duplicate.layout[0]
+        assert box.id != original.layout[0].id
+        assert box.position() == original.layout[0].position()
+        assert box.ocr_results.get_text() == "page 0"
+        assert duplicate.dirty_boxes() == []
+        assert [page.order for page, _ in project.search("page 0")] == [0, 2]
+
+        # The results are copied, not shared
+        box.ocr_results.paragraphs[0].lines[0].words[0].text = "edited"
+        assert original.layout[0].ocr_results.get_text() == "page 0"
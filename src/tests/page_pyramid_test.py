@@ -0,0 +1,105 @@
+import os
+import sys
+from tempfile import TemporaryDirectory
+
+import cv2
+import numpy as np
+
+from src.project.project import Project
+from src.page.page_pyramid import select_level
+
+
+def create_test_image(file_path: str, value: int) -> None:
+    image = np.full((3000, 2000), 255, dtype=np.uint8)
+    image[500:1500, 400:1600] = value
+    cv2.imwrite(file_path, image)
+
+
+def test_select_level():
+    assert select_level((2000, 3000), (100, 150)) == "thumbnail"
+    assert select_level((2000, 3000), (800, 800)) == "preview"
+    assert select_level((2000, 3000), (1200, 1000)) == "full"
+    # Small images never need more than their own size
+    assert select_level((200, 100), (400, 400)) == "full"
+
+
+def test_page_pyramid():
+    with TemporaryDirectory() as temp_dir:
+        image_path = f"{temp_dir}/page.png"
+        create_test_image(image_path, 0)
+
+        project = Project("Test Project", "Test Description")
+        project.project_folder = temp_dir
+        page = project.add_image(image_path)
+        project.pyramid.wait()
+
+        thumbnail_path = page.get_image_path((100, 100))
+        assert thumbnail_path != image_path and os.path.dirname(thumbnail_path) == f"{temp_dir}/pyramid"
+        assert cv2.imread(thumbnail_path).shape[:2] == (256, 171)
+        assert cv2.imread(page.get_image_path((800, 800))).shape[:2] == (1536, 1024)
+        assert page.get_image_path((4000, 4000)) == image_path
+
+        # A changed source gets new levels
+        create_test_image(image_path, 128)
+        os.utime(image_path, ns=(0, 0))
+        new_thumbnail_path = page.get_image_path((100, 100))
+        assert new_thumbnail_path != thumbnail_path and os.path.exists(new_thumbnail_path)
+
+
+def test_page_pyramid_find_path():
+    with TemporaryDirectory() as temp_dir:
+        image_path = f"{temp_dir}/page.png"
+        create_test_image(image_path, 0)
+
+        project = Project("Test Project", "Test Description")
+        page = project.add_image(image_path)
+        assert page.find_image_path((800, 800)) is None
+
+        # Missing levels are neither hashed nor generated
+        project.project_folder = temp_dir
+        project.get_pyramid()
+        page.pyramid = project.pyramid
+        assert page.find_image_path((800, 800)) is None
+        assert not os.path.exists(f"{temp_dir}/pyramid")
+        assert page.find_image_path((4000, 4000)) == image_path
+
+        preview_path = page.get_image_path((800, 800))
+        assert page.find_image_path((800, 800)) == preview_path
+
+
+def test_page_pyramid_stored_source_hash(monkeypatch):
+    with TemporaryDirectory() as temp_dir:
+        image_path = f"{temp_dir}/page.png"
+        create_test_image(image_path, 0)
+
+        project = Project("Test Project", "Test Description")
+        project.project_folder = temp_dir
+        page = project.add_image(image_path)
+        project.pyramid.wait()
+        preview_path = page.get_image_path((800, 800))
+
+        # The hash is saved with the page, the levels of the unchanged file
+        # are found after loading without hashing it again
+        loaded = Project.from_dict(project.to_dict())
+        loaded.project_folder = temp_dir
+        pyramid_module = sys.modules[type(project.pyramid).__module__]
+        hashed = []
+        original_source_hash = pyramid_module.source_hash
+        monkeypatch.setattr(
+            pyramid_module,
+            "source_hash",
+            lambda path: hashed.append(path) or original_source_hash(path),
+        )
+
+        loaded.update_pyramids()
+        loaded.pyramid.wait()
+        loaded_page = loaded.pages[0]
+        assert loaded_page.find_image_path((800, 800)) == preview_path
+        assert hashed == []
+
+        # A changed file is hashed again
+        os.utime(image_path, ns=(0, 0))
+        assert loaded_page.find_image_path((800, 800)) is None
+        loaded_page.get_image_path((800, 800))
+        assert hashed == [image_path]
+        assert loaded_page.to_dict()["page"]["source_hash"]["mtime_ns"] == 0
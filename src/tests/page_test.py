@@ -1,6 +1,19 @@
+import random
+from copy import deepcopy
+from tempfile import TemporaryDirectory
+
+import cv2
+import numpy as np
+from PySide6.QtGui import QUndoStack
+
 from src.project.project_settings import ProjectSettings
-from src.page.ocr_box import OCRBox
-from src.page.page import PageLayout, Page
+from src.page.ocr_box import OCRBox, TextBox, boxes_equal
+from src.page.box_type import BoxType
+from src.page.page import PageLayout, Page, layout_analyzers
+from src.page.spatial_index import rect_distance
+from src.page.layout_history import LayoutHistory
+from src.page_editor.layout_undo_command import LayoutUndoCommand
+from src.ocr_engine.ocr_engine_tesserocr import OCR_PADDING, recognize_text
 
 project_settings = ProjectSettings(
     {
@@ -97,3 +110,434 @@ def test_page_header_footer():
     # box_debugger.show_boxes(page.image_path, page.layout.boxes)
 
     assert len(page.layout) == 22
+
+
+def test_page_layout_spatial_queries():
+    random.seed(0)
+    layout = PageLayout([])
+
+    for _ in range(500):
+        layout.add_box(
+            OCRBox(
+                x=random.randint(0, 2400),
+                y=random.randint(0, 3400),
+                width=random.randint(5, 300),
+                height=random.randint(5, 100),
+            )
+        )
+
+    def brute_force_region(x, y, width, height):
+        region = OCRBox(x=x, y=y, width=width, height=height)
+        return [box.id for box in layout if box.intersects(region)]
+
+    assert [box.id for box in layout.boxes_in_region(500, 500, 400, 300)] == (
+        brute_force_region(500, 500, 400, 300)
+    )
+
+    # Geometry changes, removals and replacements keep the index up to date
+    layout[0].update_position(600 - layout[0].x, 600 - layout[0].y)
+    layout[1].update_size(1, 1)
+    layout.remove_box(2)
+    layout.replace_box(3, OCRBox(x=605, y=605, width=10, height=10))
+    layout[4].set_geometry(0, 0, 2500, 3500)
+
+    assert [box.id for box in layout.boxes_in_region(500, 500, 400, 300)] == (
+        brute_force_region(500, 500, 400, 300)
+    )
+    assert layout[0] in layout.boxes_at(601, 601)
+    assert layout[3] in layout.overlapping_boxes(layout[0])
+
+    contained = layout.boxes_in_region(0, 0, 1000, 1000, contained=True)
+    assert layout[3] in contained and layout[4] not in contained
+
+    point = (1234, 2345)
+    nearest = layout.nearest_boxes(*point, count=5)
+    distances = sorted(rect_distance(box, *point) for box in layout)
+    assert [rect_distance(box, *point) for box in nearest] == distances[:5]
+
+    pairs = {tuple(sorted((a.id, b.id))) for a, b in layout.overlapping_pairs()}
+    assert pairs == {
+        tuple(sorted((a.id, b.id)))
+        for index, a in enumerate(layout)
+        for b in layout[index + 1 :]
+        if a.intersects(b)
+    }
+
+
+def test_page_layout_batch_and_id_access():
+    layout = PageLayout([OCRBox(x=0, y=0, width=10, height=10) for _ in range(5)])
+    layout.update_order()
+    boxes = list(layout)
+
+    new_boxes = [OCRBox(x=0, y=0, width=10, height=10) for _ in range(3)]
+    layout.add_boxes(new_boxes, 1)
+    assert [box.order for box in layout] == list(range(8))
+    assert layout[1] is new_boxes[0]
+    assert layout.get_box_by_id(new_boxes[2].id) is new_boxes[2]
+
+    layout.remove_boxes([boxes[0].id, new_boxes[1].id, boxes[4].id])
+    assert list(layout) == [new_boxes[0], new_boxes[2], boxes[1], boxes[2], boxes[3]]
+    assert [box.order for box in layout] == list(range(5))
+    assert layout.get_box_by_id(boxes[0].id) is None
+
+    layout.remove_box_by_id(boxes[2].id)
+    assert boxes[3].order == 3
+    assert layout.get_box_by_id(boxes[2].id) is None
+
+    # Ids changed after adding are still found
+    boxes[3].id = "changed"
+    assert layout.get_box_by_id("changed") is boxes[3]
+
+
+def test_page_layout_reading_order():
+    named_boxes = {
+        "page number": OCRBox(x=900, y=10, width=50, height=20),
+        "heading": OCRBox(x=100, y=100, width=800, height=60, type=BoxType.HEADING_TEXT),
+        "left 1": OCRBox(x=100, y=200, width=380, height=200),
+        "right 1": OCRBox(x=520, y=200, width=380, height=200),
+        "left 2": OCRBox(x=100, y=420, width=380, height=200),
+        "right 2": OCRBox(x=520, y=420, width=380, height=300),
+        "caption": OCRBox(x=100, y=1030, width=380, height=40, type=BoxType.CAPTION_TEXT),
+        "image": OCRBox(x=100, y=640, width=380, height=380, type=BoxType.FLOWING_IMAGE),
+        "wide": OCRBox(x=100, y=1100, width=800, height=100),
+        "footer": OCRBox(x=100, y=1350, width=800, height=30),
+    }
+    names = {box.id: name for name, box in named_boxes.items()}
+    boxes = list(named_boxes.values())
+    random.Random(0).shuffle(boxes)
+
+    layout = PageLayout(boxes)
+    layout.region = (0, 0, 1000, 1400)
+    layout.header_y = 50
+    layout.footer_y = 100
+    layout.sort_by_reading_order()
+
+    assert [names[box.id] for box in layout] == [
+        "page number",
+        "heading",
+        "left 1",
+        "left 2",
+        "image",
+        "caption",
+        "right 1",
+        "right 2",
+        "wide",
+        "footer",
+    ]
+    assert [box.order for box in layout] == list(range(len(boxes)))
+
+    # Thousands of boxes in a grid of columns
+    layout = PageLayout(
+        [
+            OCRBox(x=column * 110, y=row * 12, width=100, height=10)
+            for row in range(500)
+            for column in range(6)
+        ]
+    )
+    layout.sort_by_reading_order()
+    assert [(box.x, box.y) for box in layout[:2]] == [(0, 0), (0, 12)]
+    assert (layout[500].x, layout[500].y) == (110, 0)
+
+
+def test_page_layout_batch_changes():
+    layout = PageLayout(
+        [OCRBox(x=index * 20, y=0, width=10, height=10) for index in range(10)]
+    )
+    layout.update_order()
+    boxes = list(layout)
+    assert layout.boxes_at(25, 5) == [boxes[1]]
+
+    change_sets = []
+    layout.add_change_callback(lambda _, changes: change_sets.append(changes))
+    box_updates = []
+    boxes[0].add_callback(box_updates.append)
+
+    # Single changes are reported right away
+    boxes[0].set_geometry(0, 0, 15, 10)
+    assert len(change_sets) == 1 and list(change_sets[0].changed) == [boxes[0].id]
+
+    with layout.batch():
+        for box in boxes:
+            box.update_position(0, 20)
+            box.notify_callbacks("test")
+            assert box_updates == []
+
+        new_box = OCRBox(x=500, y=500, width=10, height=10)
+        layout.add_box(new_box)
+        temporary_box = OCRBox(x=600, y=600, width=10, height=10)
+        layout.add_box(temporary_box)
+        layout.remove_box_by_id(temporary_box.id)
+        layout.remove_box_by_id(boxes[9].id)
+        assert len(change_sets) == 1
+
+    assert len(change_sets) == 2
+    changes = change_sets[1]
+    assert list(changes.added) == [new_box.id]
+    assert list(changes.removed) == [boxes[9].id]
+    assert set(changes.changed) == {box.id for box in boxes[:9]}
+    assert box_updates == [boxes[0]]
+
+    # The spatial index follows the committed changes
+    assert layout.boxes_at(25, 5) == []
+    assert layout.boxes_at(25, 25) == [boxes[1]]
+    assert layout.boxes_at(505, 505) == [new_box]
+    assert layout.boxes_at(185, 25) == []
+    assert [box.order for box in layout] == list(range(10))
+
+
+class RectangleRecorder:
+    def __init__(self) -> None:
+        self.rectangles = []
+
+    def SetRectangle(self, *rectangle) -> None:
+        self.rectangles.append(rectangle)
+
+    def GetUTF8Text(self) -> str:
+        return ""
+
+
+def test_ocr_padding_keeps_box_geometry():
+    box = TextBox(x=100, y=50, width=40, height=20)
+    layout = PageLayout([box])
+    change_sets = []
+    layout.add_change_callback(lambda _, changes: change_sets.append(changes))
+
+    api = RectangleRecorder()
+    recognize_text(api, box)
+
+    assert api.rectangles == [
+        (100 - OCR_PADDING, 50 - OCR_PADDING, 40 + 2 * OCR_PADDING, 20 + 2 * OCR_PADDING)
+    ]
+    assert (box.x, box.y, box.width, box.height) == (100, 50, 40, 20)
+    assert change_sets == []
+
+
+def test_box_identity_and_equality():
+    box = TextBox(10, 20, 30, 40, BoxType.FLOWING_TEXT)
+    other = TextBox(10, 20, 30, 40, BoxType.FLOWING_TEXT)
+    assert box.id != other.id
+    assert not hasattr(box, "__dict__")
+
+    # Same identity and geometry are equal, OCR results and text only count
+    # for the deep comparison
+    other.id = box.id
+    other.user_text = "changed"
+    assert box == other and hash(box) == hash(other)
+    assert not boxes_equal(box, other)
+    assert len({box, other}) == 1
+
+    other.user_text = box.user_text
+    assert boxes_equal(box, other)
+
+    other.update_size(31, 40)
+    assert box != other
+
+    layout = PageLayout([box])
+    copied = deepcopy(box)
+    assert copied == box and copied._layout is None and box._layout is layout
+
+
+def test_page_layout_history():
+    layout = PageLayout([TextBox(index * 20, 0, 10, 10) for index in range(1000)])
+    layout.update_order()
+    boxes = list(layout)
+    history = LayoutHistory(layout)
+
+    # A drag is a single step
+    for _ in range(10):
+        history.move_box(boxes[0], 1, 2)
+    history.end_merge()
+    history.resize_box(boxes[0], 30, 40)
+    history.set_user_text(boxes[1], "Hello")
+    converted = history.convert_box(boxes[2], BoxType.FLOWING_IMAGE)
+    history.remove_boxes([boxes[3].id, boxes[5].id])
+    new_box = TextBox(0, 500, 10, 10)
+    history.add_boxes([new_box], 1)
+    assert len(history.undo_stack) == 6
+
+    snapshot = layout.to_dict()
+    while history.undo():
+        pass
+    assert list(layout) == boxes
+    assert (boxes[0].x, boxes[0].y, boxes[0].width) == (0, 0, 10)
+    assert boxes[1].user_text == ""
+    assert layout.get_box_by_id(new_box.id) is None
+    assert [box.order for box in layout] == list(range(1000))
+
+    while history.redo():
+        pass
+    assert layout.to_dict() == snapshot
+    assert layout[3] is converted
+
+    # A new edit drops the redo steps, the memory limit the oldest steps
+    history.undo()
+    history.set_user_text(boxes[1], "World", merge=False)
+    assert not history.can_redo()
+
+    history.memory_limit = history.memory_used
+    history.remove_boxes([box.id for box in boxes[100:200]])
+    assert len(history.undo_stack) == 1
+    assert history.memory_used <= max(history.memory_limit, history.undo_stack[0].size())
+
+
+def test_page_snap_boxes_to_content():
+    with TemporaryDirectory() as temp_dir:
+        page_image_path = f"{temp_dir}/page.png"
+        image = np.full((800, 1000), 255, dtype=np.uint8)
+        # Two words of a line and a paragraph far below
+        cv2.rectangle(image, (100, 100), (299, 129), 0, -1)
+        cv2.rectangle(image, (320, 100), (399, 129), 0, -1)
+        cv2.rectangle(image, (100, 400), (399, 449), 0, -1)
+        cv2.imwrite(page_image_path, image)
+
+        page = Page(page_image_path)
+        line_box = OCRBox(80, 80, 290, 80)
+        duplicate_box = OCRBox(85, 85, 285, 70)
+        outer_box = OCRBox(50, 50, 450, 450)
+        empty_box = OCRBox(600, 600, 100, 100)
+        page.layout.add_boxes([line_box, duplicate_box, outer_box, empty_box])
+
+        assert page.suggest_box_merges() == [(line_box, duplicate_box)]
+        assert page.suggest_box_splits(min_gap=50) == [
+            (outer_box, [(100, 100, 300, 30), (100, 400, 300, 50)])
+        ]
+
+        page.snap_boxes_to_content(padding=2, remove_empty=True)
+        # Characters cut off by the box are taken in
+        assert (line_box.x, line_box.y, line_box.width, line_box.height) == (
+            98,
+            98,
+            304,
+            34,
+        )
+        assert (outer_box.x, outer_box.y, outer_box.width, outer_box.height) == (
+            98,
+            98,
+            304,
+            354,
+        )
+        assert list(page.layout) == [line_box, duplicate_box, outer_box]
+        assert page.layout.boxes_at(650, 650) == []
+
+
+def test_page_dirty_boxes():
+    with TemporaryDirectory() as temp_dir:
+        page_image_path = f"{temp_dir}/page.png"
+        cv2.imwrite(page_image_path, np.full((800, 1000), 255, dtype=np.uint8))
+
+        page = Page(page_image_path)
+        page.set_settings(project_settings)
+        first_box = TextBox(100, 100, 200, 50, BoxType.FLOWING_TEXT)
+        second_box = TextBox(100, 300, 200, 50, BoxType.FLOWING_TEXT)
+        page.layout.add_boxes([first_box, second_box])
+        assert page.dirty_boxes() == [first_box, second_box]
+
+        page_fingerprint = page.recognition_fingerprint()
+        for box in page.layout:
+            box.mark_recognized(page_fingerprint)
+        assert page.dirty_boxes() == []
+
+        # Geometry and type changes make a box stale
+        second_box.update_size(220, 50)
+        assert page.dirty_boxes() == [second_box]
+        second_box.mark_recognized(page_fingerprint)
+        page.convert_box(0, BoxType.HEADING_TEXT)
+        assert [box.id for box in page.dirty_boxes()] == [first_box.id]
+
+        # The fingerprints are saved with the boxes
+        loaded = Page.from_dict(page.to_dict(), project_settings)
+        assert [box.id for box in loaded.dirty_boxes()] == [first_box.id]
+
+        # Changed settings make all boxes stale
+        page.settings.set("ppi", 600)
+        assert len(page.dirty_boxes()) == 2
+
+
+def test_layout_history_undo_stack():
+    with TemporaryDirectory() as temp_dir:
+        page_image_path = f"{temp_dir}/page.png"
+        cv2.imwrite(page_image_path, np.full((800, 1000), 255, dtype=np.uint8))
+
+        page = Page(page_image_path)
+        boxes = [TextBox(index * 100, 0, 50, 50) for index in range(3)]
+        page.layout.add_boxes(boxes)
+        recognized = []
+        page.add_recognition_callback(lambda _, boxes: recognized.append(boxes))
+
+        history = LayoutHistory(page.layout, page=page)
+        undo_stack = QUndoStack()
+        history.add_push_callback(
+            lambda command: undo_stack.push(LayoutUndoCommand(history, command))
+        )
+
+        history.move_box(boxes[0], 5, 5)
+        history.end_merge()
+        converted = history.convert_box(boxes[1], BoxType.HEADING_TEXT)
+        assert recognized == [[converted]]
+        history.remove_boxes([boxes[2].id])
+        assert undo_stack.count() == 3 and len(page.layout) == 2
+
+        undo_stack.undo()
+        undo_stack.undo()
+        assert page.layout[1] is boxes[1] and page.layout[2] is boxes[2]
+        assert recognized[-1] == [boxes[1]]
+        undo_stack.redo()
+        assert page.layout[1] is converted
+
+        # Steps dropped by the memory limit are no-ops on the undo stack
+        history.memory_limit = 0
+        history.set_user_text(boxes[0], "Text")
+        assert undo_stack.count() == 3 and len(history.undo_stack) == 1
+        for _ in range(3):
+            undo_stack.undo()
+        assert boxes[0].user_text == "" and page.layout[1] is converted
+        for _ in range(3):
+            undo_stack.redo()
+        assert boxes[0].user_text == "Text"
+
+
+def test_page_shared_layout_analyzer():
+    with TemporaryDirectory() as temp_dir:
+        page_image_path = f"{temp_dir}/page.png"
+        cv2.imwrite(page_image_path, np.full((100, 100), 255, dtype=np.uint8))
+
+        pages = [Page(page_image_path) for _ in range(3)]
+        for page in pages:
+            page.set_settings(project_settings)
+        pages[2].settings.set("langs", ["eng"])
+
+        # Pages with the same languages share one analyzer and its handles
+        analyzer = pages[0].get_layout_analyzer()
+        assert pages[1].get_layout_analyzer() is analyzer
+        assert pages[2].get_layout_analyzer() is not analyzer
+        assert len(layout_analyzers.analyzers) == 2
+
+        layout_analyzers.close()
+        assert layout_analyzers.analyzers == {}
+        assert pages[0].get_layout_analyzer() is not analyzer
+        layout_analyzers.close()
+
+
+def test_page_analysis_uses_shared_layout_analyzer(monkeypatch):
+    with TemporaryDirectory() as temp_dir:
+        page_image_path = f"{temp_dir}/page.png"
+        cv2.imwrite(page_image_path, np.full((100, 100), 255, dtype=np.uint8))
+
+        page = Page(page_image_path)
+        page.set_settings(project_settings)
+        analyzer = page.get_layout_analyzer()
+        used = []
+
+        def analyze_layout(self, image_path, ppi, region=None, size_threshold=0):
+            used.append(self)
+            return [TextBox(10, 10, 50, 20)]
+
+        monkeypatch.setattr(type(analyzer), "analyze_layout", analyze_layout)
+
+        # Analyzing pages and regions goes through the shared analyzer, its
+        # handles are initialized once instead of on every call
+        page.analyze_page()
+        assert len(page.analyse_region((0, 0, 50, 50))) == 1
+        assert used == [analyzer, analyzer]
+        assert len(page.layout) == 1
+        layout_analyzers.close()
@@ -0,0 +1,97 @@
+import os
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import pytest
+from PIL import Image
+from pypdf import PdfReader, PdfWriter
+
+from src.project.project import Project
+from src.project.page_hash import DuplicatePolicy
+
+
+def create_test_pdf(file_path: str, seeds: list) -> None:
+    images = []
+    for seed in seeds:
+        rng = np.random.default_rng(seed)
+        image = np.full((700, 500), 255, dtype=np.uint8)
+        for _ in range(8):
+            x, y = rng.integers(20, 350), rng.integers(20, 600)
+            image[y : y + 40, x : x + 120] = 0
+        images.append(Image.fromarray(image).convert("RGB"))
+
+    images[0].save(file_path, save_all=True, append_images=images[1:], resolution=100)
+
+
+def test_import_pdf():
+    with TemporaryDirectory() as temp_dir:
+        pdf_path = f"{temp_dir}/magazine.pdf"
+        create_test_pdf(pdf_path, [0, 1, 2, 1, 3])
+
+        project = Project("Test Project", "Test Description")
+        project.project_folder = temp_dir
+        added = []
+        pages = project.import_pdf(
+            pdf_path, 1, duplicates=DuplicatePolicy.SKIP, on_page=added.append
+        )
+        project.pyramid.wait()
+
+        # Pages keep the PDF order, the repeated page is skipped
+        assert pages == added == project.pages
+        assert [os.path.basename(page.image_path).split("_")[1] for page in pages] == [
+            "1",
+            "2",
+            "4",
+        ]
+        assert all(page.layout.region == (0, 0, 500, 700) for page in pages)
+        assert all(os.path.exists(page.image_path) for page in pages)
+
+
+def test_import_pdf_rasterize():
+    pytest.importorskip("pypdfium2")
+
+    with TemporaryDirectory() as temp_dir:
+        pdf_path = f"{temp_dir}/magazine.pdf"
+        create_test_pdf(pdf_path, [0, 1])
+
+        project = Project("Test Project", "Test Description")
+        project.project_folder = temp_dir
+        pages = project.import_pdf(pdf_path, rasterize=True)
+        project.pyramid.wait()
+
+        # Rendered at the project resolution, PDF pages are 5 x 7 inches
+        assert len(pages) == 2
+        assert all(page.layout.region == (0, 0, 1500, 2100) for page in pages)
+        assert pages[0].settings.get("ppi") == 300
+
+
+def test_import_pdf_rasterize_mixed():
+    pytest.importorskip("pypdfium2")
+
+    with TemporaryDirectory() as temp_dir:
+        image_pdf_path = f"{temp_dir}/images.pdf"
+        create_test_pdf(image_pdf_path, [0, 1])
+
+        # A vector page without images between the two scans
+        writer = PdfWriter()
+        reader = PdfReader(image_pdf_path)
+        writer.add_page(reader.pages[0])
+        writer.add_blank_page(360, 504)
+        writer.add_page(reader.pages[1])
+        pdf_path = f"{temp_dir}/mixed.pdf"
+        with open(pdf_path, "wb") as file:
+            writer.write(file)
+
+        project = Project("Test Project", "Test Description")
+        project.project_folder = temp_dir
+        pages = project.import_pdf(pdf_path, rasterize=None)
+        project.pyramid.wait()
+
+        # Only the vector page is rendered, the scans are imported as they are
+        assert [page.layout.region for page in pages] == [
+            (0, 0, 500, 700),
+            (0, 0, 1500, 2100),
+            (0, 0, 500, 700),
+        ]
+        assert [page.image_path.endswith(".png") for page in pages] == [False, True, False]
+        assert pages[1].settings.get("ppi") == 300
@@ -1,12 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 import json
+import sys
 from src.project.project_settings import ProjectSettings
 from src.project.project import Project
-from src.page.ocr_box import OCRBox, BOX_TYPE_MAP
+from src.project import project_file
+from src.project.project_file import (
+    close_project_file,
+    compact_ocr_result_tables,
+    load_project_file,
+    project_file_sources,
+    save_project_file,
+)
+from src.page.ocr_box import OCRBox, ImageBox, TextBox, BOX_TYPE_MAP, boxes_equal
+from src.ocr_engine.ocr_result import (
+    OCRResultBlock,
+    OCRResultLine,
+    OCRResultParagraph,
+    OCRResultWord,
+    InternTable,
+)
 from src.page.box_type import BoxType
 from src.page.page import Page
 from unittest import TestCase
 from tempfile import TemporaryDirectory
+from PIL import Image
 
 project_settings = ProjectSettings(
     {
@@ -49,7 +67,7 @@ def test_save_load_boxes():
         assert box.y == loaded.y
         assert box.width == loaded.width
         assert box.height == loaded.height
-        assert box == loaded
+        assert boxes_equal(box, loaded)
 
 
 def test_save_load_boxes2():
@@ -77,7 +95,7 @@ def test_save_load_boxes2():
         loaded = OCRBox.from_dict(loaded_data)
 
     TestCase().assertDictEqual(box.to_dict(), loaded.to_dict())
-    assert box == loaded
+    assert boxes_equal(box, loaded)
 
 
 def test_save_load_page():
@@ -104,7 +122,7 @@ def test_save_load_page():
     assert len(page.layout) == len(loaded.layout)
 
     for box, loaded_box in zip(page.layout, loaded.layout):
-        assert box == loaded_box
+        assert boxes_equal(box, loaded_box)
 
 
 def test_save_load_project():
@@ -131,3 +149,175 @@ def test_save_load_project():
         assert project.description == loaded.description
         assert project.settings == loaded.settings
         assert len(project.pages) == len(loaded.pages)
+
+
+def create_test_ocr_result_block(word_count: int) -> OCRResultBlock:
+    block = OCRResultBlock()
+    block.bbox = (10, 10, 1000, 1000)
+    block.confidence = 91.25
+    paragraph = OCRResultParagraph()
+    paragraph.bbox = (10, 10, 1000, 1000)
+    paragraph.justification = 1
+    line = OCRResultLine()
+    line.bbox = (10, 10, 1000, 40)
+    line.baseline = ((10, 38), (1000, 39))
+
+    for index in range(word_count):
+        word = OCRResultWord()
+        word.text = f"Wört{index}"
+        word.bbox = (10 + index * 10, 10, 18 + index * 10, 40)
+        word.confidence = 80.0 + index % 20
+        word.word_font_attributes = {"font_name": "", "bold": index % 2 == 0, "pointsize": 10}
+        word.word_recognition_language = "deu"
+        line.add_word(word)
+
+    paragraph.add_line(line)
+    paragraph.add_line(OCRResultLine())
+    block.add_paragraph(paragraph)
+    return block
+
+
+def test_save_load_project_file():
+    with TemporaryDirectory() as temp_dir:
+        page_image_path = f"{temp_dir}/page.png"
+        Image.new("L", (2480, 3508), 255).save(page_image_path)
+
+        project = Project("Test Project", "A test project")
+        project.set_settings(project_settings)
+        project.add_image(page_image_path)
+
+        text_box = TextBox(10, 10, 1000, 1000, BoxType.FLOWING_TEXT)
+        text_box.ocr_results = create_test_ocr_result_block(50)
+        project.pages[0].layout.add_box(text_box)
+        project.pages[0].layout.add_box(ImageBox(10, 1200, 500, 500, BoxType.FLOWING_IMAGE))
+
+        file_path = f"{temp_dir}/project.ocrproj"
+        save_project_file(project, file_path)
+        loaded = load_project_file(file_path)
+
+        assert project.uuid == loaded.uuid
+        assert project.settings.to_dict() == loaded.settings.to_dict()
+        assert len(loaded.pages) == 1
+
+        # OCR results are only decoded on first access, saving again copies
+        # them without decoding
+        assert loaded.pages[0].layout[0].pending_ocr_results() is not None
+        new_text_box = TextBox(10, 2000, 1000, 100, BoxType.FLOWING_TEXT)
+        new_text_box.ocr_results = create_test_ocr_result_block(5)
+        new_text_box.ocr_results.paragraphs[0].lines[0].words[0].word_font_attributes = {
+            "font_name": "Serif"
+        }
+        loaded.pages[0].layout.add_box(new_text_box)
+        project.pages[0].layout.add_box(new_text_box)
+
+        old_source = loaded.pages[0].layout[0].pending_ocr_results().source
+        save_project_file(loaded, file_path)
+        # Pending results and the text index are read from the new file, the
+        # old mapping is released
+        source = loaded.pages[0].layout[0].pending_ocr_results().source
+        assert source is not old_source and old_source.mmap is None
+        assert loaded.text_index.pending().source is source
+        assert project_file_sources(loaded) == {source}
+        reloaded = load_project_file(file_path)
+
+        for box, loaded_box, reloaded_box in zip(
+            project.pages[0].layout, loaded.pages[0].layout, reloaded.pages[0].layout
+        ):
+            TestCase().assertDictEqual(box.to_dict(), loaded_box.to_dict())
+            TestCase().assertDictEqual(box.to_dict(), reloaded_box.to_dict())
+
+        sources = project_file_sources(reloaded)
+        assert sources
+        close_project_file(reloaded)
+        assert all(source.mmap is None for source in sources)
+
+
+def test_interned_word_attributes():
+    block = create_test_ocr_result_block(10)
+    words = block.paragraphs[0].lines[0].words
+
+    # Words with the same font attributes share one read-only record
+    assert words[0].word_font_attributes is words[2].word_font_attributes
+    assert words[0].word_font_attributes is not words[1].word_font_attributes
+    assert words[0].to_dict()["word_font_attributes"] == {
+        "font_name": "",
+        "bold": True,
+        "pointsize": 10,
+    }
+
+    try:
+        words[0].word_font_attributes["bold"] = False
+        assert False
+    except TypeError:
+        pass
+
+
+def test_interning_on_worker_threads():
+    table = InternTable()
+
+    def intern_values(offset: int) -> list:
+        return [table.intern(f"lang {(offset + number) % 50}") for number in range(2000)]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(intern_values, range(4)))
+
+    # Every value got exactly one index, the same on all threads
+    assert len(table) == 50
+    for offset, indices in enumerate(results):
+        assert [table.get(index) for index in indices] == [
+            f"lang {(offset + number) % 50}" for number in range(2000)
+        ]
+
+
+def test_compact_ocr_result_tables():
+    # The tables the project file module renumbers
+    ocr_result = sys.modules[type(project_file.FONT_ATTRIBUTES).__module__]
+
+    def create_block(name: str) -> OCRResultBlock:
+        block = create_test_ocr_result_block(0)
+        for index in range(3):
+            word = ocr_result.OCRResultWord(f"Wort{index}", (10 + index * 10, 10, 18, 40))
+            word.word_font_attributes = {"font_name": f"{name} Serif"}
+            word.word_recognition_language = name
+            block.paragraphs[0].lines[0].add_word(word)
+        return block
+
+    with TemporaryDirectory() as temp_dir:
+        page_image_path = f"{temp_dir}/page.png"
+        Image.new("L", (100, 100), 255).save(page_image_path)
+
+        projects = {}
+        for name in ["closed", "open", "saved"]:
+            project = Project(name, "A test project")
+            project.add_image(page_image_path)
+            text_box = TextBox(10, 10, 80, 80, BoxType.FLOWING_TEXT)
+            text_box.ocr_results = create_block(name)
+            project.pages[0].layout.add_box(text_box)
+            projects[name] = project
+
+        file_path = f"{temp_dir}/project.ocrproj"
+        save_project_file(projects["saved"], file_path)
+        projects["saved"] = load_project_file(file_path)
+        assert projects["saved"].pages[0].layout[0].pending_ocr_results() is not None
+
+        del projects["closed"]
+        compact_ocr_result_tables(projects.values())
+
+        # Only the values of the remaining projects are kept
+        assert "closed" not in ocr_result.LANGUAGES.values
+        assert {"open", "saved"} <= set(ocr_result.LANGUAGES.values)
+        assert ocr_result.LANGUAGES.get(ocr_result.EMPTY_LANGUAGE) == ""
+        assert ocr_result.FONT_ATTRIBUTES.get(ocr_result.EMPTY_FONT_ATTRIBUTES) == {}
+
+        # Loaded words and pending results both resolve through the new ids
+        for name, project in projects.items():
+            words = project.pages[0].layout[0].ocr_results.paragraphs[0].lines[0].words
+            assert [word.word_recognition_language for word in words] == [name] * 3
+            assert words[0].word_font_attributes == {"font_name": f"{name} Serif"}
+
+        save_project_file(projects["open"], file_path)
+        reloaded = load_project_file(file_path)
+        words = reloaded.pages[0].layout[0].ocr_results.paragraphs[0].lines[0].words
+        assert words[2].word_recognition_language == "open"
+        close_project_file(reloaded)
+        close_project_file(projects["saved"])
@@ -0,0 +1,73 @@
+import math
+
+from src.ocr_engine.ocr_result import (
+    OCRResultBlock,
+    OCRResultLine,
+    OCRResultParagraph,
+    OCRResultWord,
+)
+from src.ocr_engine.ocr_statistics import OCRStatistics
+from src.exporter.exporter_txt import ExporterTxt
+
+
+def create_test_ocr_result_block(words: list) -> OCRResultBlock:
+    # words are (confidence, point size) tuples, one paragraph per list
+    block = OCRResultBlock()
+
+    for paragraph_words in words:
+        paragraph = OCRResultParagraph()
+        line = OCRResultLine()
+
+        for index, (confidence, pointsize) in enumerate(paragraph_words):
+            word = OCRResultWord()
+            word.text = f"word{index}"
+            word.bbox = (index * 10, 0, index * 10 + 8, 10)
+            word.confidence = confidence
+            word.word_font_attributes = (
+                {"pointsize": pointsize} if pointsize is not None else {}
+            )
+            line.add_word(word)
+
+        paragraph.add_line(line)
+        block.add_paragraph(paragraph)
+
+    return block
+
+
+def test_ocr_statistics():
+    statistics = OCRStatistics.from_blocks(
+        [
+            ("page_1", "box_1", create_test_ocr_result_block([[(90, 10), (50, 12)], []])),
+            ("page_1", "box_2", None),
+            ("page_2", "box_3", create_test_ocr_result_block([[(95, 12), (20, None)]])),
+        ]
+    )
+
+    assert len(statistics) == 4
+    assert statistics.word_counts("box").tolist() == [2, 0, 2]
+    assert statistics.per_group(statistics.mean_confidence("page"), "page") == {
+        "page_1": 70.0,
+        "page_2": 57.5,
+    }
+
+    mean_font_sizes = statistics.mean_font_size("paragraph").tolist()
+    assert mean_font_sizes[0] == 11.0
+    assert math.isnan(mean_font_sizes[1])
+    assert mean_font_sizes[2] == 12.0
+
+    assert statistics.low_confidence_counts(60).tolist() == [1, 0, 1]
+    assert statistics.confidence_histogram(10).tolist() == [0, 0, 1, 0, 0, 1, 0, 0, 0, 2]
+    assert statistics.confidence_histogram(2, "page").tolist() == [[0, 2], [1, 1]]
+    assert statistics.per_group(statistics.word_counts("font"), "font") == {
+        (("pointsize", 10),): 1,
+        (("pointsize", 12),): 2,
+        (): 1,
+    }
+
+
+def test_find_mean_font_sizes():
+    exporter = ExporterTxt("", "")
+    block = create_test_ocr_result_block([[(90, 10), (90, 11)], [], [(90, None)]])
+
+    assert exporter.find_mean_font_sizes(block) == [10.0, 0.0, 0.0]
+    assert exporter.find_mean_font_size(block.paragraphs[0], 1) == 10.5
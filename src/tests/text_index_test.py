@@ -0,0 +1,175 @@
+from src.project.project import Project
+from src.project.project_file import load_project_file, save_project_file
+from src.page.ocr_box import TextBox
+from src.page.box_type import BoxType
+from src.ocr_engine.ocr_result import (
+    OCRResultBlock,
+    OCRResultLine,
+    OCRResultParagraph,
+    OCRResultWord,
+)
+from tempfile import TemporaryDirectory
+from PIL import Image
+
+
+def create_test_ocr_result_block(text: str) -> OCRResultBlock:
+    block = OCRResultBlock()
+    paragraph = OCRResultParagraph()
+
+    for line_index, line_text in enumerate(text.split("\n")):
+        line = OCRResultLine()
+        top = 100 + line_index * 50
+
+        for index, word_text in enumerate(line_text.split()):
+            word = OCRResultWord()
+            word.text = word_text
+            word.bbox = (100 + index * 50, top, 140 + index * 50, top + 30)
+            line.add_word(word)
+
+        paragraph.add_line(line)
+
+    block.add_paragraph(paragraph)
+    return block
+
+
+def create_test_project(temp_dir: str, texts: list) -> Project:
+    page_image_path = f"{temp_dir}/page.png"
+    Image.new("L", (100, 100), 255).save(page_image_path)
+
+    project = Project("Test Project", "A test project")
+
+    for text in texts:
+        project.add_image(page_image_path)
+        text_box = TextBox(10, 10, 80, 80, BoxType.FLOWING_TEXT)
+        text_box.ocr_results = create_test_ocr_result_block(text)
+        project.pages[-1].layout.add_box(text_box)
+
+    return project
+
+
+def test_text_index_search():
+    with TemporaryDirectory() as temp_dir:
+        project = create_test_project(
+            temp_dir,
+            ["The quick brown fox.", "A quick, quick Fox jumps", "Nothing here"],
+        )
+
+        hits = project.search("quick")
+        assert [(page.order, hit.position) for page, hit in hits] == [
+            (0, 1),
+            (1, 1),
+            (1, 2),
+        ]
+
+        hits = project.search("Quick fox")
+        assert [(page.order, hit.position) for page, hit in hits] == [(1, 2)]
+        assert hits[0][1].box_id == project.pages[1].layout[0].id
+        assert hits[0][1].bbox == (200, 100, 290, 130)
+
+        assert len(project.search("quick br", prefix=True)) == 1
+        assert len(project.search("jump")) == 0
+        assert len(project.search("jump", prefix=True)) == 1
+
+        # Recognizing a box again updates the index
+        box = project.pages[2].layout[0]
+        box.ocr_results = create_test_ocr_result_block("A brown fox")
+        project.pages[2].notify_recognition_callbacks([box])
+        assert [page.order for page, _ in project.search("brown fox")] == [0, 2]
+
+        # Removed pages and boxes are no longer found
+        project.remove_page(0)
+        project.pages[0].layout.remove_box(0)
+        assert [page.order for page, _ in project.search("fox")] == [1]
+
+
+def test_text_index_save_load():
+    with TemporaryDirectory() as temp_dir:
+        project = create_test_project(temp_dir, ["The quick brown fox"] * 3)
+        assert len(project.search("brown")) == 3
+
+        # Boxes of OCR noise have no words to index
+        noise_box = TextBox(10, 10, 80, 80, BoxType.FLOWING_TEXT)
+        noise_box.ocr_results = create_test_ocr_result_block("— |")
+        project.pages[0].layout.add_box(noise_box)
+        project.pages[0].notify_recognition_callbacks([noise_box])
+
+        file_path = f"{temp_dir}/project.ocrproj"
+        save_project_file(project, file_path)
+        loaded = load_project_file(file_path)
+
+        # The index is read from the project file, not rebuilt from the
+        # OCR results
+        assert loaded.text_index.pending() is not None
+        hits = loaded.search("quick brown")
+        assert [page.order for page, _ in hits] == [0, 1, 2]
+        assert all(
+            box.pending_ocr_results() is not None
+            for page in loaded.pages
+            for box in page.layout
+        )
+
+
+def test_text_index_search_fuzzy():
+    with TemporaryDirectory() as temp_dir:
+        project = create_test_project(
+            temp_dir,
+            [
+                "Tesseract is a rnodern OCR engine",
+                "Optical character recog-\nnition",
+                "A modern approach",
+            ],
+        )
+
+        # Words hyphenated at the end of a line are found as a whole
+        hits = project.search("recognition")
+        assert [page.order for page, _ in hits] == [1]
+        assert hits[0][1].bbox == (100, 100, 240, 180)
+
+        hits = project.search_fuzzy("modern")
+        assert [(page.order, hit.distance) for page, hit in hits] == [(2, 0), (0, 1)]
+
+        hits = project.search_fuzzy("rnodern ocr")
+        assert [(page.order, hit.distance) for page, hit in hits] == [(0, 0)]
+
+        hits = project.search_fuzzy("charakter recognitoin")
+        assert [(page.order, hit.distance) for page, hit in hits] == [(1, 3)]
+        assert len(project.search_fuzzy("charakter", max_distance=0)) == 0
+
+
+def test_text_index_fuzzy_candidates():
+    with TemporaryDirectory() as temp_dir:
+        project = create_test_project(
+            temp_dir,
+            ["reading readings rending bread a extraordinarily quizzes", "leading"],
+        )
+        text_index = project.text_index
+        project.search("reading")
+
+        # Seven letters at distance two still go through the trigrams
+        candidates = {
+            text_index.terms[term_id]
+            for term_id in text_index.candidate_term_ids("reading", 2)
+        }
+        assert candidates == {"reading", "readings", "rending", "bread", "leading"}
+
+        # Shorter terms are too short for the trigrams to rule out anything,
+        # only terms of a length within reach are compared
+        assert {
+            text_index.terms[term_id]
+            for term_id in text_index.candidate_term_ids("rnodel", 2)
+        } == {"reading", "readings", "rending", "bread", "leading", "quizzes"}
+        hits = project.search_fuzzy("reeding")
+        assert sorted(hit.distance for _, hit in hits) == [1, 1, 2, 2]
+
+        # The trigrams are saved with the index and not rebuilt on load
+        file_path = f"{temp_dir}/project.ocrproj"
+        save_project_file(project, file_path)
+        loaded = load_project_file(file_path).text_index
+        loaded._ensure_loaded()
+        assert loaded._trigram_term_count == len(loaded.terms)
+        assert {
+            loaded.terms[term_id] for term_id in loaded.candidate_term_ids("reading", 2)
+        } == candidates
+        assert {
+            loaded.terms[term_id] for term_id in loaded._trigrams["rea"]
+        } == {term for term in text_index.terms if "rea" in term}